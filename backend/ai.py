@@ -1,42 +1,111 @@
+"""Board-aware chat through OpenRouter.
+
+The openai SDK takes about half a second to import, so it is loaded and the
+client configured on first use rather than when the app starts; a missing
+OPENROUTER_API_KEY fails the first chat request instead of the import.
+"""
+
 import json
 import logging
 import os
 import re
+import time
+from typing import TYPE_CHECKING
 
 from dotenv import load_dotenv
-from openai import OpenAI
-
-from models import AIResponse, BoardOut
+from pydantic import BaseModel, ValidationError
+
+import metrics
+from models import (
+    AIResponse,
+    BoardOut,
+    BoardStatsOut,
+    CreateCardOp,
+    DeleteCardOp,
+    MoveCardOp,
+    UpdateCardOp,
+)
+from resilience import CircuitBreaker, ResiliencePolicy
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-MODEL = "openai/gpt-oss-120b"
-
-OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY")
-if not OPENROUTER_API_KEY:
-    raise RuntimeError("OPENROUTER_API_KEY environment variable is not set")
-
-_client: OpenAI | None = None
-
-
-def get_ai_client() -> OpenAI:
+MODEL = os.environ.get("AI_CAPABLE_MODEL", "openai/gpt-oss-120b")
+FAST_MODEL = os.environ.get("AI_FAST_MODEL", "openai/gpt-oss-20b")
+# With routing on, chat turns are answered locally when possible and
+# otherwise sent to FAST_MODEL or MODEL by route(); off sends all to MODEL.
+AI_ROUTING = os.environ.get("AI_ROUTING", "1") == "1"
+
+# How board operations are requested from the model:
+#   json_object - JSON mode plus the schema described in the prompt (default)
+#   json_schema - strict structured output generated from AIResponse
+#   tools       - one strict function tool per operation; the reply is the text content
+AI_OUTPUT_MODES = ("json_object", "json_schema", "tools")
+AI_OUTPUT_MODE = os.environ.get("AI_OUTPUT_MODE", "json_object")
+if AI_OUTPUT_MODE not in AI_OUTPUT_MODES:
+    raise RuntimeError(f"AI_OUTPUT_MODE must be one of {', '.join(AI_OUTPUT_MODES)}")
+
+# Provider calls: one deadline per call covering all retries, a breaker that
+# fails fast after repeated failures, and optional hedging at the p95.
+AI_TIMEOUT_SECONDS = float(os.environ.get("AI_TIMEOUT_SECONDS", "30"))
+AI_MAX_RETRIES = int(os.environ.get("AI_MAX_RETRIES", "2"))
+AI_BREAKER_FAILURES = int(os.environ.get("AI_BREAKER_FAILURES", "5"))
+AI_BREAKER_RESET_SECONDS = float(os.environ.get("AI_BREAKER_RESET_SECONDS", "30"))
+AI_HEDGE = os.environ.get("AI_HEDGE", "0") == "1"
+# Chat jobs exist for turns that outlive a request, so they get a longer
+# deadline. It must end before the job's claim (CHAT_JOB_LEASE_SECONDS) does.
+AI_JOB_TIMEOUT_SECONDS = float(os.environ.get("AI_JOB_TIMEOUT_SECONDS", "90"))
+
+resilience = ResiliencePolicy(
+    "ai",
+    timeout=AI_TIMEOUT_SECONDS,
+    max_retries=AI_MAX_RETRIES,
+    breaker=CircuitBreaker("ai", AI_BREAKER_FAILURES, AI_BREAKER_RESET_SECONDS),
+    hedge=AI_HEDGE,
+)
+# Same provider, so the same breaker; nobody is waiting on a job, so no hedging.
+job_resilience = ResiliencePolicy(
+    "ai.job",
+    timeout=AI_JOB_TIMEOUT_SECONDS,
+    max_retries=AI_MAX_RETRIES,
+    breaker=resilience.breaker,
+)
+
+_client: "OpenAI | None" = None
+
+
+def get_ai_client() -> "OpenAI":
     global _client
     if _client is None:
+        api_key = os.environ.get("OPENROUTER_API_KEY")
+        if not api_key:
+            raise RuntimeError("OPENROUTER_API_KEY environment variable is not set")
+        from openai import OpenAI
+
+        # Retries and timeouts are handled by `resilience`, not the SDK.
         _client = OpenAI(
             base_url="https://openrouter.ai/api/v1",
-            api_key=OPENROUTER_API_KEY,
+            api_key=api_key,
+            max_retries=0,
+            timeout=AI_TIMEOUT_SECONDS,
         )
     return _client
 
 
-def simple_chat(prompt: str) -> str:
+def _complete(model: str | None = None, policy: ResiliencePolicy | None = None, **kwargs):
     client = get_ai_client()
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[{"role": "user", "content": prompt}],
+    model = model or MODEL
+    return (policy or resilience).call(
+        lambda timeout: client.chat.completions.create(model=model, timeout=timeout, **kwargs)
     )
+
+
+def simple_chat(prompt: str) -> str:
+    response = _complete(messages=[{"role": "user", "content": prompt}])
     return response.choices[0].message.content or ""
 
 
@@ -93,33 +162,301 @@ def board_to_context(board: BoardOut) -> str:
     return json.dumps(data, indent=2)
 
 
+def stats_to_context(stats: BoardStatsOut) -> str:
+    """A few lines of recent activity, so the model need not infer it from the board."""
+    lines = [
+        f"\n\nActivity over the last {stats.days} days: {stats.created} cards created, "
+        f"{stats.moved} moved between columns, {stats.deleted} deleted or archived.",
+    ]
+    for col in stats.columns:
+        line = (
+            f"- {col.title}: {col.activity.moved_in} moved in, "
+            f"{col.activity.moved_out} moved out"
+        )
+        if col.avg_time_in_column_seconds is not None:
+            line += f", cards stay {col.avg_time_in_column_seconds / 86400:.1f} days on average"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+# The schema modes enforce the output shape, so the prompt only states the rules.
+STRUCTURED_SYSTEM_PROMPT = """\
+You are an AI assistant for a Kanban board app called Kanban Studio. \
+The user will ask you questions or give you instructions about their board.
+
+Rules:
+- Use the column and card IDs from the board state provided below.
+- position is 0-based (0 = top of column).
+- Only change the board if the user asks you to.
+- Always include a helpful message.
+
+Current board state:
+"""
+
+# The fast tier only gets questions, so it is asked for plain text and
+# anything it says cannot change the board.
+READ_ONLY_SYSTEM_PROMPT = """\
+You are an AI assistant for a Kanban board app called Kanban Studio. \
+The user is asking a question about their board.
+
+Rules:
+- Answer in plain text from the board state provided below.
+- You cannot change the board. If the user wants a change, ask them to say \
+exactly what to add, move, update or delete.
+
+Current board state:
+"""
+
+_TOOL_OPS: dict[str, type[BaseModel]] = {
+    "create_card": CreateCardOp,
+    "update_card": UpdateCardOp,
+    "move_card": MoveCardOp,
+    "delete_card": DeleteCardOp,
+}
+
+
+def _strict(node):
+    """Rewrite a pydantic JSON schema into the subset strict mode accepts.
+
+    Every object lists all its properties as required and forbids extra
+    ones; defaults are dropped (nullable fields already allow null) and
+    const becomes a one-value enum.
+    """
+    if isinstance(node, list):
+        return [_strict(n) for n in node]
+    if not isinstance(node, dict):
+        return node
+    node = {
+        k: {name: _strict(p) for name, p in v.items()} if k == "properties" else _strict(v)
+        for k, v in node.items()
+        if k not in ("default", "title")
+    }
+    if "const" in node:
+        node["enum"] = [node.pop("const")]
+    if node.get("type") == "object" and "properties" in node:
+        node["required"] = list(node["properties"])
+        node["additionalProperties"] = False
+    return node
+
+
+def strict_schema(model: type[BaseModel], exclude: tuple[str, ...] = ()) -> dict:
+    schema = model.model_json_schema()
+    for name in exclude:
+        schema["properties"].pop(name, None)
+    return _strict(schema)
+
+
+def _request_options() -> dict:
+    if AI_OUTPUT_MODE == "json_schema":
+        return {"response_format": {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "board_response", "strict": True, "schema": strict_schema(AIResponse),
+            },
+        }}
+    if AI_OUTPUT_MODE == "tools":
+        return {"tools": [
+            {
+                "type": "function",
+                "function": {
+                    "name": name,
+                    "description": f"{name.replace('_', ' ').capitalize()} on the user's board.",
+                    "strict": True,
+                    "parameters": strict_schema(op, exclude=("action",)),
+                },
+            }
+            for name, op in _TOOL_OPS.items()
+        ]}
+    return {"response_format": {"type": "json_object"}}
+
+
+def _parse_tool_calls(message) -> AIResponse:
+    board_updates = []
+    for call in message.tool_calls or []:
+        op = _TOOL_OPS.get(call.function.name)
+        try:
+            if op is None:
+                raise ValueError(f"unknown tool {call.function.name}")
+            args = json.loads(call.function.arguments or "{}")
+            board_updates.append(op.model_validate({**args, "action": call.function.name}))
+        except (ValueError, ValidationError) as exc:
+            metrics.incr("ai.parse_failures.tools")
+            logger.warning("Dropping malformed tool call %s: %s", call.function.name, exc)
+    text = (message.content or "").strip()
+    return AIResponse(message=text or "Done.", board_updates=board_updates)
+
+
+# Words that signal the user wants the board changed; these go to MODEL.
+_EDIT_WORDS = re.compile(
+    r"\b(add|create|new|make|move|put|delete|remove|rename|update|change|edit|split|"
+    r"archive|reorder|reorgani[sz]e|prioriti[sz]e|mark|assign|yes|do it|go ahead)\b",
+    re.IGNORECASE,
+)
+_COUNT_QUESTION = re.compile(r"\bhow many (cards|tasks|items)\b", re.IGNORECASE)
+_ACTIVITY_QUESTION = re.compile(
+    r"\bhow many (cards|tasks|items) (were|have been|got) "
+    r"(?P<verb>created|added|moved|deleted|removed)\b(?P<rest>.*)"
+    r"\b((this|the past) week|(the )?(last|past) (7|seven) days)\b",
+    re.IGNORECASE,
+)
+_LIST_QUESTION = re.compile(
+    r"^\s*(list|show)( me)? (the |all )?(cards|tasks|items)\b"
+    r"|^\s*(what|which) (cards|tasks|items) (are|is) (in|on)\b",
+    re.IGNORECASE,
+)
+
+
+def _mentioned_column(board: BoardOut, message: str):
+    # Longest title first so "In Progress" wins over a column called "Progress".
+    for col in sorted(board.columns, key=lambda c: len(c.title), reverse=True):
+        # Whole words only: a column called "Do" is not in "Done" or "todo".
+        if re.search(rf"(?<!\w){re.escape(col.title)}(?!\w)", message, re.IGNORECASE):
+            return col
+    return None
+
+
+def _activity_answer(board: BoardOut, stats: BoardStatsOut, match: re.Match) -> str:
+    verb, rest = match["verb"].lower(), match["rest"]
+    column = _mentioned_column(board, rest)
+    if verb == "moved":
+        if column is None:
+            field, where = "moved", " between columns"
+        elif re.search(r"\b(out of|from)\b", rest, re.IGNORECASE):
+            field, where = "moved_out", f" out of {column.title}"
+        else:
+            field, where = "moved_in", f" to {column.title}"
+    else:
+        field = "created" if verb in ("created", "added") else "deleted"
+        where = f" in {column.title}" if column is not None else ""
+    if column is None:
+        n = getattr(stats, field)
+    else:
+        n = getattr(next(c for c in stats.columns if c.id == column.id).activity, field)
+    cards = "1 card was" if n == 1 else f"{n} cards were"
+    return f"{cards} {verb}{where} in the last {stats.days} days."
+
+
+def _local_answer(
+    board: BoardOut, message: str, stats: BoardStatsOut | None = None
+) -> str | None:
+    activity = _ACTIVITY_QUESTION.search(message)
+    if activity is not None:
+        # Not a question about the board as it is now; needs the counters.
+        if stats is None or stats.days < 7:
+            return None
+        return _activity_answer(board, stats, activity)
+    column = _mentioned_column(board, message)
+    if _COUNT_QUESTION.search(message):
+        if column is not None:
+            n = len(column.cards)
+            cards = "is 1 card" if n == 1 else f"are {n} cards"
+            return f"There {cards} in {column.title}."
+        counts = ", ".join(f"{c.title}: {len(c.cards)}" for c in board.columns)
+        total = sum(len(c.cards) for c in board.columns)
+        return f"There are {total} cards on your board ({counts})."
+    if _LIST_QUESTION.search(message) and column is not None:
+        if not column.cards:
+            return f"{column.title} is empty."
+        titles = "\n".join(f"- {card.title}" for card in column.cards)
+        return f"Cards in {column.title}:\n{titles}"
+    return None
+
+
+def route(
+    board: BoardOut, message: str, stats: BoardStatsOut | None = None
+) -> tuple[str, str | None]:
+    """Classify a chat turn as ("local", answer), ("fast", None) or ("capable", None).
+
+    Requests to change the board need the capable model. Counting and
+    listing questions are answered from the board itself, questions about
+    the past week from the board's stats, and any other question goes to
+    the fast model.
+    """
+    if not AI_ROUTING or _EDIT_WORDS.search(message):
+        return "capable", None
+    answer = _local_answer(board, message, stats)
+    if answer is not None:
+        return "local", answer
+    return "fast", None
+
+
 def chat_with_board(
     board: BoardOut,
     user_message: str,
     history: list[dict[str, str]],
+    stats: BoardStatsOut | None = None,
+    policy: ResiliencePolicy | None = None,
 ) -> AIResponse:
-    client = get_ai_client()
-
-    system_content = SYSTEM_PROMPT + board_to_context(board)
+    tier, answer = route(board, user_message, stats)
+    metrics.incr(f"ai.route.{tier}")
+    if answer is not None:
+        return AIResponse(message=answer, board_updates=[])
+
+    if tier == "fast":
+        mode, prompt, options = "text", READ_ONLY_SYSTEM_PROMPT, {}
+    else:
+        mode, options = AI_OUTPUT_MODE, _request_options()
+        prompt = SYSTEM_PROMPT if mode == "json_object" else STRUCTURED_SYSTEM_PROMPT
+    system_content = prompt + board_to_context(board)
+    if stats is not None:
+        system_content += stats_to_context(stats)
     messages: list[dict[str, str]] = [{"role": "system", "content": system_content}]
     messages.extend(history)
     messages.append({"role": "user", "content": user_message})
 
-    response = client.chat.completions.create(
-        model=MODEL,
+    started = time.perf_counter()
+    response = _complete(
+        model=FAST_MODEL if tier == "fast" else MODEL,
         messages=messages,
-        response_format={"type": "json_object"},
+        policy=policy,
+        **options,
     )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    metrics.incr(f"ai.requests.{mode}")
+    metrics.observe(f"ai.latency_ms.{mode}", elapsed_ms)
+    metrics.observe(f"ai.latency_ms.tier.{tier}", elapsed_ms)
+    usage = getattr(response, "usage", None)
+    output_tokens = getattr(usage, "completion_tokens", None)
+    if isinstance(output_tokens, int):
+        metrics.observe(f"ai.output_tokens.{mode}", output_tokens)
+
+    message = response.choices[0].message
+    if mode == "text":
+        return AIResponse(message=(message.content or "").strip() or "Done.", board_updates=[])
+    if mode == "tools":
+        return _parse_tool_calls(message)
+    return _parse_ai_response(message.content or "{}", mode)
+
+
+SUMMARY_PROMPT = """\
+Condense the conversation below between a user and the Kanban Studio \
+assistant into a short summary that keeps every fact, decision and open \
+request needed to continue it. Reply with the summary text only.
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
 
-    raw = response.choices[0].message.content or "{}"
-    return _parse_ai_response(raw)
+def summarize_history(summary: str, messages: list[dict[str, str]]) -> str:
+    """Fold messages into the running summary of a conversation."""
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    if summary:
+        transcript = f"Summary so far: {summary}\n\n{transcript}"
+    response = _complete(model=FAST_MODEL, messages=[
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": transcript},
+    ])
+    return (response.choices[0].message.content or summary).strip()
 
 
-def _parse_ai_response(raw: str) -> AIResponse:
+def _parse_ai_response(raw: str, mode: str = "json_object") -> AIResponse:
     try:
         return AIResponse.model_validate_json(raw)
     except Exception:
-        pass
+        metrics.incr(f"ai.parse_failures.{mode}")
 
     # Try extracting JSON from markdown fences or surrounding text
     match = re.search(r"\{[\s\S]*?\}", raw)
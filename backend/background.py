@@ -0,0 +1,73 @@
+"""Which worker process runs the background work the workers share.
+
+With one worker per core (serve.py), each process would otherwise run its
+own maintenance scheduler and chat-job poller against the same files, and
+they would take turns at the write lock for nothing. The process holding an
+exclusive flock on BACKGROUND_LOCK_PATH (next to the database by default)
+runs them; the others ask again whenever they would have run. The kernel
+drops the lock when its holder exits, however it exits, so the next worker
+to ask takes over without a lease to expire, and holding it costs no writes
+that maintenance would mistake for user activity.
+
+The readiness probe is not gated: it reports the state of each worker's own
+writers, read pools and circuit breaker, which only that worker can see.
+"""
+
+import logging
+import os
+import threading
+from pathlib import Path
+
+import database
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process, so it always owns the work
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+BACKGROUND_LOCK_PATH = os.environ.get("BACKGROUND_LOCK_PATH")
+
+
+class BackgroundOwner:
+    def __init__(self, path: Path | None = None):
+        self.path = path
+        self._fd: int | None = None
+        self._lock = threading.Lock()
+
+    def owned(self) -> bool:
+        """Whether this process runs the background work, taking the lock if it is free."""
+        with self._lock:
+            if self._fd is None and fcntl is None:
+                return True
+            if self._fd is None:
+                self._fd = self._acquire()
+            return self._fd is not None
+
+    def release(self) -> None:
+        """Let another worker take over, e.g. on shutdown."""
+        with self._lock:
+            fd, self._fd = self._fd, None
+        if fd is not None:
+            os.close(fd)
+
+    def _acquire(self) -> int | None:
+        path = self.path or Path(
+            BACKGROUND_LOCK_PATH or database.DB_PATH.with_name(database.DB_PATH.name + ".background")
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return None
+        # For whoever wonders which worker it is.
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        log.info("Process %d runs maintenance and chat jobs", os.getpid())
+        return fd
+
+
+background = BackgroundOwner()
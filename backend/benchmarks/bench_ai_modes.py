@@ -0,0 +1,57 @@
+"""Compare AI output modes on the seed board: parse failures, output tokens, latency.
+
+Calls the real provider, so OPENROUTER_API_KEY must be set. Every prompt is
+sent `--repeat` times in each mode; the numbers come from the ai.* metrics
+that chat_with_board records. Run from backend/:
+
+    python -m benchmarks.bench_ai_modes --repeat 3
+"""
+
+import argparse
+import os
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+
+import ai  # noqa: E402
+import metrics  # noqa: E402
+from models import BoardOut  # noqa: E402
+from storage.memory import MemoryRepository  # noqa: E402
+
+PROMPTS = [
+    "How many cards are in Backlog?",
+    "Add a card called 'Write release notes' to In Progress.",
+    "Move the first Backlog card to Done.",
+    "Rename the card in Review to 'Final QA' and add details 'Check mobile too'.",
+    "Delete every card in Discovery.",
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=list(ai.AI_OUTPUT_MODES))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    repo = MemoryRepository()
+    repo.ensure_board("user")
+    board = BoardOut.model_validate(repo.load_board("user"))
+
+    print(f"{'mode':<12} {'calls':>6} {'parse fail':>11} {'out tokens':>11} {'latency ms':>11}")
+    for mode in args.modes:
+        ai.AI_OUTPUT_MODE = mode
+        metrics.reset()
+        for _ in range(args.repeat):
+            for prompt in PROMPTS:
+                ai.chat_with_board(board, prompt, [])
+        snap = metrics.snapshot()
+        calls = snap["counters"].get(f"ai.requests.{mode}", 0)
+        failures = snap["counters"].get(f"ai.parse_failures.{mode}", 0)
+        tokens = snap["summaries"].get(f"ai.output_tokens.{mode}", {}).get("avg", 0)
+        latency = snap["summaries"][f"ai.latency_ms.{mode}"]["avg"]
+        print(
+            f"{mode:<12} {calls:>6.0f} {failures / calls:>10.1%} {tokens:>11.0f} {latency:>11.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Run the board write/read workload under each SQLite performance profile.
+
+Each profile runs in a fresh child process against a fresh database. When
+strace is on PATH the child is traced and real fsync/fdatasync counts are
+reported; otherwise that column shows n/a. Run from backend/:
+
+    python -m benchmarks.bench_profiles --ops 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+
+from database import PROFILES, ensure_board_for_user, get_db, get_read_db, init_db  # noqa: E402
+from storage.sqlite import BOARD_ROWS_SQL  # noqa: E402
+
+
+def _workload(db_path: Path, profile: str, ops: int) -> dict:
+    """Create/update/move/delete cards, one commit each, with a board read after every op."""
+    conn = get_db(db_path, profile)
+    init_db(conn)
+    board_id = ensure_board_for_user(conn, "user")
+    conn.commit()
+    reader = get_read_db(db_path, profile)
+    col_ids = [r["id"] for r in conn.execute(
+        "SELECT id FROM columns WHERE board_id = ? ORDER BY position", (board_id,)
+    )]
+    rng = random.Random(0)
+
+    start = time.perf_counter()
+    for i in range(ops):
+        kind = i % 4
+        card = conn.execute("SELECT id, column_id FROM cards ORDER BY random() LIMIT 1").fetchone()
+        if kind == 0 or card is None:
+            col_id = rng.choice(col_ids)
+            conn.execute(
+                "INSERT INTO cards (column_id, title, details, position) "
+                "SELECT ?, ?, ?, COALESCE(MAX(position), -1) + 1 FROM cards WHERE column_id = ?",
+                (col_id, f"Card {i}", "Benchmark details", col_id),
+            )
+        elif kind == 1:
+            conn.execute("UPDATE cards SET title = ? WHERE id = ?", (f"Edited {i}", card["id"]))
+        elif kind == 2:
+            target = rng.choice(col_ids)
+            conn.execute("UPDATE cards SET column_id = ? WHERE id = ?", (target, card["id"]))
+            ids = [r["id"] for r in conn.execute(
+                "SELECT id FROM cards WHERE column_id = ? ORDER BY position", (target,)
+            )]
+            conn.executemany(
+                "UPDATE cards SET position = ? WHERE id = ?", list(enumerate(ids))
+            )
+        else:
+            conn.execute("DELETE FROM cards WHERE id = ?", (card["id"],))
+        conn.commit()
+        reader.execute(BOARD_ROWS_SQL, (board_id,)).fetchall()
+    elapsed = time.perf_counter() - start
+
+    reader.close()
+    conn.close()
+    return {"profile": profile, "ops": ops, "seconds": elapsed, "ops_per_sec": ops / elapsed}
+
+
+def _parse_strace(path: Path) -> int:
+    calls = 0
+    for line in path.read_text().splitlines():
+        parts = line.split()
+        if parts and parts[-1] in ("fsync", "fdatasync"):
+            # columns: % time, seconds, usecs/call, calls, [errors], syscall
+            calls += int(parts[3])
+    return calls
+
+
+def _run_child(profile: str, ops: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        cmd = [
+            sys.executable, "-m", "benchmarks.bench_profiles",
+            "--child", profile, "--db", str(Path(tmp) / "bench.db"), "--ops", str(ops),
+        ]
+        strace = shutil.which("strace")
+        trace_out = Path(tmp) / "strace.txt"
+        if strace:
+            cmd = [strace, "-f", "-c", "-o", str(trace_out), "-e", "trace=fsync,fdatasync"] + cmd
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        result["fsyncs"] = _parse_strace(trace_out) if strace else None
+        return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_workload(Path(args.db), args.child, args.ops)))
+        return
+
+    print(f"{'profile':>10} {'ops/s':>10} {'seconds':>9} {'fsyncs':>8}")
+    for profile in args.profiles:
+        r = _run_child(profile, args.ops)
+        fsyncs = "n/a" if r["fsyncs"] is None else str(r["fsyncs"])
+        print(f"{profile:>10} {r['ops_per_sec']:>10.0f} {r['seconds']:>9.2f} {fsyncs:>8}")
+
+
+if __name__ == "__main__":
+    main()
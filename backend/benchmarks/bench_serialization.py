@@ -0,0 +1,108 @@
+"""Time board serialization (SQLite rows -> response bytes) against card count.
+
+Compares the pydantic path the board routes used to take (build models, then
+re-validate against response_model and encode) with the direct row-to-JSON
+path in routers.board. Run from backend/:
+
+    python -m benchmarks.bench_serialization --cards 100 1000 10000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+
+import database  # noqa: E402
+from database import ensure_board_for_user, get_db, init_db  # noqa: E402
+from models import BoardOut, CardOut, ColumnOut  # noqa: E402
+from storage.sqlite import board_payload  # noqa: E402
+
+
+def _populate(conn, username: str, card_count: int) -> None:
+    board_id = ensure_board_for_user(conn, username)
+    col_ids = [
+        r["id"] for r in conn.execute(
+            "SELECT id FROM columns WHERE board_id = ? ORDER BY position", (board_id,)
+        )
+    ]
+    conn.execute(
+        "DELETE FROM cards WHERE column_id IN (SELECT id FROM columns WHERE board_id = ?)",
+        (board_id,),
+    )
+    rows = []
+    for i in range(card_count):
+        col_id = col_ids[i % len(col_ids)]
+        rows.append((col_id, f"Card {i}", f"Details for card {i} " * 3, i // len(col_ids)))
+    conn.executemany(
+        "INSERT INTO cards (column_id, title, details, position) VALUES (?, ?, ?, ?)", rows
+    )
+    conn.commit()
+
+
+def _validated_path(conn, username: str) -> bytes:
+    board_id = ensure_board_for_user(conn, username)
+    board = conn.execute("SELECT id, name FROM boards WHERE id = ?", (board_id,)).fetchone()
+    cols = conn.execute(
+        "SELECT id, title, position FROM columns WHERE board_id = ? ORDER BY position",
+        (board_id,),
+    ).fetchall()
+    columns = []
+    for col in cols:
+        cards = conn.execute(
+            "SELECT id, title, details, position FROM cards WHERE column_id = ? ORDER BY position",
+            (col["id"],),
+        ).fetchall()
+        columns.append(
+            ColumnOut(
+                id=col["id"],
+                title=col["title"],
+                position=col["position"],
+                cards=[CardOut(**dict(c)) for c in cards],
+            )
+        )
+    out = BoardOut(id=board["id"], name=board["name"], columns=columns)
+    # What FastAPI does with response_model: dump, re-validate, encode.
+    return json.dumps(BoardOut.model_validate(out.model_dump()).model_dump()).encode()
+
+
+def _direct_path(conn, username: str) -> bytes:
+    payload = board_payload(conn, username)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _time(fn, conn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(conn, "user")
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'cards':>8} {'validated ms':>14} {'direct ms':>11} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        conn = get_db(database.DB_PATH)
+        init_db(conn)
+        for count in args.cards:
+            _populate(conn, "user", count)
+            assert json.loads(_validated_path(conn, "user")) == json.loads(_direct_path(conn, "user"))
+            slow = _time(_validated_path, conn, args.repeat)
+            fast = _time(_direct_path, conn, args.repeat)
+            print(f"{count:>8} {slow * 1000:>14.2f} {fast * 1000:>11.2f} {slow / fast:>7.1f}x")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Measure cold start: `import main` time and time to the first healthy response.
+
+Each sample is a fresh interpreter. The import sample reports whether the
+openai SDK was loaded (it should not be until the first chat request). The
+health sample starts uvicorn and polls /api/health until it returns 200.
+Run from backend/:
+
+    python -m benchmarks.bench_startup --repeat 5
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+_IMPORT_PROBE = (
+    "import sys, time; t = time.perf_counter(); import main; "
+    "print(time.perf_counter() - t, 'openai' in sys.modules)"
+)
+
+
+def _env() -> dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+    # Startup must not depend on the AI key.
+    env.pop("OPENROUTER_API_KEY", None)
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_import() -> tuple[float, bool]:
+    out = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE],
+        cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True,
+    ).stdout.split()
+    return float(out[0]), out[1] == "True"
+
+
+def time_to_healthy(timeout: float = 30.0) -> float:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/api/health"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=_env(),
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise RuntimeError(f"server not healthy after {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    imports = [time_import() for _ in range(args.repeat)]
+    healthy = [time_to_healthy() for _ in range(args.repeat)]
+    import_ms = statistics.median(t for t, _ in imports) * 1000
+    print(f"import main:        {import_ms:8.1f} ms (median of {args.repeat})")
+    print(f"openai imported:    {any(loaded for _, loaded in imports)}")
+    print(f"first healthy resp: {statistics.median(healthy) * 1000:8.1f} ms (median of {args.repeat})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Throughput of NDJSON board import and export through the HTTP routes.
+
+Streams a generated NDJSON body of --cards cards into POST /api/board/import,
+then streams GET /api/board/export back and counts the lines. The app is
+driven as a bare ASGI callable because TestClient buffers whole request and
+response bodies, which would hide what the routes themselves hold in memory.
+Peak RSS is sampled after each phase. Run from backend/:
+
+    python -m benchmarks.bench_transfer --cards 1000000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import tempfile
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret-key-of-32-bytes!")
+
+import database  # noqa: E402
+from auth import create_token  # noqa: E402
+from main import app  # noqa: E402
+from writer import close_writers  # noqa: E402
+
+COLUMNS = 5
+
+
+def _body(cards: int) -> Iterator[bytes]:
+    yield b"".join(
+        json.dumps({"type": "column", "id": i, "title": f"Import {i}"}).encode() + b"\n"
+        for i in range(COLUMNS)
+    )
+    batch = []
+    for i in range(cards):
+        batch.append(json.dumps({
+            "type": "card", "column_id": i % COLUMNS,
+            "title": f"Imported card {i}", "details": "Generated by bench_transfer",
+        }).encode())
+        if len(batch) == 2000:
+            yield b"\n".join(batch) + b"\n"
+            batch = []
+    if batch:
+        yield b"\n".join(batch) + b"\n"
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def _request(method: str, path: str, body: Iterator[bytes] = iter(())) -> tuple[int, int, bytes]:
+    """Run one request through the app; return status, body lines and the last chunk."""
+    scope = {
+        "type": "http", "http_version": "1.1", "method": method, "path": path,
+        "raw_path": path.encode(), "query_string": b"", "scheme": "http",
+        "server": ("bench", 80), "client": ("bench", 1), "root_path": "",
+        "headers": [(b"authorization", f"Bearer {create_token('user')}".encode())],
+    }
+    chunks = iter(body)
+    finished = asyncio.Event()
+    sent_last = False
+    result = {"status": 0, "lines": 0, "last": b""}
+
+    async def receive() -> dict:
+        nonlocal sent_last
+        chunk = next(chunks, None)
+        if chunk is not None:
+            return {"type": "http.request", "body": chunk, "more_body": True}
+        if not sent_last:
+            sent_last = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()  # the client never disconnects
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message.get("body"):
+            result["lines"] += message["body"].count(b"\n")
+            result["last"] = message["body"]
+
+    await app(scope, receive, send)
+    finished.set()
+    return result["status"], result["lines"], result["last"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        database.init_storage()
+        try:
+            start = time.perf_counter()
+            status, _, last = asyncio.run(_request("POST", "/api/board/import", _body(args.cards)))
+            elapsed = time.perf_counter() - start
+            assert status == 200, last
+            imported = json.loads(last)["cards"]
+            print(f"import: {imported:,} cards in {elapsed:.2f}s = {imported / elapsed:,.0f} cards/s"
+                  f"  (peak RSS {_peak_rss_mb():.0f} MB)")
+
+            start = time.perf_counter()
+            status, lines, _ = asyncio.run(_request("GET", "/api/board/export"))
+            elapsed = time.perf_counter() - start
+            assert status == 200
+            print(f"export: {lines:,} lines in {elapsed:.2f}s = {lines / elapsed:,.0f} lines/s"
+                  f"  (peak RSS {_peak_rss_mb():.0f} MB)")
+        finally:
+            close_writers()
+            database.close_read_pools()
+
+
+if __name__ == "__main__":
+    main()
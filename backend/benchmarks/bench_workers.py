@@ -0,0 +1,163 @@
+"""Load test: request throughput of `python -m serve` at several worker counts.
+
+For each worker count a server is started on a fresh temporary database and
+--clients load-generating processes hammer it for --duration seconds with
+GET /api/board, retitling the client's own card on a --write-ratio share
+of requests. After every write the board is re-read over a new connection,
+which may land on a different worker; a read that misses the write is
+counted as stale, so the run also checks the per-process board caches stay
+coherent.
+Run from backend/:
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --clients 8
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _request(conn: http.client.HTTPConnection, method: str, path: str,
+             token: str | None = None, body: dict | None = None) -> tuple[int, bytes]:
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    conn.request(method, path, body=json.dumps(body) if body else None, headers=headers)
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+def _wait_ready(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            if _request(conn, "GET", "/api/health/ready")[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not become ready")
+
+
+def _card_title(board: bytes, card_id: int) -> str | None:
+    for column in json.loads(board)["columns"]:
+        for card in column["cards"]:
+            if card["id"] == card_id:
+                return card["title"]
+    return None
+
+
+def _client(port: int, token: str, column_id: int, duration: float,
+            write_ratio: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    title = f"Load client {seed}"
+    _, board = _request(conn, "POST", "/api/board/cards", token,
+                        {"column_id": column_id, "title": title})
+    card_id = next(c["id"] for col in json.loads(board)["columns"]
+                   for c in col["cards"] if c["title"] == title)
+    latencies, stale, errors, writes = [], 0, 0, 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        if rng.random() < write_ratio:
+            writes += 1
+            title = f"Load client {seed} write {writes}"
+            code, _ = _request(conn, "PUT", f"/api/board/cards/{card_id}", token, {"title": title})
+            latencies.append(time.perf_counter() - start)
+            if code != 200:
+                errors += 1
+                continue
+            fresh = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            code, board = _request(fresh, "GET", "/api/board", token)
+            fresh.close()
+            if code != 200:
+                errors += 1
+            elif _card_title(board, card_id) != title:
+                stale += 1
+        else:
+            code, _ = _request(conn, "GET", "/api/board", token)
+            latencies.append(time.perf_counter() - start)
+            errors += code != 200
+    return {"latencies": latencies, "stale": stale, "errors": errors}
+
+
+def run(workers: int, args: argparse.Namespace) -> dict:
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "DATABASE_PATH": str(Path(tmp) / "kanban.db"),
+            "WEB_CONCURRENCY": str(workers),
+            "PORT": str(port),
+            "HOST": "127.0.0.1",
+            "JWT_SECRET_KEY": os.environ.get("JWT_SECRET_KEY", "benchmark-secret-key-of-32-bytes!"),
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "serve"], env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            _wait_ready(port)
+            conn = http.client.HTTPConnection("127.0.0.1", port)
+            _, body = _request(conn, "POST", "/api/auth/login",
+                               body={"username": "user", "password": "password"})
+            token = json.loads(body)["token"]
+            _, body = _request(conn, "GET", "/api/board", token)
+            column_id = json.loads(body)["columns"][0]["id"]
+            conn.close()
+
+            jobs = [(port, token, column_id, args.duration, args.write_ratio, seed)
+                    for seed in range(args.clients)]
+            with multiprocessing.Pool(args.clients) as pool:
+                results = pool.starmap(_client, jobs)
+        finally:
+            server.terminate()
+            server.wait()
+
+    latencies = sorted(l for r in results for l in r["latencies"])
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / args.duration, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+        "stale_reads": sum(r["stale"] for r in results),
+        "errors": sum(r["errors"] for r in results),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--write-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'stale':>6} {'errors':>6}")
+    for workers in args.workers:
+        r = run(workers, args)
+        print(f"{r['workers']:>7} {r['rps']:>9.1f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['stale_reads']:>6} {r['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
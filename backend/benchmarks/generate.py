@@ -0,0 +1,61 @@
+"""Deterministic synthetic data: many users, wide boards and very long columns.
+
+The same arguments always produce the same rows, so benchmark numbers from
+different commits are comparable. Every generated user's password is
+"password" (database.SEED_PASSWORD_HASH).
+"""
+
+import random
+import sqlite3
+
+from database import SEED_PASSWORD_HASH, rebuild_column_stats
+
+_WORDS = (
+    "api auth backlog bug cache deploy design docs fix flaky index load login "
+    "metrics migrate mobile onboarding perf polish query refactor release review "
+    "schema search spike test ui upgrade"
+).split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize()
+
+
+def generate(
+    conn: sqlite3.Connection,
+    *,
+    users: int = 50,
+    columns: int = 5,
+    cards_per_column: int = 20,
+    big_column_cards: int = 10_000,
+    seed: int = 0,
+) -> list[str]:
+    """Create users bench00000.. with boards; the first user's first column is huge.
+
+    Returns the generated usernames. The caller commits.
+    """
+    rng = random.Random(seed)
+    usernames = [f"bench{i:05d}" for i in range(users)]
+    conn.executemany(
+        "INSERT INTO users (username, password_hash) VALUES (?, ?)",
+        [(name, SEED_PASSWORD_HASH) for name in usernames],
+    )
+    for index, username in enumerate(usernames):
+        user_id = conn.execute(
+            "SELECT id FROM users WHERE username = ?", (username,)
+        ).fetchone()[0]
+        board_id = conn.execute(
+            "INSERT INTO boards (user_id, name) VALUES (?, ?)", (user_id, f"Board {index}")
+        ).lastrowid
+        for position in range(columns):
+            column_id = conn.execute(
+                "INSERT INTO columns (board_id, title, position) VALUES (?, ?, ?)",
+                (board_id, f"Column {position}", position),
+            ).lastrowid
+            count = big_column_cards if index == 0 and position == 0 else cards_per_column
+            conn.executemany(
+                "INSERT INTO cards (column_id, title, details, position) VALUES (?, ?, ?, ?)",
+                [(column_id, _text(rng, 4), _text(rng, 12), i) for i in range(count)],
+            )
+    rebuild_column_stats(conn)
+    return usernames
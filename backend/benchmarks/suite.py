@@ -0,0 +1,202 @@
+"""Scenario benchmarks over a generated large dataset, with JSON output to compare.
+
+    python -m benchmarks.suite run --output before.json
+    python -m benchmarks.suite run --output after.json
+    python -m benchmarks.suite compare before.json after.json --threshold 0.2
+
+`run` builds a fresh database with benchmarks.generate and times each
+scenario through the same code the routes use. `compare` prints the change
+in median per scenario and exits non-zero when any scenario got slower by
+more than the threshold. Run from backend/.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+
+import database  # noqa: E402
+from ai import board_to_context  # noqa: E402
+from benchmarks.generate import generate  # noqa: E402
+from models import CreateCardOp, MoveCardOp, UpdateCardOp  # noqa: E402
+from routers.auth import LoginRequest, login  # noqa: E402
+from routers.board import _load_board  # noqa: E402
+from storage.sqlite import SqliteRepository  # noqa: E402
+from writer import close_writers  # noqa: E402
+
+
+def _scenarios(repo: SqliteRepository, big: str, small: str) -> dict[str, Callable[[], object]]:
+    board = _load_board(repo, big)
+    big_column = board.columns[0]
+    small_column = board.columns[1]
+    big_board = board
+
+    def card_at(order: str) -> int:
+        with database.read_connection() as conn:
+            return conn.execute(
+                f"SELECT id FROM cards WHERE column_id = ? ORDER BY position {order} LIMIT 1",
+                (big_column.id,),
+            ).fetchone()[0]
+
+    def move_card() -> None:
+        # Last card to the top of the huge column: every position shifts.
+        repo.move_card(big, card_at("DESC"), big_column.id, 0)
+
+    def delete_card() -> None:
+        repo.delete_card(big, card_at("ASC"))
+
+    def apply_board_updates() -> None:
+        cards = small_column.cards
+        ops = [CreateCardOp(action="create_card", column_id=small_column.id, title="Generated")]
+        ops += [
+            UpdateCardOp(action="update_card", card_id=c.id, title=f"{c.title}!")
+            for c in cards[:5]
+        ]
+        ops += [
+            MoveCardOp(action="move_card", card_id=c.id, target_column_id=small_column.id)
+            for c in cards[5:10]
+        ]
+        repo.apply_board_updates(big, ops)
+
+    return {
+        "load_board_large": lambda: _load_board(repo, big),
+        "load_board_small": lambda: _load_board(repo, small),
+        "board_stats_large": lambda: repo.board_stats(big, 7),
+        "board_to_context_large": lambda: board_to_context(big_board),
+        "move_card_large_column": move_card,
+        "delete_card_large_column": delete_card,
+        "apply_board_updates": apply_board_updates,
+        "login": lambda: login(LoginRequest(username=small, password="password"), repo),
+    }
+
+
+def _time(fn: Callable[[], object], repeat: int) -> dict:
+    fn()  # warm caches and pools
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "runs": repeat,
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "min_ms": round(samples[0], 3),
+    }
+
+
+def _commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def run(args: argparse.Namespace) -> dict:
+    params = {
+        "users": args.users,
+        "columns": args.columns,
+        "cards_per_column": args.cards,
+        "big_column_cards": args.big_column,
+        "seed": args.seed,
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        conn = database.get_db(database.DB_PATH)
+        database.init_db(conn, seed=False)
+        users = generate(conn, **params)
+        conn.commit()
+        conn.close()
+
+        repo = SqliteRepository()
+        results = {}
+        try:
+            for name, fn in _scenarios(repo, users[0], users[-1]).items():
+                if args.only and name not in args.only:
+                    continue
+                repeat = max(1, args.repeat // 10) if name == "login" else args.repeat
+                results[name] = _time(fn, repeat)
+                print(f"{name:<26} {results[name]['median_ms']:>10.2f} ms", file=sys.stderr)
+        finally:
+            close_writers()
+            database.close_read_pools()
+    return {
+        "meta": {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "params": params,
+        },
+        "results": results,
+    }
+
+
+def compare(base: dict, head: dict, threshold: float) -> list[str]:
+    """Print per-scenario change in median; return the scenarios that regressed."""
+    regressions = []
+    print(f"{'scenario':<26} {'base ms':>10} {'head ms':>10} {'change':>8}")
+    for name, before in base["results"].items():
+        after = head["results"].get(name)
+        if after is None:
+            continue
+        change = after["median_ms"] / before["median_ms"] - 1 if before["median_ms"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:<26} {before['median_ms']:>10.2f} {after['median_ms']:>10.2f} "
+            f"{change:>+7.1%}{flag}"
+        )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="run the scenarios and write JSON results")
+    run_parser.add_argument("--output", type=Path)
+    run_parser.add_argument("--repeat", type=int, default=20)
+    run_parser.add_argument("--users", type=int, default=50)
+    run_parser.add_argument("--columns", type=int, default=5)
+    run_parser.add_argument("--cards", type=int, default=20, help="cards per ordinary column")
+    run_parser.add_argument("--big-column", type=int, default=10_000)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--only", nargs="+", help="scenario names to run")
+
+    compare_parser = sub.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("base", type=Path)
+    compare_parser.add_argument("head", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=0.15)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        output = json.dumps(run(args), indent=2)
+        if args.output:
+            args.output.write_text(output + "\n")
+        else:
+            print(output)
+    else:
+        base = json.loads(args.base.read_text())
+        head = json.loads(args.head.read_text())
+        if compare(base, head, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
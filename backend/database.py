@@ -1,10 +1,70 @@
+import hashlib
+import os
+import queue
 import sqlite3
-from collections.abc import Generator
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
 from pathlib import Path
 
-import bcrypt
+import metrics
+from timing import TracedConnection
 
-DB_PATH = Path(__file__).parent / "data" / "kanban.db"
+DB_PATH = Path(os.environ.get("DATABASE_PATH") or Path(__file__).parent / "data" / "kanban.db")
+
+# "single" keeps every board in DB_PATH. "sharded" spreads users over
+# SHARD_COUNT files in a shards/ directory next to DB_PATH, each with its
+# own writer, so independent users' writes proceed in parallel.
+STORAGE_MODE = os.environ.get("STORAGE_MODE", "single")
+SHARD_COUNT = int(os.environ.get("SHARD_COUNT", "16"))
+if STORAGE_MODE not in ("single", "sharded"):
+    raise RuntimeError(f"STORAGE_MODE must be 'single' or 'sharded', got {STORAGE_MODE!r}")
+
+# How long a connection waits on a locked database before raising.
+BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Named PRAGMA sets applied to every connection. "durable" (the default)
+# fsyncs the WAL on every commit, so a committed change survives power loss;
+# its cache, mmap and temp_store settings only affect speed. "balanced" only
+# syncs the WAL at checkpoints: still corruption-safe, but a power loss can
+# drop the last few commits. "fast" never syncs and can lose more.
+PROFILES: dict[str, dict[str, int | str]] = {
+    "durable": {
+        "synchronous": "FULL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 1000,
+    },
+    "balanced": {
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 1000,
+    },
+    "fast": {
+        "synchronous": "OFF",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 4000,
+    },
+}
+
+SQLITE_PROFILE = os.environ.get("SQLITE_PROFILE", "durable")
+if SQLITE_PROFILE not in PROFILES:
+    raise RuntimeError(
+        f"SQLITE_PROFILE must be one of {', '.join(PROFILES)}, got {SQLITE_PROFILE!r}"
+    )
+
+# Idle read-only connections kept per database file.
+READ_POOL_SIZE = int(os.environ.get("SQLITE_READ_POOL_SIZE", "8"))
+
+# bcrypt hash of the demo password "password", computed once rather than on
+# every fresh database so first boot doesn't spend ~250ms hashing.
+SEED_PASSWORD_HASH = "$2b$12$J8mFsnGyoIQ.o8DjMri2RO21OZhM1Ndfg13ZkBFIhEiNQGmbU2UnS"
 
 SEED_COLUMNS = ["Backlog", "Discovery", "In Progress", "Review", "Done"]
 SEED_CARDS = {
@@ -27,19 +87,222 @@ SEED_CARDS = {
         ("Close onboarding sprint", "Document release notes and share internally."),
     ],
 }
+# (column title, [(card title, details)]) in board order: the board new users start with.
+SEED_TEMPLATE = [(title, SEED_CARDS.get(title, [])) for title in SEED_COLUMNS]
+
+
+def shard_for(username: str, shard_count: int | None = None) -> int:
+    digest = hashlib.blake2b(username.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % (shard_count or SHARD_COUNT)
+
+
+def shard_path(shard: int, shard_dir: Path | None = None) -> Path:
+    return (shard_dir or DB_PATH.parent / "shards") / f"kanban-{shard:03d}.db"
 
 
-def get_db(db_path: Path | None = None) -> sqlite3.Connection:
+def db_path_for(username: str) -> Path:
+    """Database file holding this user's account and board."""
+    if STORAGE_MODE == "sharded":
+        return shard_path(shard_for(username))
+    return DB_PATH
+
+
+def all_db_paths() -> list[Path]:
+    if STORAGE_MODE == "sharded":
+        return [shard_path(i) for i in range(SHARD_COUNT)]
+    return [DB_PATH]
+
+
+def apply_profile(conn: sqlite3.Connection, profile: str | None = None) -> None:
+    for pragma, value in PROFILES[profile or SQLITE_PROFILE].items():
+        conn.execute(f"PRAGMA {pragma}={value}")
+
+
+def get_db(db_path: Path | None = None, profile: str | None = None) -> sqlite3.Connection:
     path = db_path or DB_PATH
     path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(path))
+    new_file = not path.exists()
+    conn = sqlite3.connect(str(path), factory=TracedConnection)
     conn.row_factory = sqlite3.Row
+    if new_file:
+        # Incremental auto-vacuum lets maintenance return free pages without a
+        # full VACUUM. It must be set before the first write, so only new files
+        # get it here; `python -m maintenance enable-incremental-vacuum`
+        # converts existing ones.
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
     conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    apply_profile(conn, profile)
+    return conn
+
+
+def get_read_db(db_path: Path | None = None, profile: str | None = None) -> sqlite3.Connection:
+    """Open a read-only connection; it can never take the WAL write lock."""
+    path = db_path or DB_PATH
+    conn = sqlite3.connect(
+        # as_uri() percent-encodes the path, so "?", "#" or "%" in it stay part of it.
+        Path(path).resolve().as_uri() + "?mode=ro",
+        uri=True,
+        factory=TracedConnection,
+        # Pooled connections are handed between threadpool workers, one at a time.
+        check_same_thread=False,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only=ON")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    apply_profile(conn, profile)
     return conn
 
 
-def init_db(conn: sqlite3.Connection) -> None:
+class ReadPool:
+    """Reusable read-only connections for one database file."""
+
+    def __init__(self, db_path: Path, size: int = READ_POOL_SIZE):
+        self.db_path = db_path
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue(maxsize=size)
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = get_read_db(self.db_path)
+            metrics.incr("read_pool.opened")
+        metrics.set_gauge("read_pool.idle", self._idle.qsize())
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+        metrics.set_gauge("read_pool.idle", self._idle.qsize())
+
+    def stats(self) -> dict:
+        return {"idle": self._idle.qsize(), "size": self._idle.maxsize}
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_read_pools: dict[Path, ReadPool] = {}
+_read_pools_lock = threading.Lock()
+
+
+def get_read_pool(db_path: Path | None = None) -> ReadPool:
+    path = db_path or DB_PATH
+    with _read_pools_lock:
+        pool = _read_pools.get(path)
+        if pool is None:
+            pool = _read_pools[path] = ReadPool(path)
+        return pool
+
+
+def read_pool_stats() -> dict[str, dict]:
+    with _read_pools_lock:
+        pools = list(_read_pools.values())
+    return {pool.db_path.name: pool.stats() for pool in pools}
+
+
+# One idle read-only connection per file, used only to poll PRAGMA data_version.
+_version_conns: dict[Path, sqlite3.Connection] = {}
+_version_lock = threading.Lock()
+
+
+def data_version(db_path: Path | None = None) -> int:
+    """A number that changes whenever anything commits to the database file.
+
+    PRAGMA data_version moves when any other connection commits, including
+    ones in other worker processes. Polling it from a connection that never
+    writes turns it into a file-wide change counter that costs microseconds.
+    """
+    path = db_path or DB_PATH
+    with _version_lock:
+        conn = _version_conns.get(path)
+        if conn is None:
+            conn = _version_conns[path] = get_read_db(path)
+        return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def close_read_pools() -> None:
+    with _read_pools_lock:
+        pools = list(_read_pools.values())
+        _read_pools.clear()
+    for pool in pools:
+        pool.close()
+    with _version_lock:
+        conns = list(_version_conns.values())
+        _version_conns.clear()
+    for conn in conns:
+        conn.close()
+
+
+def _add_column(conn: sqlite3.Connection, table: str, definition: str) -> bool:
+    name = definition.split()[0]
+    if name in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {definition}")
+    conn.commit()
+    return True
+
+
+# Board statistics are counters kept by the write paths themselves, in the
+# same transaction as the change, so reading them never scans cards. Per
+# column: the live card count, the sum of the cards' entry times (average
+# age = now - sum / count), and the total time spent and number of cards
+# that have moved on to another column. column_activity holds one row of
+# tallies per column per UTC day that saw a change.
+
+_TALLY_SQL = """
+    INSERT INTO column_activity (column_id, day, {field}) VALUES (?, date('now'), ?)
+    ON CONFLICT (column_id, day) DO UPDATE SET {field} = {field} + excluded.{field}
+"""
+
+
+def count_cards(
+    conn: sqlite3.Connection, column_id: int, field: str, count: int, entered_at_sum: int
+) -> None:
+    """Add `count` cards to a column's counters (negative when they leave) and
+    tally them as `field` for today. The caller commits."""
+    conn.execute(
+        "UPDATE columns SET card_count = card_count + ?, entered_at_sum = entered_at_sum + ? "
+        "WHERE id = ?",
+        (count, entered_at_sum, column_id),
+    )
+    conn.execute(_TALLY_SQL.format(field=field), (column_id, abs(count)))
+
+
+def count_exit(conn: sqlite3.Connection, column_id: int, dwell_seconds: int) -> None:
+    conn.execute(
+        "UPDATE columns SET dwell_seconds = dwell_seconds + ?, dwell_exits = dwell_exits + 1 "
+        "WHERE id = ?",
+        (dwell_seconds, column_id),
+    )
+
+
+def rebuild_column_stats(conn: sqlite3.Connection) -> None:
+    """Recount every column's cards from the cards table, starting the clock
+    now for cards without an entry time. For rows written outside the
+    storage layer; the caller commits."""
+    conn.execute(
+        "UPDATE cards SET entered_at = ? WHERE entered_at = 0", (int(time.time()),)
+    )
+    conn.execute("""
+        UPDATE columns SET
+            card_count = (SELECT COUNT(*) FROM cards WHERE column_id = columns.id),
+            entered_at_sum = (
+                SELECT COALESCE(SUM(entered_at), 0) FROM cards WHERE column_id = columns.id
+            )
+    """)
+
+
+def init_db(conn: sqlite3.Connection, seed: bool = True) -> None:
     conn.executescript("""
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -49,41 +312,154 @@ def init_db(conn: sqlite3.Connection) -> None:
         CREATE TABLE IF NOT EXISTS boards (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL UNIQUE REFERENCES users(id) ON DELETE CASCADE,
-            name TEXT NOT NULL DEFAULT 'My Board'
+            name TEXT NOT NULL DEFAULT 'My Board',
+            version INTEGER NOT NULL DEFAULT 0
         );
         CREATE TABLE IF NOT EXISTS columns (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             board_id INTEGER NOT NULL REFERENCES boards(id) ON DELETE CASCADE,
             title TEXT NOT NULL,
-            position INTEGER NOT NULL
+            position INTEGER NOT NULL,
+            card_count INTEGER NOT NULL DEFAULT 0,
+            entered_at_sum INTEGER NOT NULL DEFAULT 0,
+            dwell_seconds INTEGER NOT NULL DEFAULT 0,
+            dwell_exits INTEGER NOT NULL DEFAULT 0
         );
         CREATE TABLE IF NOT EXISTS cards (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             column_id INTEGER NOT NULL REFERENCES columns(id) ON DELETE CASCADE,
             title TEXT NOT NULL,
             details TEXT NOT NULL DEFAULT '',
-            position INTEGER NOT NULL
+            position INTEGER NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            entered_at INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_columns_board_position ON columns(board_id, position);
+        CREATE INDEX IF NOT EXISTS idx_cards_column_position ON cards(column_id, position);
+        CREATE TABLE IF NOT EXISTS archived_cards (
+            id INTEGER PRIMARY KEY,
+            column_id INTEGER NOT NULL REFERENCES columns(id) ON DELETE CASCADE,
+            title TEXT NOT NULL,
+            details TEXT NOT NULL DEFAULT '',
+            archived_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ', 'now'))
+        );
+        CREATE INDEX IF NOT EXISTS idx_archived_cards_column ON archived_cards(column_id);
+        CREATE TABLE IF NOT EXISTS conversations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            summary TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS idx_conversations_user ON conversations(user_id);
+        CREATE TABLE IF NOT EXISTS conversation_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id INTEGER NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL
         );
+        CREATE INDEX IF NOT EXISTS idx_conversation_messages_conversation
+            ON conversation_messages(conversation_id, id);
+        CREATE TABLE IF NOT EXISTS chat_requests (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            requested_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_chat_requests_user ON chat_requests(user_id, requested_at);
+        CREATE TABLE IF NOT EXISTS chat_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            status TEXT NOT NULL DEFAULT 'queued',
+            request TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_until REAL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_chat_jobs_status ON chat_jobs(status, lease_until);
+        CREATE INDEX IF NOT EXISTS idx_chat_jobs_user ON chat_jobs(user_id, status);
+        CREATE TABLE IF NOT EXISTS chat_idempotency (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            key TEXT NOT NULL,
+            request_hash TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            result TEXT,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (user_id, key)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS column_activity (
+            column_id INTEGER NOT NULL REFERENCES columns(id) ON DELETE CASCADE,
+            day TEXT NOT NULL,
+            created INTEGER NOT NULL DEFAULT 0,
+            moved_in INTEGER NOT NULL DEFAULT 0,
+            moved_out INTEGER NOT NULL DEFAULT 0,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (column_id, day)
+        ) WITHOUT ROWID;
     """)
-    # Seed the default user if not present
-    existing = conn.execute("SELECT id FROM users WHERE username = 'user'").fetchone()
-    if not existing:
-        conn.execute(
-            "INSERT INTO users (username, password_hash) VALUES (?, ?)",
-            ("user", bcrypt.hashpw(b"password", bcrypt.gensalt()).decode()),
-        )
+    # Columns added after the first release; CREATE TABLE IF NOT EXISTS skips them.
+    _add_column(conn, "boards", "version INTEGER NOT NULL DEFAULT 0")
+    _add_column(conn, "cards", "version INTEGER NOT NULL DEFAULT 0")
+    for definition in (
+        "card_count INTEGER NOT NULL DEFAULT 0",
+        "entered_at_sum INTEGER NOT NULL DEFAULT 0",
+        "dwell_seconds INTEGER NOT NULL DEFAULT 0",
+        "dwell_exits INTEGER NOT NULL DEFAULT 0",
+    ):
+        _add_column(conn, "columns", definition)
+    if _add_column(conn, "cards", "entered_at INTEGER NOT NULL DEFAULT 0"):
+        rebuild_column_stats(conn)
+        conn.commit()
+    if _add_column(conn, "conversations", "updated_at INTEGER NOT NULL DEFAULT 0"):
+        # Existing conversations count as active now, not as expired.
+        conn.execute("UPDATE conversations SET updated_at = ?", (int(time.time()),))
         conn.commit()
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_conversations_updated ON conversations(updated_at)"
+    )
+    if not seed:
+        return
+    conn.execute(
+        "INSERT OR IGNORE INTO users (username, password_hash) VALUES (?, ?)",
+        ("user", SEED_PASSWORD_HASH),
+    )
+    conn.commit()
+
+
+def init_storage() -> None:
+    """Create the schema in every database file; seed the default user in its own."""
+    seed_path = db_path_for("user")
+    for path in all_db_paths():
+        conn = get_db(path)
+        try:
+            init_db(conn, seed=path == seed_path)
+        finally:
+            conn.close()
 
 
-def get_conn() -> Generator[sqlite3.Connection, None, None]:
-    conn = get_db()
+@contextmanager
+def read_connection(db_path: Path | None = None) -> Iterator[sqlite3.Connection]:
+    pool = get_read_pool(db_path)
+    conn = pool.acquire()
     try:
         yield conn
     finally:
-        conn.close()
+        pool.release(conn)
+
+
+def get_board_id(conn: sqlite3.Connection, username: str) -> int | None:
+    """Return the user's board id, or None if it has not been provisioned yet."""
+    row = conn.execute(
+        """SELECT b.id FROM boards b
+           JOIN users u ON b.user_id = u.id
+           WHERE u.username = ? AND EXISTS (SELECT 1 FROM columns WHERE board_id = b.id)""",
+        (username,),
+    ).fetchone()
+    return row["id"] if row else None
 
 
 def ensure_board_for_user(conn: sqlite3.Connection, username: str) -> int:
+    """Create and seed the user's board if needed. The caller commits."""
     user = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
     if not user:
         raise ValueError(f"User {username} not found")
@@ -99,17 +475,21 @@ def ensure_board_for_user(conn: sqlite3.Connection, username: str) -> int:
         "SELECT 1 FROM columns WHERE board_id = ? LIMIT 1", (board_id,)
     ).fetchone()
     if not has_columns:
+        now = int(time.time())
         for pos, col_title in enumerate(SEED_COLUMNS):
             col_cur = conn.execute(
                 "INSERT INTO columns (board_id, title, position) VALUES (?, ?, ?)",
                 (board_id, col_title, pos),
             )
             col_id = col_cur.lastrowid
-            for card_pos, (card_title, card_details) in enumerate(SEED_CARDS.get(col_title, [])):
+            cards = SEED_CARDS.get(col_title, [])
+            for card_pos, (card_title, card_details) in enumerate(cards):
                 conn.execute(
-                    "INSERT INTO cards (column_id, title, details, position) VALUES (?, ?, ?, ?)",
-                    (col_id, card_title, card_details, card_pos),
+                    "INSERT INTO cards (column_id, title, details, position, entered_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (col_id, card_title, card_details, card_pos, now),
                 )
+            if cards:
+                count_cards(conn, col_id, "created", len(cards), len(cards) * now)
 
-    conn.commit()
     return board_id
@@ -0,0 +1,63 @@
+"""Cached readiness state for /api/health/ready.
+
+Probes hit readiness far more often than anything changes, so the checks
+(SELECT 1 on every database file, pool and writer stats, dead writer
+threads, AI configuration and circuit state) run on a background task every HEALTH_REFRESH_SECONDS
+and probes read the last result. The first probe before the task has run checks inline.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+import ai
+import database
+import writer
+
+log = logging.getLogger(__name__)
+
+HEALTH_REFRESH_SECONDS = float(os.environ.get("HEALTH_REFRESH_SECONDS", "5"))
+
+
+class ReadinessProbe:
+    def __init__(self, interval: float = HEALTH_REFRESH_SECONDS):
+        self.interval = interval
+        self._state: dict | None = None
+
+    def check(self) -> dict:
+        databases = {}
+        for path in database.all_db_paths():
+            try:
+                with database.read_connection(path) as conn:
+                    conn.execute("SELECT 1")
+                databases[path.name] = True
+            except Exception as exc:
+                log.warning("Readiness check failed for %s: %s", path, exc)
+                databases[path.name] = False
+        failed_writers = writer.failed_writers()
+        self._state = {
+            "ready": all(databases.values()) and not failed_writers,
+            "checked_at": time.time(),
+            "databases": databases,
+            "read_pools": database.read_pool_stats(),
+            "writer_queue_depth": writer.queue_depths(),
+            "failed_writers": failed_writers,
+            "ai": {
+                "configured": bool(os.environ.get("OPENROUTER_API_KEY")),
+                "circuit": ai.resilience.breaker.state,
+            },
+        }
+        return self._state
+
+    @property
+    def state(self) -> dict:
+        return self._state if self._state is not None else self.check()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.to_thread(self.check)
+            await asyncio.sleep(self.interval)
+
+
+readiness = ReadinessProbe()
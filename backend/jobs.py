@@ -0,0 +1,180 @@
+"""Background runner for chat jobs.
+
+A job is a row in the chat_jobs table, so it outlives the process that
+accepted it. The worker process that owns the background work (see
+background.py) polls for claimable jobs every CHAT_JOB_POLL_SECONDS, or at
+once when it queues one itself, and runs them on a pool of CHAT_JOB_WORKERS
+threads; jobs queued through other workers wait for its next poll. Claims go
+through the writer, so even two owners in turn never take the same job, and
+a user's jobs run one at a time.
+
+A claim is a lease: if the process dies mid-job, any worker claims the job
+again once CHAT_JOB_LEASE_SECONDS have passed, up to CHAT_JOB_MAX_ATTEMPTS
+times. Each claim is a numbered attempt, and only the attempt holding the
+claim can record an outcome: a successful job commits its result in the
+same transaction as its board edits, so a lapsed attempt writes neither. On
+a clean shutdown, jobs claimed but not started are put back and running
+ones are waited for, up to CHAT_JOB_SHUTDOWN_SECONDS.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from background import background
+from storage import LeaseLostError, get_repository
+
+log = logging.getLogger(__name__)
+
+CHAT_JOB_WORKERS = int(os.environ.get("CHAT_JOB_WORKERS", "4"))
+CHAT_JOB_POLL_SECONDS = float(os.environ.get("CHAT_JOB_POLL_SECONDS", "1"))
+# Must outlast a job: the AI deadline for the reply (AI_JOB_TIMEOUT_SECONDS,
+# checked to be shorter) plus its writes.
+CHAT_JOB_LEASE_SECONDS = float(os.environ.get("CHAT_JOB_LEASE_SECONDS", "120"))
+CHAT_JOB_MAX_ATTEMPTS = int(os.environ.get("CHAT_JOB_MAX_ATTEMPTS", "3"))
+# Finished jobs can be polled for this long.
+CHAT_JOB_KEEP_SECONDS = float(os.environ.get("CHAT_JOB_KEEP_SECONDS", "86400"))
+# How long shutdown waits for running jobs before closing the database.
+CHAT_JOB_SHUTDOWN_SECONDS = float(os.environ.get("CHAT_JOB_SHUTDOWN_SECONDS", "30"))
+
+
+class JobFailedError(Exception):
+    """A job failed for a reason the user should see, e.g. the board changed."""
+
+
+class JobRunner:
+    def __init__(
+        self,
+        handler: Callable[[str, dict, tuple[int, int]], None],
+        workers: int = CHAT_JOB_WORKERS,
+        poll_seconds: float = CHAT_JOB_POLL_SECONDS,
+        lease_seconds: float = CHAT_JOB_LEASE_SECONDS,
+        max_attempts: int = CHAT_JOB_MAX_ATTEMPTS,
+        keep_seconds: float = CHAT_JOB_KEEP_SECONDS,
+    ):
+        # handler(username, request, (job id, attempt)) runs the job and
+        # records its result with record_chat_turn(job=...); it raises
+        # JobFailedError, or LeaseLostError if the claim has lapsed.
+        self.handler = handler
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.keep_seconds = keep_seconds
+        self._pool: ThreadPoolExecutor | None = None
+        self._idle = threading.Condition()
+        self._active = 0
+        self._waiting: dict[tuple[str, int], dict] = {}  # claimed, not started
+        self._closed = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wake: asyncio.Event | None = None
+
+    def wake(self) -> None:
+        """Look for jobs now rather than at the next poll."""
+        loop, event = self._loop, self._wake
+        if loop is not None and event is not None:
+            loop.call_soon_threadsafe(event.set)
+
+    def run_once(self) -> int:
+        """Claim as many jobs as there are idle threads and start them."""
+        if not background.owned():
+            return 0
+        with self._idle:
+            free = self.workers - self._active
+            if free <= 0 or self._closed:
+                return 0
+            jobs = get_repository().claim_chat_jobs(
+                time.time(), self.lease_seconds, free, self.max_attempts
+            )
+            self._active += len(jobs)
+            if jobs and self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="chat-job")
+            for job in jobs:
+                self._waiting[job["username"], job["id"]] = job
+                self._pool.submit(self._run, job)
+        return len(jobs)
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Wait until no claimed job is left; return whether that happened."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._active == 0, timeout)
+
+    def _run(self, job: dict) -> None:
+        with self._idle:
+            if self._closed:
+                return  # shutdown() has put it back
+            del self._waiting[job["username"], job["id"]]
+        status, error = "done", None
+        try:
+            self.handler(job["username"], json.loads(job["request"]), (job["id"], job["attempt"]))
+        except LeaseLostError:
+            log.warning("Chat job %d attempt %d lost its claim", job["id"], job["attempt"])
+            status = "lost"
+        except JobFailedError as exc:
+            status, error = "failed", str(exc)
+        except Exception:
+            log.exception("Chat job %d failed", job["id"])
+            status, error = "failed", "The job failed unexpectedly."
+        try:
+            if status == "failed" and not get_repository().finish_chat_job(
+                job["username"], job["id"], job["attempt"], status, None, error, time.time()
+            ):
+                status = "lost"
+        except Exception:
+            # The lease runs out and another attempt is made.
+            log.exception("Failed to record the outcome of chat job %d", job["id"])
+        finally:
+            with self._idle:
+                self._active -= 1
+                self._idle.notify_all()
+        metrics.incr(f"chat.jobs.{status}")
+        self.wake()  # a thread is free
+
+    async def run(self) -> None:
+        self._wake = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        with self._idle:
+            self._closed = False
+        try:
+            while True:
+                self._wake.clear()
+                try:
+                    await asyncio.to_thread(self.run_once)
+                except Exception:
+                    log.exception("Claiming chat jobs failed")
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._loop = None
+
+    def shutdown(self) -> None:
+        """Stop claiming and put back jobs that have not started.
+
+        Running jobs carry on; call join() to wait for them before closing
+        the database. Any still running after that write nothing, and are
+        retried once their lease ends.
+        """
+        with self._idle:
+            self._closed = True
+            waiting = list(self._waiting.values())
+            self._waiting.clear()
+            self._active -= len(waiting)
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        for job in waiting:
+            try:
+                get_repository().finish_chat_job(
+                    job["username"], job["id"], job["attempt"], "queued", None, None,
+                    time.time(),
+                )
+            except Exception:
+                log.exception("Failed to put back chat job %d", job["id"])
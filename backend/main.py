@@ -1,26 +1,56 @@
+import asyncio
+import logging
 import os
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse
 
-from database import get_db, init_db
+import metrics
+from auth import get_current_user
+from background import background
+from database import close_read_pools, init_storage
+from health import readiness
+from jobs import CHAT_JOB_SHUTDOWN_SECONDS
+from maintenance import scheduler
+from resilience import ProviderUnavailableError
+from response_compression import CompressionMiddleware
 from routers.auth import router as auth_router
 from routers.board import router as board_router
-from routers.chat import router as chat_router
+from routers.chat import chat_jobs, router as chat_router
+from static_files import PrecompressedStaticFiles
+from storage import IdempotencyKeyReusedError, NotFoundError, PreconditionFailedError
+from timing import ServerTimingMiddleware
+from writer import WriterUnavailableError, close_writers
+
+log = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    conn = get_db()
-    init_db(conn)
-    conn.close()
+    init_storage()
+    maintenance_task = asyncio.create_task(scheduler.run())
+    readiness_task = asyncio.create_task(readiness.run())
+    chat_jobs_task = asyncio.create_task(chat_jobs.run())
     yield
+    maintenance_task.cancel()
+    readiness_task.cancel()
+    chat_jobs_task.cancel()
+    chat_jobs.shutdown()
+    # Running jobs need the writers to record their outcome.
+    if not await asyncio.to_thread(chat_jobs.join, CHAT_JOB_SHUTDOWN_SECONDS):
+        log.warning("Closing with chat jobs still running; they will be retried")
+    background.release()
+    close_writers()
+    close_read_pools()
 
 
 app = FastAPI(title="Kanban Studio API", lifespan=lifespan)
+# Compression runs inside Server-Timing so its cost shows up as a phase.
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ServerTimingMiddleware)
 
 cors_origins = os.environ.get("CORS_ORIGINS", "").split(",")
 cors_origins = [o.strip() for o in cors_origins if o.strip()]
@@ -33,6 +63,42 @@ if cors_origins:
         allow_headers=["*"],
     )
 
+
+@app.exception_handler(NotFoundError)
+async def not_found_handler(request: Request, exc: NotFoundError):
+    return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"detail": str(exc)})
+
+
+@app.exception_handler(PreconditionFailedError)
+async def precondition_failed_handler(request: Request, exc: PreconditionFailedError):
+    return JSONResponse(
+        status_code=status.HTTP_412_PRECONDITION_FAILED, content={"detail": str(exc)}
+    )
+
+
+@app.exception_handler(IdempotencyKeyReusedError)
+async def idempotency_key_reused_handler(request: Request, exc: IdempotencyKeyReusedError):
+    return JSONResponse(status_code=422, content={"detail": str(exc)})
+
+
+@app.exception_handler(WriterUnavailableError)
+async def writer_unavailable_handler(request: Request, exc: WriterUnavailableError):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "The database is unavailable right now. Try again shortly."},
+        headers={"Retry-After": "5"},
+    )
+
+
+@app.exception_handler(ProviderUnavailableError)
+async def provider_unavailable_handler(request: Request, exc: ProviderUnavailableError):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "The AI assistant is unavailable right now. Try again shortly."},
+        headers={"Retry-After": "30"},
+    )
+
+
 app.include_router(auth_router)
 app.include_router(board_router)
 app.include_router(chat_router)
@@ -42,13 +108,29 @@ STATIC_DIR = Path(__file__).parent / "static"
 
 @app.get("/api/health")
 def health():
-    conn = get_db()
-    try:
-        conn.execute("SELECT 1")
-    finally:
-        conn.close()
+    status_text = "ok" if readiness.state["ready"] else "unavailable"
+    return {"status": status_text}
+
+
+@app.get("/api/health/live")
+async def health_live():
+    # Runs on the event loop with no I/O: answers as long as the process does.
     return {"status": "ok"}
 
 
+@app.get("/api/health/ready")
+def health_ready(response: Response):
+    state = readiness.state
+    if not state["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return state
+
+
+@app.get("/api/metrics")
+def get_metrics(username: str = Depends(get_current_user)):
+    # Queue depths, latencies and AI failure counts are not for anonymous callers.
+    return {**metrics.snapshot(), "maintenance": scheduler.stats}
+
+
 STATIC_DIR.mkdir(exist_ok=True)
-app.mount("/", StaticFiles(directory=STATIC_DIR, html=True), name="static")
+app.mount("/", PrecompressedStaticFiles(STATIC_DIR), name="static")
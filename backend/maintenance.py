@@ -0,0 +1,213 @@
+"""Background SQLite maintenance: WAL checkpoints, PRAGMA optimize,
+incremental vacuum, the done-column archive policy and expiry of idle chat
+conversations, run from the app lifespan during quiet periods.
+
+A task is due once its interval has elapsed since it last ran (or since
+startup). Due tasks only run when nothing has been committed for
+MAINTENANCE_QUIET_SECONDS, so they never compete with user edits for the
+write lock. Commits from other worker processes are noticed through each
+file's PRAGMA data_version. An interval of 0 disables that task. Only the
+worker process that owns the background work (see background.py) runs them.
+
+Tasks that change rows or free pages go through the writer queue like any
+other mutation; only the checkpoint and PRAGMA optimize use a connection of
+their own.
+
+Incremental vacuum only frees pages in files created with incremental
+auto-vacuum. Older files need a one-off full VACUUM, which rewrites the
+file, blocks writers until it is done and needs free disk space equal to
+the file's size, so it is never run automatically. Run it once, ideally
+with the app stopped, from backend/:
+
+    python -m maintenance enable-incremental-vacuum
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import sys
+import time
+
+import database
+from background import background
+from storage.sqlite import archive_overflow
+from writer import last_write_at, submit
+
+log = logging.getLogger(__name__)
+
+INTERVALS = {
+    "checkpoint": float(os.environ.get("MAINTENANCE_CHECKPOINT_INTERVAL", "300")),
+    "optimize": float(os.environ.get("MAINTENANCE_OPTIMIZE_INTERVAL", "3600")),
+    "vacuum": float(os.environ.get("MAINTENANCE_VACUUM_INTERVAL", "3600")),
+    "archive": float(os.environ.get("MAINTENANCE_ARCHIVE_INTERVAL", "3600")),
+    "conversations": float(os.environ.get("MAINTENANCE_CONVERSATIONS_INTERVAL", "3600")),
+}
+# Cards kept in each board's last ("done") column; the rest are archived.
+ARCHIVE_DONE_LIMIT = int(os.environ.get("ARCHIVE_DONE_LIMIT", "100"))
+# Conversations without a new turn for this long are deleted with their messages.
+CONVERSATION_RETENTION_DAYS = float(os.environ.get("CHAT_CONVERSATION_RETENTION_DAYS", "30"))
+QUIET_SECONDS = float(os.environ.get("MAINTENANCE_QUIET_SECONDS", "30"))
+TICK_SECONDS = 5.0
+
+
+def _checkpoint(conn: sqlite3.Connection) -> dict:
+    busy, wal_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    return {"busy": bool(busy), "wal_pages": wal_pages, "checkpointed": checkpointed}
+
+
+def _optimize(conn: sqlite3.Connection) -> dict:
+    # Bound the ANALYZE work optimize may trigger on large tables.
+    conn.execute("PRAGMA analysis_limit=400")
+    conn.execute("PRAGMA optimize")
+    return {}
+
+
+def _vacuum(conn: sqlite3.Connection) -> dict:
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        # Needs enable_incremental_vacuum() first; counted so stats show it.
+        return {"freed_pages": 0, "unconverted_files": 1}
+    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    conn.execute("PRAGMA incremental_vacuum").fetchall()
+    after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {"freed_pages": before - after}
+
+
+def enable_incremental_vacuum(conn: sqlite3.Connection) -> bool:
+    """Switch the file to incremental auto-vacuum; returns whether it had to."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+def _archive(conn: sqlite3.Connection) -> dict:
+    archived = archive_overflow(conn, ARCHIVE_DONE_LIMIT)
+    return {"archived_cards": archived}
+
+
+def _expire_conversations(conn: sqlite3.Connection) -> dict:
+    cutoff = time.time() - CONVERSATION_RETENTION_DAYS * 86400
+    # Messages go with them through ON DELETE CASCADE.
+    deleted = conn.execute("DELETE FROM conversations WHERE updated_at < ?", (cutoff,)).rowcount
+    return {"expired_conversations": deleted}
+
+
+TASKS = {
+    "checkpoint": _checkpoint,
+    "optimize": _optimize,
+    "vacuum": _vacuum,
+    "archive": _archive,
+    "conversations": _expire_conversations,
+}
+# Run on the writer, inside its transaction; the others need none.
+WRITER_TASKS = {"vacuum", "archive", "conversations"}
+
+
+class MaintenanceScheduler:
+    def __init__(
+        self,
+        intervals: dict[str, float] | None = None,
+        quiet_seconds: float = QUIET_SECONDS,
+        tick_seconds: float = TICK_SECONDS,
+    ):
+        self.intervals = dict(intervals or INTERVALS)
+        self.quiet_seconds = quiet_seconds
+        self.tick_seconds = tick_seconds
+        self.stats: dict[str, dict] = {}
+        started = time.monotonic()
+        self._last_run = {name: started for name in TASKS}
+        self._versions: dict = {}
+        self._last_seen_write = 0.0
+        self._own_write = 0.0  # last_write_at() after our own tasks ran
+
+    def _saw_write(self) -> bool:
+        """Whether any database file changed since the previous call."""
+        versions = {path: database.data_version(path) for path in database.all_db_paths()}
+        changed = versions != self._versions
+        self._versions = versions
+        return changed
+
+    def due(self, now: float) -> list[str]:
+        return [
+            name for name, interval in self.intervals.items()
+            if interval > 0 and now - self._last_run[name] >= interval
+        ]
+
+    def run_tasks(self, names: list[str]) -> None:
+        paths = database.all_db_paths()
+        for name in names:
+            start = time.perf_counter()
+            result: dict = {}
+            for path in paths:
+                try:
+                    if name in WRITER_TASKS:
+                        outcome = submit(TASKS[name], path)
+                    else:
+                        conn = database.get_db(path)
+                        try:
+                            outcome = TASKS[name](conn)
+                        finally:
+                            conn.close()
+                    # Sum counts across shards; any busy checkpoint marks the run busy.
+                    for key, value in outcome.items():
+                        if key == "busy":
+                            result[key] = result.get(key, False) or value
+                        else:
+                            result[key] = result.get(key, 0) + value
+                except Exception as exc:
+                    log.exception("Maintenance task %s failed on %s", name, path)
+                    result["error"] = str(exc)
+            self._last_run[name] = time.monotonic()
+            self.stats[name] = {
+                "last_run": time.time(),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                "runs": self.stats.get(name, {}).get("runs", 0) + 1,
+                **result,
+            }
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            if not background.owned():
+                continue
+            now = time.monotonic()
+            if self._saw_write():
+                self._last_seen_write = now
+            # Our own commits are not user activity.
+            last_write = last_write_at() if last_write_at() != self._own_write else 0.0
+            if now - max(last_write, self._last_seen_write) < self.quiet_seconds:
+                continue
+            names = self.due(now)
+            if names:
+                await asyncio.to_thread(self.run_tasks, names)
+                self._own_write = last_write_at()
+                self._saw_write()
+
+
+scheduler = MaintenanceScheduler()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="One-off SQLite maintenance commands.")
+    parser.add_argument("command", choices=["enable-incremental-vacuum"])
+    parser.parse_args()
+    for path in database.all_db_paths():
+        if not path.exists():
+            continue
+        conn = database.get_db(path)
+        try:
+            start = time.perf_counter()
+            converted = enable_incremental_vacuum(conn)
+        except sqlite3.Error as exc:
+            sys.exit(f"maintenance: {path}: {exc}")
+        finally:
+            conn.close()
+        state = f"converted in {time.perf_counter() - start:.1f}s" if converted else "already incremental"
+        print(f"{path}: {state}")
+
+
+if __name__ == "__main__":
+    main()
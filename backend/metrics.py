@@ -0,0 +1,47 @@
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters: dict[str, float] = defaultdict(float)
+_gauges: dict[str, float] = {}
+_summaries: dict[str, dict[str, float]] = {}
+
+
+def incr(name: str, value: float = 1) -> None:
+    with _lock:
+        _counters[name] += value
+
+
+def set_gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, value: float) -> None:
+    """Record one sample into a count/sum/max summary."""
+    with _lock:
+        summary = _summaries.get(name)
+        if summary is None:
+            _summaries[name] = {"count": 1, "sum": value, "max": value}
+        else:
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "summaries": {
+                name: {**s, "avg": s["sum"] / s["count"]} for name, s in _summaries.items()
+            },
+        }
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _summaries.clear()
@@ -0,0 +1,82 @@
+"""Split a single kanban.db into per-user shard files for STORAGE_MODE=sharded.
+
+Each user, with their board, columns and cards, is copied into the shard
+their username hashes to; row IDs are preserved. The source database is left
+untouched. Run from backend/ while the app is stopped:
+
+    python -m migrate_shards data/kanban.db data/shards --shards 16
+"""
+
+import argparse
+import sqlite3
+from pathlib import Path
+
+from database import get_db, init_db, rebuild_column_stats, shard_for, shard_path
+
+# Tables in dependency order, each with a filter selecting the source rows
+# owned by users already copied into the shard (the "main" database).
+SHARD_TABLES = [
+    ("users", "shard_for(username) = :shard"),
+    ("boards", "user_id IN (SELECT id FROM main.users)"),
+    ("columns", "board_id IN (SELECT id FROM main.boards)"),
+    ("cards", "column_id IN (SELECT id FROM main.columns)"),
+    ("column_activity", "column_id IN (SELECT id FROM main.columns)"),
+    ("archived_cards", "column_id IN (SELECT id FROM main.columns)"),
+    ("conversations", "user_id IN (SELECT id FROM main.users)"),
+    ("conversation_messages", "conversation_id IN (SELECT id FROM main.conversations)"),
+    ("chat_jobs", "user_id IN (SELECT id FROM main.users)"),
+    ("chat_idempotency", "user_id IN (SELECT id FROM main.users)"),
+]
+
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def split_database(src: Path, dest_dir: Path, shard_count: int) -> dict[int, int]:
+    """Copy src into shard_count shard files in dest_dir; returns users per shard."""
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    users_per_shard = {}
+    for shard in range(shard_count):
+        conn = get_db(shard_path(shard, dest_dir))
+        try:
+            init_db(conn, seed=False)
+            conn.create_function(
+                "shard_for", 1, lambda name: shard_for(name, shard_count), deterministic=True
+            )
+            conn.execute("ATTACH DATABASE ? AS src", (str(src),))
+            for table, where in SHARD_TABLES:
+                # Copy only columns both schemas have, so older sources still split.
+                main_cols = _columns(conn, "main", table)
+                shared = [c for c in _columns(conn, "src", table) if c in main_cols]
+                if not shared:
+                    continue  # table added after the source was created
+                cols = ", ".join(shared)
+                conn.execute(
+                    f"INSERT INTO main.{table} ({cols}) SELECT {cols} FROM src.{table} WHERE {where}",
+                    {"shard": shard},
+                )
+            # Sources from before board stats have no counters to copy.
+            rebuild_column_stats(conn)
+            conn.commit()
+            users_per_shard[shard] = conn.execute("SELECT COUNT(*) FROM main.users").fetchone()[0]
+            conn.execute("DETACH DATABASE src")
+        finally:
+            conn.close()
+    return users_per_shard
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", type=Path)
+    parser.add_argument("dest_dir", type=Path)
+    parser.add_argument("--shards", type=int, default=16)
+    args = parser.parse_args()
+
+    counts = split_database(args.source, args.dest_dir, args.shards)
+    for shard, users in counts.items():
+        print(f"shard {shard:03d}: {users} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ class CardOut(BaseModel):
     title: str
     details: str
     position: int
+    version: int = 0
 
 
 class ColumnOut(BaseModel):
@@ -21,6 +22,55 @@ class BoardOut(BaseModel):
     id: int
     name: str
     columns: list[ColumnOut]
+    version: int = 0
+
+
+class ColumnActivityOut(BaseModel):
+    created: int
+    moved_in: int
+    moved_out: int
+    deleted: int
+
+
+class ColumnStatsOut(BaseModel):
+    id: int
+    title: str
+    position: int
+    cards: int
+    # Mean time the cards now in the column have been there.
+    avg_age_seconds: float | None
+    # Mean time spent here by cards that have since moved to another column.
+    avg_time_in_column_seconds: float | None
+    activity: ColumnActivityOut
+
+
+class BoardStatsOut(BaseModel):
+    id: int
+    version: int
+    days: int
+    cards: int
+    created: int
+    moved: int
+    deleted: int
+    columns: list[ColumnStatsOut]
+
+
+class ArchivedCardOut(BaseModel):
+    id: int
+    column_id: int
+    column_title: str
+    title: str
+    details: str
+    archived_at: str
+
+
+class RestoreCardRequest(BaseModel):
+    column_id: int | None = None
+
+
+class ImportResult(BaseModel):
+    columns: int
+    cards: int
 
 
 class RenameColumnRequest(BaseModel):
@@ -84,6 +134,8 @@ class ChatMessage(BaseModel):
 
 class ChatRequest(BaseModel):
     message: str = Field(max_length=5000)
+    # Server-side conversation to continue; history is ignored when it is set.
+    conversation_id: int | None = None
     history: list[ChatMessage] = Field(default=[], max_length=50)
 
 
@@ -91,3 +143,20 @@ class ChatResponse(BaseModel):
     message: str
     board_updates: list[CreateCardOp | UpdateCardOp | MoveCardOp | DeleteCardOp] = []
     board: BoardOut
+    conversation_id: int | None = None
+
+
+# A finished turn as stored for replays and job results; the board is read when sent.
+class ChatTurn(BaseModel):
+    message: str
+    board_updates: list[CreateCardOp | UpdateCardOp | MoveCardOp | DeleteCardOp] = []
+    conversation_id: int | None = None
+
+
+class ChatJobOut(BaseModel):
+    id: int
+    status: Literal["queued", "running", "done", "failed"]
+    # The ChatResponse the synchronous call would have returned, once done,
+    # with the board as it is when polled.
+    result: ChatResponse | None = None
+    error: str | None = None
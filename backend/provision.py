@@ -0,0 +1,121 @@
+"""Create user accounts in bulk, each with a ready-made board.
+
+Reads "username,password" CSV rows from a file (or - for stdin), hashes the
+passwords on a thread pool, which runs in parallel because bcrypt releases
+the GIL, and creates the users PROVISION_CHUNK_SIZE at a time, one
+transaction per chunk and database file. Each board is a copy of a
+template: the default seed board, or with --template-user the current board
+of an existing user. Because boards exist before the first login, logging
+in and loading the board only read. Usernames that already exist are
+skipped before any hashing, so a rerun only pays for new accounts, and a
+malformed line stops the run after the chunks before it. Run from backend/:
+
+    python -m provision users.csv --workers 8 --template-user alice
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from database import SEED_TEMPLATE, close_read_pools, init_storage
+from storage import BoardRepository, BoardTemplate, NotFoundError, get_repository
+from writer import close_writers
+
+PROVISION_CHUNK_SIZE = int(os.environ.get("PROVISION_CHUNK_SIZE", "1000"))
+# Work factor for new hashes; login cost follows it. bcrypt's default is 12.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+
+
+def template_from_board(board: dict) -> BoardTemplate:
+    """A board payload, as load_board returns it, reduced to a template."""
+    return [
+        (col["title"], [(card["title"], card["details"]) for card in col["cards"]])
+        for col in board["columns"]
+    ]
+
+
+def read_users(lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+    for line_no, row in enumerate(csv.reader(lines), 1):
+        if not row:
+            continue
+        if len(row) != 2 or not row[0].strip() or not row[1]:
+            raise ValueError(f"Line {line_no}: expected username,password")
+        yield row[0].strip(), row[1]
+
+
+def _chunks(rows: Iterable[tuple[str, str]], size: int) -> Iterator[list[tuple[str, str]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def provision(
+    repo: BoardRepository,
+    users: Iterable[tuple[str, str]],
+    template: BoardTemplate = SEED_TEMPLATE,
+    *,
+    workers: int | None = None,
+    chunk_size: int = PROVISION_CHUNK_SIZE,
+    rounds: int = BCRYPT_ROUNDS,
+) -> dict:
+    """Create the users that don't exist yet; returns {"created", "skipped"}."""
+
+    def hash_password(password: str) -> str:
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+    total = created = 0
+    with ThreadPoolExecutor(workers or os.cpu_count() or 1) as pool:
+        for chunk in _chunks(users, chunk_size):
+            total += len(chunk)
+            fresh = [(name, password) for name, password in chunk if repo.get_user(name) is None]
+            hashes = pool.map(hash_password, [password for _, password in fresh])
+            created += repo.provision_users(
+                [(name, hashed) for (name, _), hashed in zip(fresh, hashes)], template
+            )
+    return {"created": created, "skipped": total - created}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("users", help='CSV file of username,password rows, or "-" for stdin')
+    parser.add_argument("--template-user", help="copy this user's board instead of the seed")
+    parser.add_argument("--workers", type=int, help="hashing threads (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=PROVISION_CHUNK_SIZE)
+    parser.add_argument("--rounds", type=int, default=BCRYPT_ROUNDS, help="bcrypt work factor")
+    args = parser.parse_args()
+
+    init_storage()
+    repo = get_repository()
+    try:
+        template = SEED_TEMPLATE
+        if args.template_user:
+            template = template_from_board(repo.load_board(args.template_user))
+        source = sys.stdin if args.users == "-" else open(args.users, newline="")
+        started = time.perf_counter()
+        with source:
+            result = provision(
+                repo, read_users(source), template,
+                workers=args.workers, chunk_size=args.chunk_size, rounds=args.rounds,
+            )
+    except (NotFoundError, OSError, ValueError) as exc:
+        sys.exit(f"provision: {exc}")
+    finally:
+        close_writers()
+        close_read_pools()
+    elapsed = time.perf_counter() - started
+    print(f"created {result['created']} users, skipped {result['skipped']} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Deadlines, bounded retries, a circuit breaker and hedging for provider calls.
+
+ResiliencePolicy.call(fn) runs fn(timeout) under one overall deadline:
+retryable failures (timeouts, connection errors, 408/409/429/5xx) are
+retried with full-jitter backoff up to max_retries times, each attempt
+getting whatever is left of the deadline as its timeout. Consecutive
+failures open the circuit breaker, which then fails calls immediately
+until reset_seconds have passed and a single trial call succeeds. With
+hedging on, an attempt still running after the observed p95 latency gets a
+second identical request and the first to succeed wins; only use it for
+calls without side effects.
+"""
+
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TypeVar
+
+import metrics
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_RETRYABLE_NAMES = {"APITimeoutError", "APIConnectionError"}
+
+
+class ProviderUnavailableError(RuntimeError):
+    """The provider could not answer within the deadline or the circuit is open."""
+
+
+class CircuitOpenError(ProviderUnavailableError):
+    pass
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    if type(exc).__name__ in _RETRYABLE_NAMES:
+        return True
+    return getattr(exc, "status_code", None) in RETRYABLE_STATUS
+
+
+class CircuitBreaker:
+    STATES = ("closed", "half_open", "open")
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = "closed"
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half_open"
+            return self._state
+
+    def allow(self) -> None:
+        with self._lock:
+            if self._state == "open":
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    raise CircuitOpenError(f"{self.name} circuit is open")
+                self._set_state("half_open")
+            if self._state == "half_open":
+                # One trial call at a time decides whether to close again.
+                if self._trial_running:
+                    raise CircuitOpenError(f"{self.name} circuit is half-open")
+                self._trial_running = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_running = False
+            self._set_state("closed")
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    metrics.incr(f"{self.name}.circuit_opened")
+                self._opened_at = time.monotonic()
+                self._set_state("open")
+
+    def release(self) -> None:
+        """End a half-open trial that neither succeeded nor failed the provider."""
+        with self._lock:
+            self._trial_running = False
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+        metrics.set_gauge(f"{self.name}.circuit_state", self.STATES.index(state))
+
+
+class LatencyWindow:
+    def __init__(self, size: int = 200):
+        self._samples: deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self, min_samples: int) -> float | None:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            return statistics.quantiles(self._samples, n=20)[-1]
+
+
+class ResiliencePolicy:
+    def __init__(
+        self,
+        name: str,
+        *,
+        timeout: float,
+        max_retries: int,
+        breaker: CircuitBreaker,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 8.0,
+        hedge: bool = False,
+        hedge_min_samples: int = 20,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.breaker = breaker
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyWindow()
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+
+    def call(self, fn: Callable[[float], T]) -> T:
+        deadline = time.monotonic() + self.timeout
+        last_error: Exception | None = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                backoff = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** (attempt - 1)))
+                if time.monotonic() + backoff >= deadline:
+                    break
+                metrics.incr(f"{self.name}.retries")
+                time.sleep(backoff)
+            self.breaker.allow()
+            started = time.monotonic()
+            try:
+                result = self._attempt(fn, deadline - started)
+            except Exception as exc:
+                if not is_retryable(exc):
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                metrics.incr(f"{self.name}.failures")
+                last_error = exc
+                continue
+            self.latency.add(time.monotonic() - started)
+            self.breaker.record_success()
+            return result
+        raise ProviderUnavailableError(f"{self.name} provider did not answer in time") from last_error
+
+    def _attempt(self, fn: Callable[[float], T], timeout: float) -> T:
+        hedge_after = self.latency.p95(self.hedge_min_samples) if self.hedge else None
+        if hedge_after is None or hedge_after >= timeout:
+            return fn(timeout)
+
+        executor = self._get_executor()
+        started = time.monotonic()
+        primary = executor.submit(fn, timeout)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+        metrics.incr(f"{self.name}.hedged")
+        hedge = executor.submit(fn, max(timeout - (time.monotonic() - started), 0.001))
+        pending: set[Future] = {primary, hedge}
+        error: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        metrics.incr(f"{self.name}.hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(8, thread_name_prefix=f"{self.name}-hedge")
+            return self._executor
@@ -0,0 +1,115 @@
+"""Negotiated compression for API responses.
+
+Board and chat payloads are repetitive JSON that compresses very well.
+Responses under /api/ are compressed when they are a single body of at least
+COMPRESS_MIN_BYTES with a compressible content type and the client accepts
+zstd or gzip; zstd is preferred. Streaming
+responses (more_body, e.g. SSE) pass through untouched so events are not
+held back. Time spent compressing is reported as the "compress" phase of
+Server-Timing and in the compression.ms metric.
+
+A compressed body is a different representation, so a strong ETag gets the
+encoding appended ("board-7" becomes "board-7-gzip"), as static files do. A
+304 answering a client that holds the encoded form carries that form back.
+"""
+
+import gzip
+import os
+import time
+
+import zstandard
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import metrics
+from static_files import _etags, accepted_encodings, encoded_etag
+from timing import record
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/html")
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def _gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _zstd(body: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    accepted = accepted_encodings(accept_encoding)
+    if "zstd" in accepted:
+        return "zstd"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+_COMPRESSORS = {"gzip": _gzip, "zstd": _zstd}
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, prefix: str = "/api/") -> None:
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message | None = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                # Held back until the body shows whether this is a single chunk.
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            headers = MutableHeaders(scope=start_message)
+            body = message.get("body", b"")
+            etag = headers.get("etag", "")
+            if start_message["status"] == 304 and etag.startswith('"'):
+                tag = encoded_etag(etag, encoding)
+                if tag in _etags(Headers(scope=scope).get("if-none-match", "")):
+                    headers["ETag"] = tag
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                or len(body) < COMPRESS_MIN_BYTES
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            started = time.perf_counter()
+            compressed = _COMPRESSORS[encoding](body)
+            elapsed = time.perf_counter() - started
+            record("compress", elapsed)
+            metrics.observe("compression.ms", elapsed * 1000)
+            metrics.observe("compression.ratio", len(compressed) / len(body))
+            metrics.incr(f"compression.{encoding}")
+
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            if etag.startswith('"'):  # weak ones already allow any encoding
+                headers["ETag"] = encoded_etag(etag, encoding)
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
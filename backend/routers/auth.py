@@ -1,11 +1,10 @@
-import sqlite3
-
 import bcrypt
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 
 from auth import create_token, get_current_user
-from database import get_conn
+from storage import BoardRepository, get_repository
+from timing import phase
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
@@ -25,15 +24,16 @@ class UserResponse(BaseModel):
 
 
 @router.post("/login", response_model=LoginResponse)
-def login(body: LoginRequest, conn: sqlite3.Connection = Depends(get_conn)):
-    row = conn.execute(
-        "SELECT username, password_hash FROM users WHERE username = ?",
-        (body.username,),
-    ).fetchone()
-    if not row or not bcrypt.checkpw(body.password.encode(), row["password_hash"].encode()):
+def login(body: LoginRequest, repo: BoardRepository = Depends(get_repository)):
+    user = repo.get_user(body.username)
+    with phase("auth"):
+        valid = bool(user) and bcrypt.checkpw(body.password.encode(), user["password_hash"].encode())
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials"
         )
+    # Provision here so the board read path never has to write.
+    repo.ensure_board(body.username)
     token = create_token(body.username)
     return LoginResponse(token=token, username=body.username)
 
@@ -1,310 +1,420 @@
-import logging
-import sqlite3
+import asyncio
+import json
+import os
+import re
+from collections.abc import AsyncIterator, Iterator
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 
 from auth import get_current_user
-from database import get_conn, ensure_board_for_user
 from models import (
-    AIResponse,
+    ArchivedCardOut,
     BoardOut,
+    BoardStatsOut,
     CardOut,
     ColumnOut,
     CreateCardRequest,
+    ImportResult,
     MoveCardRequest,
     RenameColumnRequest,
+    RestoreCardRequest,
     UpdateCardRequest,
 )
-
-log = logging.getLogger(__name__)
+from static_files import etag_matches
+from storage import BoardRepository, PreconditionFailedError, get_repository
+from timing import phase
 
 router = APIRouter(prefix="/api/board", tags=["board"])
 
-
-def _load_board(conn: sqlite3.Connection, username: str) -> BoardOut:
-    board_id = ensure_board_for_user(conn, username)
-    board = conn.execute("SELECT id, name FROM boards WHERE id = ?", (board_id,)).fetchone()
-    cols = conn.execute(
-        "SELECT id, title, position FROM columns WHERE board_id = ? ORDER BY position",
-        (board_id,),
-    ).fetchall()
-    columns = []
-    for col in cols:
-        cards = conn.execute(
-            "SELECT id, title, details, position FROM cards WHERE column_id = ? ORDER BY position",
-            (col["id"],),
-        ).fetchall()
-        columns.append(
-            ColumnOut(
-                id=col["id"],
-                title=col["title"],
-                position=col["position"],
-                cards=[CardOut(**dict(c)) for c in cards],
-            )
+# Cards per write transaction during NDJSON import.
+IMPORT_CHUNK_SIZE = int(os.environ.get("BOARD_IMPORT_CHUNK_SIZE", "5000"))
+# Longest NDJSON line accepted by import; a longer one gets 413.
+IMPORT_MAX_LINE_BYTES = int(os.environ.get("BOARD_IMPORT_MAX_LINE_BYTES", str(1024 * 1024)))
+EXPORT_LINES_PER_CHUNK = 1000
+
+# Compressed responses tag the same version with the encoding appended.
+_ENTITY_TAG = re.compile(r'"(board|card)-(\d+)(?:-(?:br|gzip|zstd))?"')
+
+
+def board_etag(version: int) -> str:
+    return f'"board-{version}"'
+
+
+class IfMatch:
+    """Versions named by an If-Match header; None where the header names none.
+
+    The board's ETag is "board-<version>" and each card carries a version the
+    client can send as "card-<version>". A missing header or * checks nothing.
+    """
+
+    __slots__ = ("board", "card")
+
+    def __init__(self, board: int | None = None, card: int | None = None):
+        self.board = board
+        self.card = card
+
+    def board_only(self) -> int | None:
+        if self.card is not None:
+            raise PreconditionFailedError("This request can only be conditional on the board")
+        return self.board
+
+
+def if_match(if_match: str | None = Header(default=None)) -> IfMatch:
+    versions = IfMatch()
+    if if_match is None or if_match.strip() == "*":
+        return versions
+    for tag in if_match.split(","):
+        match = _ENTITY_TAG.fullmatch(tag.strip())
+        # A weak or unknown tag can never match a current version.
+        if match is None or getattr(versions, match[1]) is not None:
+            raise PreconditionFailedError("If-Match must name one board and/or one card version")
+        setattr(versions, match[1], int(match[2]))
+    return versions
+
+
+def _load_board(repo: BoardRepository, username: str) -> BoardOut:
+    payload = repo.load_board(username)
+    # Rows come straight from our own storage, so skip pydantic validation.
+    with phase("serialize"):
+        return BoardOut.model_construct(
+            id=payload["id"],
+            name=payload["name"],
+            version=payload["version"],
+            columns=[
+                ColumnOut.model_construct(
+                    id=col["id"],
+                    title=col["title"],
+                    position=col["position"],
+                    cards=[CardOut.model_construct(**c) for c in col["cards"]],
+                )
+                for col in payload["columns"]
+            ],
         )
-    return BoardOut(id=board["id"], name=board["name"], columns=columns)
-
-
-def _verify_column_ownership(conn, column_id: int, username: str) -> int:
-    """Returns board_id if column belongs to user, else raises 404."""
-    row = conn.execute(
-        """SELECT b.id AS board_id FROM columns c
-           JOIN boards b ON c.board_id = b.id
-           JOIN users u ON b.user_id = u.id
-           WHERE c.id = ? AND u.username = ?""",
-        (column_id, username),
-    ).fetchone()
-    if not row:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Column not found")
-    return row["board_id"]
-
-
-def _verify_card_ownership(conn, card_id: int, username: str) -> dict:
-    """Returns card row if it belongs to user, else raises 404."""
-    row = conn.execute(
-        """SELECT ca.id, ca.column_id, ca.title, ca.details, ca.position
-           FROM cards ca
-           JOIN columns c ON ca.column_id = c.id
-           JOIN boards b ON c.board_id = b.id
-           JOIN users u ON b.user_id = u.id
-           WHERE ca.id = ? AND u.username = ?""",
-        (card_id, username),
-    ).fetchone()
-    if not row:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Card not found")
-    return dict(row)
-
-
-def _reindex_column(conn, column_id: int) -> None:
-    cards = conn.execute(
-        "SELECT id FROM cards WHERE column_id = ? ORDER BY position", (column_id,)
-    ).fetchall()
-    for i, card in enumerate(cards):
-        conn.execute("UPDATE cards SET position = ? WHERE id = ?", (i, card["id"]))
+
+
+def _board_response(
+    repo: BoardRepository,
+    username: str,
+    status_code: int = status.HTTP_200_OK,
+    if_none_match: str | None = None,
+) -> Response:
+    """Encode the board straight to JSON bytes, tagged with its version.
+
+    Returning a Response bypasses FastAPI's response_model re-validation; the
+    response_model on each route is kept for the OpenAPI schema.
+    """
+    payload = repo.load_board(username)
+    etag = board_etag(payload["version"])
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    with phase("serialize"):
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+    return Response(
+        content=body, status_code=status_code, media_type="application/json",
+        headers={"ETag": etag},
+    )
 
 
 @router.get("", response_model=BoardOut)
-def get_board(conn: sqlite3.Connection = Depends(get_conn), username: str = Depends(get_current_user)):
-    return _load_board(conn, username)
+def get_board(
+    repo: BoardRepository = Depends(get_repository),
+    username: str = Depends(get_current_user),
+    if_none_match: str | None = Header(default=None),
+):
+    return _board_response(repo, username, if_none_match=if_none_match)
+
+
+@router.get("/stats", response_model=BoardStatsOut)
+def board_stats(
+    days: int = Query(default=7, ge=1, le=90),
+    repo: BoardRepository = Depends(get_repository),
+    username: str = Depends(get_current_user),
+):
+    """Card counts, time in column and activity tallies over the last `days` UTC days."""
+    return repo.board_stats(username, days)
 
 
 @router.put("/columns/{column_id}", response_model=BoardOut)
 def rename_column(
     column_id: int,
     body: RenameColumnRequest,
-    conn: sqlite3.Connection = Depends(get_conn),
+    repo: BoardRepository = Depends(get_repository),
     username: str = Depends(get_current_user),
+    expected: IfMatch = Depends(if_match),
 ):
-    _verify_column_ownership(conn, column_id, username)
-    conn.execute("UPDATE columns SET title = ? WHERE id = ?", (body.title, column_id))
-    conn.commit()
-    return _load_board(conn, username)
+    repo.rename_column(username, column_id, body.title, board_version=expected.board_only())
+    return _board_response(repo, username)
 
 
 @router.post("/cards", response_model=BoardOut, status_code=status.HTTP_201_CREATED)
 def create_card(
     body: CreateCardRequest,
-    conn: sqlite3.Connection = Depends(get_conn),
+    repo: BoardRepository = Depends(get_repository),
     username: str = Depends(get_current_user),
+    expected: IfMatch = Depends(if_match),
 ):
-    _verify_column_ownership(conn, body.column_id, username)
-    max_pos = conn.execute(
-        "SELECT COALESCE(MAX(position), -1) AS mp FROM cards WHERE column_id = ?",
-        (body.column_id,),
-    ).fetchone()["mp"]
-    conn.execute(
-        "INSERT INTO cards (column_id, title, details, position) VALUES (?, ?, ?, ?)",
-        (body.column_id, body.title, body.details, max_pos + 1),
+    repo.create_card(
+        username, body.column_id, body.title, body.details, board_version=expected.board_only()
     )
-    conn.commit()
-    return _load_board(conn, username)
+    return _board_response(repo, username, status.HTTP_201_CREATED)
 
 
 @router.put("/cards/{card_id}", response_model=BoardOut)
 def update_card(
     card_id: int,
     body: UpdateCardRequest,
-    conn: sqlite3.Connection = Depends(get_conn),
+    repo: BoardRepository = Depends(get_repository),
     username: str = Depends(get_current_user),
+    expected: IfMatch = Depends(if_match),
 ):
-    card = _verify_card_ownership(conn, card_id, username)
-    title = body.title if body.title is not None else card["title"]
-    details = body.details if body.details is not None else card["details"]
-    conn.execute(
-        "UPDATE cards SET title = ?, details = ? WHERE id = ?",
-        (title, details, card_id),
+    repo.update_card(
+        username, card_id, body.title, body.details,
+        board_version=expected.board, card_version=expected.card,
     )
-    conn.commit()
-    return _load_board(conn, username)
+    return _board_response(repo, username)
 
 
 @router.delete("/cards/{card_id}", response_model=BoardOut)
 def delete_card(
     card_id: int,
-    conn: sqlite3.Connection = Depends(get_conn),
+    repo: BoardRepository = Depends(get_repository),
     username: str = Depends(get_current_user),
+    expected: IfMatch = Depends(if_match),
 ):
-    card = _verify_card_ownership(conn, card_id, username)
-    conn.execute("DELETE FROM cards WHERE id = ?", (card_id,))
-    _reindex_column(conn, card["column_id"])
-    conn.commit()
-    return _load_board(conn, username)
+    repo.delete_card(username, card_id, board_version=expected.board, card_version=expected.card)
+    return _board_response(repo, username)
 
 
 @router.put("/cards/{card_id}/move", response_model=BoardOut)
 def move_card(
     card_id: int,
     body: MoveCardRequest,
-    conn: sqlite3.Connection = Depends(get_conn),
+    repo: BoardRepository = Depends(get_repository),
+    username: str = Depends(get_current_user),
+    expected: IfMatch = Depends(if_match),
+):
+    repo.move_card(
+        username, card_id, body.column_id, body.position,
+        board_version=expected.board, card_version=expected.card,
+    )
+    return _board_response(repo, username)
+
+
+@router.post("/cards/{card_id}/archive", response_model=BoardOut)
+def archive_card(
+    card_id: int,
+    repo: BoardRepository = Depends(get_repository),
+    username: str = Depends(get_current_user),
+    expected: IfMatch = Depends(if_match),
+):
+    repo.archive_card(username, card_id, board_version=expected.board, card_version=expected.card)
+    return _board_response(repo, username)
+
+
+@router.get("/archive", response_model=list[ArchivedCardOut])
+def search_archive(
+    q: str = "",
+    limit: int = Query(default=50, ge=1, le=500),
+    repo: BoardRepository = Depends(get_repository),
     username: str = Depends(get_current_user),
 ):
-    card = _verify_card_ownership(conn, card_id, username)
-    _verify_column_ownership(conn, body.column_id, username)
-    old_column_id = card["column_id"]
-
-    # Build new ordering for source and target columns
-    old_cards = [
-        r["id"] for r in conn.execute(
-            "SELECT id FROM cards WHERE column_id = ? ORDER BY position", (old_column_id,)
-        ).fetchall()
-    ]
-    old_cards.remove(card_id)
-
-    if body.column_id == old_column_id:
-        old_cards.insert(body.position, card_id)
-        for i, cid in enumerate(old_cards):
-            conn.execute("UPDATE cards SET position = ? WHERE id = ?", (i, cid))
-    else:
-        conn.execute(
-            "UPDATE cards SET column_id = ? WHERE id = ?",
-            (body.column_id, card_id),
+    return repo.search_archive(username, q, limit)
+
+
+@router.post("/archive/{card_id}/restore", response_model=BoardOut)
+def restore_card(
+    card_id: int,
+    body: RestoreCardRequest | None = None,
+    repo: BoardRepository = Depends(get_repository),
+    username: str = Depends(get_current_user),
+    expected: IfMatch = Depends(if_match),
+):
+    repo.restore_card(
+        username, card_id, body.column_id if body else None,
+        board_version=expected.board_only(),
+    )
+    return _board_response(repo, username)
+
+
+def _ndjson(records: Iterator[dict]) -> Iterator[str]:
+    batch = []
+    for record in records:
+        batch.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        if len(batch) >= EXPORT_LINES_PER_CHUNK:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+@router.get("/export")
+def export_board(
+    repo: BoardRepository = Depends(get_repository),
+    username: str = Depends(get_current_user),
+):
+    """Stream the board as NDJSON: a board line, column lines, then card lines."""
+    records = repo.export_board(username)
+    # Pull the first record now so a missing board is a 404, not a broken stream.
+    first = next(records)
+
+    def lines() -> Iterator[dict]:
+        yield first
+        yield from records
+
+    return StreamingResponse(
+        _ndjson(lines()),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="board.ndjson"'},
+    )
+
+
+def _invalid(line_no: int, reason: str) -> HTTPException:
+    return HTTPException(status_code=422, detail=f"Line {line_no}: {reason}")
+
+
+async def _ndjson_lines(
+    chunks: AsyncIterator[bytes], max_bytes: int
+) -> AsyncIterator[tuple[int, bytes]]:
+    """Yield (line number, line) from a byte stream, including the final
+    unterminated line (which may be empty).
+
+    Only new bytes are scanned for newlines and a partial line is kept as a
+    list of pieces, so a body without newlines costs linear time and at
+    most `max_bytes` of memory before it is rejected.
+    """
+    line_no = 0
+    partial: list[bytes] = []
+    partial_size = 0
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            piece = chunk[start:] if end == -1 else chunk[start:end]
+            partial_size += len(piece)
+            if partial_size > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Line {line_no + 1}: longer than {max_bytes} bytes",
+                )
+            if piece:
+                partial.append(piece)
+            if end == -1:
+                break
+            line_no += 1
+            yield line_no, b"".join(partial)
+            partial, partial_size = [], 0
+            start = end + 1
+    yield line_no + 1, b"".join(partial)
+
+
+class _BoardImporter:
+    """Append NDJSON export records to a user's board in chunked transactions.
+
+    Columns are matched to existing ones by title (or created) when the
+    first card needs them; each chunk appends its cards below the cards the
+    column has when it commits. An expected board version is checked by every
+    write: each chunk moves the version on by one, so a later chunk expects
+    the version the previous one left, and an edit made by anyone else
+    between chunks fails the import with 412.
+    """
+
+    def __init__(
+        self,
+        repo: BoardRepository,
+        username: str,
+        chunk_size: int,
+        board_version: int | None = None,
+    ):
+        self.repo = repo
+        self.username = username
+        self.chunk_size = chunk_size
+        self._board_version = board_version
+        self.columns: dict[int, int] = {}  # exported column id -> column id here
+        self.cards = 0
+        self._pending_columns: list[tuple[int, str]] = []
+        self._rows: list[tuple[int, str, str]] = []
+
+    async def feed(self, line: bytes, line_no: int) -> None:
+        if not line.strip():
+            return
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise _invalid(line_no, "invalid JSON") from None
+        kind = record.get("type") if isinstance(record, dict) else None
+        if kind == "board":
+            return
+        if kind == "column":
+            source, title = record.get("id"), record.get("title")
+            if not isinstance(source, int) or not isinstance(title, str) or not title:
+                raise _invalid(line_no, "column needs an integer id and a title")
+            self._pending_columns.append((source, title))
+            return
+        if kind != "card":
+            raise _invalid(line_no, "type must be board, column or card")
+
+        await self._resolve_columns()
+        source = record.get("column_id")
+        if not isinstance(source, int):
+            raise _invalid(line_no, "card needs an integer column_id")
+        column_id = self.columns.get(source)
+        title, details = record.get("title"), record.get("details", "")
+        if column_id is None:
+            raise _invalid(line_no, "card refers to a column not defined above it")
+        if not isinstance(title, str) or not title or not isinstance(details, str):
+            raise _invalid(line_no, "card needs a title and string details")
+        self._rows.append((column_id, title, details))
+        if len(self._rows) >= self.chunk_size:
+            await self._flush_cards()
+
+    async def finish(self) -> None:
+        await self._resolve_columns()
+        await self._flush_cards()
+
+    async def _resolve_columns(self) -> None:
+        if not self._pending_columns:
+            return
+        pending, self._pending_columns = self._pending_columns, []
+        resolved = await asyncio.to_thread(
+            self.repo.import_columns,
+            self.username,
+            [title for _, title in pending],
+            board_version=self._next_board_version(),
+        )
+        for (source, _), column_id in zip(pending, resolved):
+            self.columns[source] = column_id
+
+    async def _flush_cards(self) -> None:
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        self.cards += await asyncio.to_thread(
+            self.repo.import_cards, self.username, rows, board_version=self._next_board_version()
         )
-        for i, cid in enumerate(old_cards):
-            conn.execute("UPDATE cards SET position = ? WHERE id = ?", (i, cid))
-        target_cards = [
-            r["id"] for r in conn.execute(
-                "SELECT id FROM cards WHERE column_id = ? ORDER BY position", (body.column_id,)
-            ).fetchall()
-        ]
-        target_cards.remove(card_id)
-        target_cards.insert(body.position, card_id)
-        for i, cid in enumerate(target_cards):
-            conn.execute("UPDATE cards SET position = ? WHERE id = ?", (i, cid))
-    conn.commit()
-    return _load_board(conn, username)
-
-
-def apply_board_updates(conn: sqlite3.Connection, ai_response: AIResponse, username: str) -> None:
-    board_id = ensure_board_for_user(conn, username)
-    for op in ai_response.board_updates:
-            try:
-                if op.action == "create_card":
-                    col = conn.execute(
-                        "SELECT c.id FROM columns c JOIN boards b ON c.board_id = b.id "
-                        "JOIN users u ON b.user_id = u.id WHERE c.id = ? AND u.username = ?",
-                        (op.column_id, username),
-                    ).fetchone()
-                    if not col:
-                        log.warning("AI create_card: column %d not found", op.column_id)
-                        continue
-                    max_pos = conn.execute(
-                        "SELECT COALESCE(MAX(position), -1) AS mp FROM cards WHERE column_id = ?",
-                        (op.column_id,),
-                    ).fetchone()["mp"]
-                    conn.execute(
-                        "INSERT INTO cards (column_id, title, details, position) VALUES (?, ?, ?, ?)",
-                        (op.column_id, op.title, op.details, max_pos + 1),
-                    )
-
-                elif op.action == "update_card":
-                    card = conn.execute(
-                        "SELECT ca.id, ca.title, ca.details FROM cards ca "
-                        "JOIN columns c ON ca.column_id = c.id "
-                        "JOIN boards b ON c.board_id = b.id "
-                        "JOIN users u ON b.user_id = u.id "
-                        "WHERE ca.id = ? AND u.username = ?",
-                        (op.card_id, username),
-                    ).fetchone()
-                    if not card:
-                        log.warning("AI update_card: card %d not found", op.card_id)
-                        continue
-                    title = op.title if op.title is not None else card["title"]
-                    details = op.details if op.details is not None else card["details"]
-                    conn.execute(
-                        "UPDATE cards SET title = ?, details = ? WHERE id = ?",
-                        (title, details, op.card_id),
-                    )
-
-                elif op.action == "move_card":
-                    card = conn.execute(
-                        "SELECT ca.id, ca.column_id, ca.title, ca.details FROM cards ca "
-                        "JOIN columns c ON ca.column_id = c.id "
-                        "JOIN boards b ON c.board_id = b.id "
-                        "JOIN users u ON b.user_id = u.id "
-                        "WHERE ca.id = ? AND u.username = ?",
-                        (op.card_id, username),
-                    ).fetchone()
-                    if not card:
-                        log.warning("AI move_card: card %d not found", op.card_id)
-                        continue
-                    target_col = conn.execute(
-                        "SELECT c.id FROM columns c "
-                        "JOIN boards b ON c.board_id = b.id "
-                        "JOIN users u ON b.user_id = u.id "
-                        "WHERE c.id = ? AND u.username = ?",
-                        (op.target_column_id, username),
-                    ).fetchone()
-                    if not target_col:
-                        log.warning("AI move_card: target column %d not found", op.target_column_id)
-                        continue
-                    old_col_id = card["column_id"]
-                    old_cards = [
-                        r["id"] for r in conn.execute(
-                            "SELECT id FROM cards WHERE column_id = ? ORDER BY position",
-                            (old_col_id,),
-                        ).fetchall()
-                    ]
-                    old_cards.remove(op.card_id)
-
-                    if op.target_column_id == old_col_id:
-                        old_cards.insert(op.position, op.card_id)
-                        for i, cid in enumerate(old_cards):
-                            conn.execute("UPDATE cards SET position = ? WHERE id = ?", (i, cid))
-                    else:
-                        conn.execute(
-                            "UPDATE cards SET column_id = ? WHERE id = ?",
-                            (op.target_column_id, op.card_id),
-                        )
-                        for i, cid in enumerate(old_cards):
-                            conn.execute("UPDATE cards SET position = ? WHERE id = ?", (i, cid))
-                        target_cards = [
-                            r["id"] for r in conn.execute(
-                                "SELECT id FROM cards WHERE column_id = ? ORDER BY position",
-                                (op.target_column_id,),
-                            ).fetchall()
-                        ]
-                        target_cards.remove(op.card_id)
-                        target_cards.insert(op.position, op.card_id)
-                        for i, cid in enumerate(target_cards):
-                            conn.execute("UPDATE cards SET position = ? WHERE id = ?", (i, cid))
-
-                elif op.action == "delete_card":
-                    card = conn.execute(
-                        "SELECT ca.id, ca.column_id FROM cards ca "
-                        "JOIN columns c ON ca.column_id = c.id "
-                        "JOIN boards b ON c.board_id = b.id "
-                        "JOIN users u ON b.user_id = u.id "
-                        "WHERE ca.id = ? AND u.username = ?",
-                        (op.card_id, username),
-                    ).fetchone()
-                    if not card:
-                        log.warning("AI delete_card: card %d not found", op.card_id)
-                        continue
-                    conn.execute("DELETE FROM cards WHERE id = ?", (op.card_id,))
-                    _reindex_column(conn, card["column_id"])
-
-            except Exception:
-                log.exception("Failed to apply AI board update: %s", op)
-                continue
-
-    conn.commit()
+
+    def _next_board_version(self) -> int | None:
+        version = self._board_version
+        if version is not None:
+            self._board_version = version + 1
+        return version
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_board(
+    request: Request,
+    repo: BoardRepository = Depends(get_repository),
+    username: str = Depends(get_current_user),
+    expected: IfMatch = Depends(if_match),
+):
+    """Append an NDJSON export to the board.
+
+    The body is parsed as it streams in and written every IMPORT_CHUNK_SIZE
+    cards, each chunk in its own transaction: on a bad line the chunks
+    before it stay imported and the error names the line.
+    """
+    importer = _BoardImporter(repo, username, IMPORT_CHUNK_SIZE, expected.board_only())
+    async for line_no, line in _ndjson_lines(request.stream(), IMPORT_MAX_LINE_BYTES):
+        await importer.feed(line, line_no)
+    await importer.finish()
+    return ImportResult(columns=len(importer.columns), cards=importer.cards)
@@ -1,34 +1,129 @@
-import sqlite3
+import hashlib
+import json
+import logging
+import os
 import time
-from collections import defaultdict
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
 
 from auth import get_current_user
-from ai import chat_with_board, simple_chat
-from database import get_conn
-from models import ChatRequest, ChatResponse
-from routers.board import _load_board, apply_board_updates
+from ai import (
+    AI_JOB_TIMEOUT_SECONDS,
+    chat_with_board,
+    estimate_tokens,
+    job_resilience,
+    simple_chat,
+    summarize_history,
+)
+import metrics
+from jobs import JobFailedError, JobRunner
+from models import BoardOut, BoardStatsOut, ChatJobOut, ChatRequest, ChatResponse, ChatTurn
+from resilience import ProviderUnavailableError
+from routers.board import IfMatch, _load_board, if_match
+from singleflight import SingleFlight
+from storage import BoardRepository, NotFoundError, PreconditionFailedError, get_repository
+from timing import phase
+
+log = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
+# Recorded in the database rather than in memory so the limit holds across
+# worker processes.
 RATE_LIMIT_MAX = 10
 RATE_LIMIT_WINDOW = 60
 
-_request_log: dict[str, list[float]] = defaultdict(list)
+# Once a stored conversation's messages exceed the budget, all but the most
+# recent CHAT_KEEP_RECENT_MESSAGES are folded into its rolling summary.
+CHAT_HISTORY_TOKEN_BUDGET = int(os.environ.get("CHAT_HISTORY_TOKEN_BUDGET", "2000"))
+CHAT_KEEP_RECENT_MESSAGES = int(os.environ.get("CHAT_KEEP_RECENT_MESSAGES", "6"))
+
+# Days of board activity summarized for the model.
+CHAT_STATS_DAYS = 7
+
+# Responses to requests carrying an Idempotency-Key are replayed for this long.
+# Keys are stored in the database, so a retry that reaches another worker
+# process is replayed as well.
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get("CHAT_IDEMPOTENCY_TTL_SECONDS", "600"))
+# A key whose request has not finished after this long is taken to belong to
+# a worker that died, and the next retry runs the request again.
+IDEMPOTENCY_LEASE_SECONDS = float(os.environ.get("CHAT_IDEMPOTENCY_LEASE_SECONDS", "120"))
+
+# Queued or running chat jobs a user may have; more get 429.
+CHAT_JOB_USER_LIMIT = int(os.environ.get("CHAT_JOB_USER_LIMIT", "2"))
+
+# Shared calls hand back the serialized response and its conversation id.
+_inflight: SingleFlight[tuple[str, int | None]] = SingleFlight("chat")
 
 
-def _check_rate_limit(username: str) -> None:
-    now = time.monotonic()
-    timestamps = _request_log[username]
-    _request_log[username] = [t for t in timestamps if now - t < RATE_LIMIT_WINDOW]
-    if len(_request_log[username]) >= RATE_LIMIT_MAX:
+def _check_rate_limit(repo: BoardRepository, username: str) -> None:
+    if not repo.record_chat_request(username, time.time(), RATE_LIMIT_WINDOW, RATE_LIMIT_MAX):
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail="Rate limit exceeded. Try again shortly.",
         )
-    _request_log[username].append(now)
+
+
+def _request_hash(mode: str, body: ChatRequest, board_version: int | None) -> str:
+    payload = json.dumps([mode, body.model_dump(mode="json"), board_version])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _claim_idempotency_key(
+    repo: BoardRepository, username: str, key: str, request_hash: str
+) -> str | None:
+    """Return the stored result of the key's finished request, or None once
+    this request has claimed the key and should run."""
+    state, result = repo.claim_idempotency_key(
+        username, key, request_hash, time.time(),
+        IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_LEASE_SECONDS,
+    )
+    if state == "running":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still in progress.",
+            headers={"Retry-After": "1"},
+        )
+    if state == "done":
+        metrics.incr("chat.idempotent_replays")
+    return result
+
+
+def _conversation_history(conversation: dict) -> list[dict[str, str]]:
+    history = []
+    if conversation["summary"]:
+        history.append({
+            "role": "system",
+            "content": "Summary of the earlier conversation: " + conversation["summary"],
+        })
+    history.extend(conversation["messages"])
+    return history
+
+
+def _compact_conversation(repo: BoardRepository, username: str, conversation_id: int) -> None:
+    """Fold old messages into the summary once the history is over budget.
+
+    Runs after the reply has been sent, so the summarizing call never delays a
+    turn. Until it lands the next turn just sends the longer history.
+    """
+    try:
+        conversation = repo.load_conversation(username, conversation_id)
+        messages = conversation["messages"]
+        tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        if tokens <= CHAT_HISTORY_TOKEN_BUDGET or len(messages) <= CHAT_KEEP_RECENT_MESSAGES:
+            return
+        drop = len(messages) - CHAT_KEEP_RECENT_MESSAGES
+        summary = summarize_history(conversation["summary"], messages[:drop])
+        # Concurrent turns may both get here; only the first one's summary is kept.
+        if repo.compact_conversation(
+            username, conversation_id, conversation["summary"], summary, drop
+        ):
+            metrics.incr("chat.compactions")
+    except Exception:
+        # Keep the full history; the next turn will try again.
+        log.exception("Failed to summarize conversation %d", conversation_id)
 
 
 class ChatTestResponse(BaseModel):
@@ -36,25 +131,224 @@ class ChatTestResponse(BaseModel):
 
 
 @router.post("/test", response_model=ChatTestResponse)
-def chat_test(username: str = Depends(get_current_user)):
-    _check_rate_limit(username)
-    result = simple_chat("What is 2+2? Reply with just the number.")
+def chat_test(
+    repo: BoardRepository = Depends(get_repository),
+    username: str = Depends(get_current_user),
+):
+    _check_rate_limit(repo, username)
+    with phase("ai"):
+        result = simple_chat("What is 2+2? Reply with just the number.")
     return ChatTestResponse(response=result)
 
 
-@router.post("", response_model=ChatResponse)
-def chat(body: ChatRequest, conn: sqlite3.Connection = Depends(get_conn), username: str = Depends(get_current_user)):
-    _check_rate_limit(username)
-    board = _load_board(conn, username)
-    history = [{"role": m.role, "content": m.content} for m in body.history]
-    ai_response = chat_with_board(board, body.message, history)
-
-    if ai_response.board_updates:
-        apply_board_updates(conn, ai_response, username)
+def _run_chat(
+    repo: BoardRepository,
+    username: str,
+    body: ChatRequest,
+    board: BoardOut,
+    board_version: int | None = None,
+    idempotency_key: str | None = None,
+    job: tuple[int, int] | None = None,
+) -> ChatTurn:
+    conversation_id = body.conversation_id
+    if conversation_id is not None:
+        history = _conversation_history(repo.load_conversation(username, conversation_id))
+    else:
+        # Clients that still send history stay stateless; others start a conversation.
+        history = [{"role": m.role, "content": m.content} for m in body.history]
+        if not body.history:
+            # Created first so the stored result can name it; maintenance
+            # expires it if the turn fails.
+            conversation_id = repo.create_conversation(username)
+    # Counters rather than a scan, so this costs the same on any board.
+    stats = BoardStatsOut.model_validate(repo.board_stats(username, CHAT_STATS_DAYS))
+    with phase("ai"):
+        ai_response = chat_with_board(
+            board, body.message, history, stats=stats,
+            policy=job_resilience if job is not None else None,
+        )
 
-    updated_board = _load_board(conn, username)
-    return ChatResponse(
+    result = ChatTurn.model_construct(
         message=ai_response.message,
         board_updates=ai_response.board_updates,
-        board=updated_board,
+        conversation_id=conversation_id,
+    )
+    turn = [("user", body.message), ("assistant", ai_response.message)]
+    # Edits, messages and the stored result commit together, so a retry never
+    # finds the edits applied without a result to replay, and a job whose
+    # claim has lapsed applies nothing. An edit made by the
+    # user during the call does not cost the reply: each op is checked on its
+    # own and skipped if its card is gone. Only a client that pinned the
+    # version with If-Match gets 412.
+    repo.record_chat_turn(
+        username,
+        ai_response.board_updates,
+        conversation_id,
+        turn,
+        result.model_dump_json(),
+        board_version=board_version,
+        idempotency_key=idempotency_key,
+        job=job,
     )
+    return result
+
+
+def _chat_response(repo: BoardRepository, username: str, turn: ChatTurn) -> ChatResponse:
+    return ChatResponse.model_construct(
+        message=turn.message,
+        board_updates=turn.board_updates,
+        board=_load_board(repo, username),
+        conversation_id=turn.conversation_id,
+    )
+
+
+def _chat_job_out(repo: BoardRepository, username: str, job: dict) -> ChatJobOut:
+    result = None
+    if job["result"]:
+        result = _chat_response(repo, username, ChatTurn.model_validate_json(job["result"]))
+    return ChatJobOut(id=job["id"], status=job["status"], result=result, error=job["error"])
+
+
+def _run_chat_job(username: str, request: dict, job: tuple[int, int]) -> None:
+    repo = get_repository()
+    try:
+        # The job works on the board as it is when it starts, unless the
+        # client pinned a version with If-Match.
+        board = _load_board(repo, username)
+        expected_version = request["board_version"]
+        if expected_version is not None and expected_version != board.version:
+            raise PreconditionFailedError("The board has changed")
+        body = ChatRequest.model_validate(request["body"])
+        turn = _run_chat(repo, username, body, board, expected_version, job=job)
+    except (NotFoundError, PreconditionFailedError) as exc:
+        raise JobFailedError(str(exc)) from exc
+    except ProviderUnavailableError as exc:
+        raise JobFailedError("The AI assistant is unavailable right now. Try again later.") from exc
+    # The job is already done; the client need not wait for this.
+    if turn.conversation_id is not None:
+        _compact_conversation(repo, username, turn.conversation_id)
+
+
+chat_jobs = JobRunner(_run_chat_job)
+# A job still waiting on the provider when its claim ends would be run again
+# by another attempt alongside it.
+if AI_JOB_TIMEOUT_SECONDS >= chat_jobs.lease_seconds:
+    raise RuntimeError("AI_JOB_TIMEOUT_SECONDS must be less than CHAT_JOB_LEASE_SECONDS")
+
+
+def _queue_chat_job(
+    repo: BoardRepository,
+    username: str,
+    body: ChatRequest,
+    board_version: int | None,
+    idempotency_key: str | None,
+) -> Response:
+    result = None
+    if idempotency_key:
+        result = _claim_idempotency_key(
+            repo, username, idempotency_key, _request_hash("async", body, board_version)
+        )
+    if result is not None:
+        job = _chat_job_out(repo, username, repo.get_chat_job(username, int(result)))
+    else:
+        try:
+            _check_rate_limit(repo, username)
+            request = json.dumps(
+                {"body": body.model_dump(mode="json"), "board_version": board_version}
+            )
+            job_id = repo.create_chat_job(
+                username, request, time.time(), CHAT_JOB_USER_LIMIT, chat_jobs.keep_seconds,
+                idempotency_key=idempotency_key,
+            )
+            if job_id is None:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many chat jobs in progress. Try again when one has finished.",
+                )
+        except Exception:
+            if idempotency_key:
+                repo.release_idempotency_key(username, idempotency_key)
+            raise
+        metrics.incr("chat.jobs.queued")
+        chat_jobs.wake()
+        job = ChatJobOut(id=job_id, status="queued")
+    return Response(
+        content=job.model_dump_json(),
+        status_code=status.HTTP_202_ACCEPTED,
+        media_type="application/json",
+        headers={
+            "Location": f"/api/chat/jobs/{job.id}",
+            "Preference-Applied": "respond-async",
+        },
+    )
+
+
+@router.post("", response_model=ChatResponse, responses={202: {"model": ChatJobOut}})
+def chat(
+    body: ChatRequest,
+    repo: BoardRepository = Depends(get_repository),
+    username: str = Depends(get_current_user),
+    idempotency_key: str | None = Header(default=None, max_length=255),
+    prefer: str | None = Header(default=None),
+    expected: IfMatch = Depends(if_match),
+):
+    board = _load_board(repo, username)
+    expected_version = expected.board_only()
+    if expected_version is not None and expected_version != board.version:
+        raise PreconditionFailedError("The board has changed")
+    if prefer and "respond-async" in prefer.lower():
+        # For long edits that would outlive proxy timeouts: answer 202 now
+        # and let the client poll GET /api/chat/jobs/{id}.
+        return _queue_chat_job(repo, username, body, expected_version, idempotency_key)
+    if idempotency_key:
+        request_hash = _request_hash("sync", body, expected_version)
+        # Retries within this worker share the call; the stored key covers
+        # retries that reach another worker, and a different body gets 422.
+        key = ("key", username, idempotency_key, request_hash)
+
+        def run() -> tuple[str, int | None]:
+            stored = _claim_idempotency_key(repo, username, idempotency_key, request_hash)
+            if stored is not None:
+                turn = ChatTurn.model_validate_json(stored)
+            else:
+                try:
+                    _check_rate_limit(repo, username)
+                    turn = _run_chat(
+                        repo, username, body, board, expected_version, idempotency_key
+                    )
+                except Exception:
+                    repo.release_idempotency_key(username, idempotency_key)
+                    raise
+            response = _chat_response(repo, username, turn)
+            with phase("serialize"):
+                return response.model_dump_json(), turn.conversation_id
+    else:
+        # Without a key, identical requests against the same board version
+        # share one in-flight call; once the board changes they no longer match.
+        key = ("body", username, body.model_dump_json(), board.version)
+
+        def run() -> tuple[str, int | None]:
+            _check_rate_limit(repo, username)
+            turn = _run_chat(repo, username, body, board, expected_version)
+            response = _chat_response(repo, username, turn)
+            with phase("serialize"):
+                return response.model_dump_json(), turn.conversation_id
+
+    content, conversation_id = _inflight.do(key, run)
+    background = None
+    if conversation_id is not None:
+        background = BackgroundTask(_compact_conversation, repo, username, conversation_id)
+    return Response(content=content, media_type="application/json", background=background)
+
+
+@router.get("/jobs/{job_id}", response_model=ChatJobOut)
+def get_chat_job(
+    job_id: int,
+    response: Response,
+    repo: BoardRepository = Depends(get_repository),
+    username: str = Depends(get_current_user),
+):
+    job = repo.get_chat_job(username, job_id)
+    if job["status"] in ("queued", "running"):
+        response.headers["Retry-After"] = "1"
+    return _chat_job_out(repo, username, job)
@@ -0,0 +1,216 @@
+"""Serve the exported frontend from an in-memory index.
+
+The directory is scanned once when the app is created: every file is read
+into memory with its content type and ETag, so requests never touch the
+filesystem. Compressed variants written at build time by
+`python -m static_files static/` (foo.js.gz, and foo.js.br when the optional
+`brotli` package is installed) are loaded alongside; a missing gzip variant
+is compressed once, on first request. Fingerprinted files under
+/_next/static/ are cached as immutable, everything else is revalidated with
+ETags.
+"""
+
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import threading
+from pathlib import Path
+
+from starlette.types import Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+)
+MIN_COMPRESS_SIZE = 1024
+IMMUTABLE_PREFIX = "/_next/static/"
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+_ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+class _Asset:
+    __slots__ = ("content_type", "etag", "cache_control", "compressible", "variants")
+
+    def __init__(self, content_type: str, etag: str, cache_control: str, compressible: bool):
+        self.content_type = content_type
+        self.etag = etag
+        self.cache_control = cache_control
+        self.compressible = compressible
+        self.variants: dict[str, bytes] = {}
+
+
+def _is_compressible(content_type: str, size: int) -> bool:
+    return size >= MIN_COMPRESS_SIZE and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """The strong ETag of an encoded representation: "x" becomes "x-gzip".
+
+    Each encoding is its own byte sequence, so it gets its own validator.
+    """
+    return etag if encoding == "identity" else etag[:-1] + "-" + encoding + '"'
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """Whether an If-None-Match header names etag in any of its encodings."""
+    return any(
+        tag == "*" or tag == etag
+        or (tag.startswith(etag[:-1] + "-") and tag[len(etag):-1] in ("br", "gzip", "zstd"))
+        for tag in _etags(header)
+    )
+
+
+def accepted_encodings(header: str) -> set[str]:
+    accepted = set()
+    for part in header.split(","):
+        name, *params = part.strip().split(";")
+        q = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticFiles:
+    def __init__(self, directory: Path, html: bool = True):
+        self.directory = directory
+        self.html = html
+        self._lock = threading.Lock()
+        self._index: dict[str, _Asset] = {}
+        self._scan()
+
+    def _scan(self) -> None:
+        if not self.directory.is_dir():
+            return
+        for file in self.directory.rglob("*"):
+            if not file.is_file() or file.suffix in (".gz", ".br"):
+                continue
+            url = "/" + file.relative_to(self.directory).as_posix()
+            content_type = mimetypes.guess_type(file.name)[0] or "application/octet-stream"
+            if content_type.startswith("text/") or content_type == "application/javascript":
+                content_type += "; charset=utf-8"
+            body = file.read_bytes()
+            asset = _Asset(
+                content_type,
+                '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"',
+                IMMUTABLE_CACHE if url.startswith(IMMUTABLE_PREFIX) else REVALIDATE_CACHE,
+                _is_compressible(content_type, len(body)),
+            )
+            asset.variants["identity"] = body
+            if asset.compressible:
+                for encoding, suffix in _ENCODING_SUFFIXES.items():
+                    prebuilt = file.with_name(file.name + suffix)
+                    if prebuilt.is_file():
+                        asset.variants[encoding] = prebuilt.read_bytes()
+            self._index[url] = asset
+
+    def _resolve(self, path: str) -> _Asset | None:
+        asset = self._index.get(path)
+        if asset is None and self.html:
+            base = path.rstrip("/")
+            asset = self._index.get(base + "/index.html") or self._index.get(base + ".html")
+        return asset
+
+    def _variant(self, asset: _Asset, accept_encoding: str) -> tuple[str, bytes]:
+        if not asset.compressible:
+            return "identity", asset.variants["identity"]
+        accepted = accepted_encodings(accept_encoding)
+        if "br" in accepted and "br" in asset.variants:
+            return "br", asset.variants["br"]
+        if "gzip" in accepted:
+            with self._lock:
+                if "gzip" not in asset.variants:
+                    asset.variants["gzip"] = gzip.compress(
+                        asset.variants["identity"], compresslevel=9, mtime=0
+                    )
+            return "gzip", asset.variants["gzip"]
+        return "identity", asset.variants["identity"]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        if scope["method"] not in ("GET", "HEAD"):
+            await _send(send, 405, [(b"allow", b"GET, HEAD")], b"Method Not Allowed")
+            return
+
+        status = 200
+        asset = self._resolve(scope["path"])
+        if asset is None:
+            asset = self._index.get("/404.html") if self.html else None
+            if asset is None:
+                await _send(send, 404, [], b"Not Found")
+                return
+            status = 404
+
+        encoding, body = self._variant(asset, headers.get("accept-encoding", ""))
+        etag = encoded_etag(asset.etag, encoding)
+        response_headers = [
+            (b"content-type", asset.content_type.encode()),
+            (b"cache-control", asset.cache_control.encode()),
+            (b"etag", etag.encode()),
+        ]
+        if asset.compressible:
+            response_headers.append((b"vary", b"Accept-Encoding"))
+        if encoding != "identity":
+            response_headers.append((b"content-encoding", encoding.encode()))
+
+        if status == 200 and etag in _etags(headers.get("if-none-match", "")):
+            await _send(send, 304, response_headers, b"")
+            return
+        response_headers.append((b"content-length", str(len(body)).encode()))
+        await _send(send, status, response_headers, b"" if scope["method"] == "HEAD" else body)
+
+
+def _etags(header: str) -> set[str]:
+    return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
+
+
+async def _send(send: Send, status: int, headers: list[tuple[bytes, bytes]], body: bytes) -> None:
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def precompress(directory: Path) -> int:
+    """Write .gz (and .br, if brotli is installed) next to compressible files."""
+    written = 0
+    for file in directory.rglob("*"):
+        if not file.is_file() or file.suffix in (".gz", ".br"):
+            continue
+        content_type = mimetypes.guess_type(file.name)[0] or ""
+        body = file.read_bytes()
+        if not _is_compressible(content_type, len(body)):
+            continue
+        file.with_name(file.name + ".gz").write_bytes(gzip.compress(body, compresslevel=9, mtime=0))
+        written += 1
+        if brotli is not None:
+            file.with_name(file.name + ".br").write_bytes(brotli.compress(body, quality=11))
+            written += 1
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=precompress.__doc__)
+    parser.add_argument("directory", type=Path)
+    args = parser.parse_args()
+    print(f"wrote {precompress(args.directory)} compressed files")
+
+
+if __name__ == "__main__":
+    main()
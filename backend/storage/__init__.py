@@ -0,0 +1,324 @@
+"""Board storage behind a single repository interface.
+
+Routers talk to a BoardRepository rather than to SQLite directly. The SQLite
+engine is the production implementation; the in-memory engine keeps the
+same behaviour in plain Python objects for tests and microbenchmarks, so
+HTTP and serialization overhead can be profiled without storage costs.
+"""
+
+import os
+from collections.abc import Iterator, Sequence
+from datetime import datetime, timedelta, timezone
+from typing import Protocol
+
+from models import CreateCardOp, DeleteCardOp, MoveCardOp, UpdateCardOp
+
+BoardOp = CreateCardOp | UpdateCardOp | MoveCardOp | DeleteCardOp
+# (column title, [(card title, details)]) in board order.
+BoardTemplate = Sequence[tuple[str, Sequence[tuple[str, str]]]]
+
+
+class NotFoundError(LookupError):
+    """A column, card, board or conversation does not exist or belongs to another user."""
+
+
+class PreconditionFailedError(Exception):
+    """The board or card is no longer at the version the client expected."""
+
+
+class IdempotencyKeyReusedError(Exception):
+    """An Idempotency-Key was sent again with a different request."""
+
+
+class LeaseLostError(Exception):
+    """A job's claim has lapsed and the job was claimed again or has finished."""
+
+
+# Error recorded for a job whose worker kept dying before it could finish.
+JOB_ABANDONED = "The job was interrupted too many times."
+
+
+def activity_since(days: int) -> str:
+    """First UTC day, as YYYY-MM-DD, of the `days`-day window ending today."""
+    return (datetime.now(timezone.utc).date() - timedelta(days=days - 1)).isoformat()
+
+
+_ACTIVITY_FIELDS = ("created", "moved_in", "moved_out", "deleted")
+
+
+def stats_payload(board_id: int, version: int, days: int, columns: list[dict], now: int) -> dict:
+    """Shape per-column counters into a BoardStatsOut dict.
+
+    Each column dict holds id, title, position, card_count, entered_at_sum,
+    dwell_seconds, dwell_exits and its summed activity tallies.
+    """
+    out = []
+    for col in columns:
+        count, exits = col["card_count"], col["dwell_exits"]
+        out.append({
+            "id": col["id"],
+            "title": col["title"],
+            "position": col["position"],
+            "cards": count,
+            "avg_age_seconds": now - col["entered_at_sum"] / count if count else None,
+            "avg_time_in_column_seconds": col["dwell_seconds"] / exits if exits else None,
+            "activity": {field: col[field] for field in _ACTIVITY_FIELDS},
+        })
+    return {
+        "id": board_id,
+        "version": version,
+        "days": days,
+        "cards": sum(c["cards"] for c in out),
+        "created": sum(c["activity"]["created"] for c in out),
+        "moved": sum(c["activity"]["moved_in"] for c in out),
+        "deleted": sum(c["activity"]["deleted"] for c in out),
+        "columns": out,
+    }
+
+
+class BoardRepository(Protocol):
+    """Mutations bump the board's version, and card mutations the card's too.
+
+    Given board_version or card_version, a mutation first checks the current
+    version and raises PreconditionFailedError if it differs.
+    """
+
+    def get_user(self, username: str) -> dict | None:
+        """Return {"username", "password_hash"} or None."""
+
+    def ensure_board(self, username: str) -> int:
+        """Provision the user's board if needed and return its id."""
+
+    def provision_users(
+        self, users: Sequence[tuple[str, str]], template: BoardTemplate
+    ) -> int:
+        """Create (username, password_hash) accounts, each with a copy of template.
+
+        Usernames that already exist are left alone. Returns how many were created.
+        """
+
+    def load_board(self, username: str) -> dict:
+        """Return the board as plain dicts shaped like BoardOut."""
+
+    def board_stats(self, username: str, days: int) -> dict:
+        """Return counters shaped like BoardStatsOut, with activity over the last `days` days.
+
+        Counters are maintained by the writes themselves, so this never
+        looks at individual cards.
+        """
+
+    def rename_column(
+        self, username: str, column_id: int, title: str, *, board_version: int | None = None
+    ) -> None: ...
+
+    def create_card(
+        self,
+        username: str,
+        column_id: int,
+        title: str,
+        details: str,
+        *,
+        board_version: int | None = None,
+    ) -> int: ...
+
+    def update_card(
+        self,
+        username: str,
+        card_id: int,
+        title: str | None,
+        details: str | None,
+        *,
+        board_version: int | None = None,
+        card_version: int | None = None,
+    ) -> None: ...
+
+    def move_card(
+        self,
+        username: str,
+        card_id: int,
+        column_id: int,
+        position: int,
+        *,
+        board_version: int | None = None,
+        card_version: int | None = None,
+    ) -> None: ...
+
+    def delete_card(
+        self,
+        username: str,
+        card_id: int,
+        *,
+        board_version: int | None = None,
+        card_version: int | None = None,
+    ) -> None: ...
+
+    def apply_board_updates(
+        self, username: str, ops: Sequence[BoardOp], *, board_version: int | None = None
+    ) -> None:
+        """Apply AI operations, skipping (and logging) any that fail."""
+
+    def archive_card(
+        self,
+        username: str,
+        card_id: int,
+        *,
+        board_version: int | None = None,
+        card_version: int | None = None,
+    ) -> None:
+        """Move a card out of the board into the archive."""
+
+    def restore_card(
+        self,
+        username: str,
+        card_id: int,
+        column_id: int | None,
+        *,
+        board_version: int | None = None,
+    ) -> None:
+        """Put an archived card back at the end of column_id (default: its old column)."""
+
+    def search_archive(self, username: str, query: str, limit: int) -> list[dict]:
+        """Archived cards matching query in title or details, newest first."""
+
+    def export_board(self, username: str) -> Iterator[dict]:
+        """Yield the board as export records: one "board", then "column"s, then "card"s.
+
+        Rows are produced lazily, so memory does not grow with the board.
+        """
+
+    def import_columns(
+        self, username: str, titles: Sequence[str], *, board_version: int | None = None
+    ) -> list[int]:
+        """Resolve column titles to column ids, creating missing ones."""
+
+    def import_cards(
+        self,
+        username: str,
+        rows: Sequence[tuple[int, str, str]],
+        *,
+        board_version: int | None = None,
+    ) -> int:
+        """Append (column_id, title, details) rows below each column's cards in one
+        transaction; positions are taken from the columns as they are then."""
+
+    def create_conversation(self, username: str) -> int: ...
+
+    def load_conversation(self, username: str, conversation_id: int) -> dict:
+        """Return {"id", "summary", "messages": [{"role", "content"}]}, oldest first."""
+
+    def append_messages(
+        self, username: str, conversation_id: int, messages: Sequence[tuple[str, str]]
+    ) -> None:
+        """Append (role, content) pairs to the conversation."""
+
+    def compact_conversation(
+        self, username: str, conversation_id: int, previous: str, summary: str, drop: int
+    ) -> bool:
+        """Replace the summary and delete the oldest `drop` messages it now covers,
+        unless the summary is no longer `previous` because another compaction
+        got there first; return whether it was replaced."""
+
+    def record_chat_request(self, username: str, now: float, window: float, limit: int) -> bool:
+        """Record a chat request at `now` unless `limit` were made in the last `window`
+        seconds; return whether it was recorded."""
+
+    def record_chat_turn(
+        self,
+        username: str,
+        ops: Sequence[BoardOp],
+        conversation_id: int | None,
+        messages: Sequence[tuple[str, str]],
+        result: str,
+        *,
+        board_version: int | None = None,
+        idempotency_key: str | None = None,
+        job: tuple[int, int] | None = None,
+    ) -> None:
+        """In one transaction, apply AI operations as apply_board_updates does,
+        append messages to the conversation, if any, and store result for a
+        claimed idempotency_key and as the outcome of job, a claimed
+        (job id, attempt).
+
+        Raises LeaseLostError, and writes nothing, if job is no longer
+        running under that attempt.
+        """
+
+    def claim_idempotency_key(
+        self, username: str, key: str, request_hash: str, now: float, ttl: float, lease: float
+    ) -> tuple[str, str | None]:
+        """Claim key for the request hashing to request_hash.
+
+        Returns ("claimed", None) when the caller should run the request,
+        ("done", result) once it has finished, or ("running", None) while a
+        claim younger than `lease` seconds is in progress. Raises
+        IdempotencyKeyReusedError if the key was used for another request.
+        Keys are forgotten `ttl` seconds after they were claimed.
+        """
+
+    def release_idempotency_key(self, username: str, key: str) -> None:
+        """Drop an unfinished claim, so the request runs again when retried."""
+
+    def create_chat_job(
+        self,
+        username: str,
+        request: str,
+        now: float,
+        limit: int,
+        keep: float,
+        *,
+        idempotency_key: str | None = None,
+    ) -> int | None:
+        """Queue a job unless the user has `limit` queued or running; return its id.
+
+        The user's jobs that finished more than `keep` seconds ago are
+        deleted first. A claimed idempotency_key is finished with the job id
+        in the same transaction.
+        """
+
+    def get_chat_job(self, username: str, job_id: int) -> dict:
+        """Return {"id", "status", "result", "error"}."""
+
+    def claim_chat_jobs(
+        self, now: float, lease: float, limit: int, max_attempts: int
+    ) -> list[dict]:
+        """Mark up to `limit` jobs running until `now + lease` and return them as
+        {"id", "username", "request", "attempt"}, attempt counting from 1.
+
+        Claimable jobs are queued ones and running ones whose lease has ended.
+        A user's jobs run one at a time, oldest first. A job already claimed
+        `max_attempts` times fails instead.
+        """
+
+    def finish_chat_job(
+        self,
+        username: str,
+        job_id: int,
+        attempt: int,
+        status: str,
+        result: str | None,
+        error: str | None,
+        now: float,
+    ) -> bool:
+        """Record a claimed job's outcome, or put it back with status "queued".
+
+        Only the attempt that holds the claim can do so; returns whether it did.
+        """
+
+
+STORAGE_ENGINE = os.environ.get("STORAGE_ENGINE", "sqlite")
+
+_repository: BoardRepository | None = None
+
+
+def get_repository() -> BoardRepository:
+    global _repository
+    if _repository is None:
+        if STORAGE_ENGINE == "memory":
+            from storage.memory import MemoryRepository
+
+            _repository = MemoryRepository()
+        else:
+            from storage.sqlite import SqliteRepository
+
+            _repository = SqliteRepository()
+    return _repository
@@ -0,0 +1,748 @@
+"""In-memory BoardRepository for tests and microbenchmarks.
+
+Boards are slotted objects with each column's cards held in a list in
+display order, so a card's position is its list index and moves are list
+operations. IDs come from counters shared across users, as they would from
+SQLite AUTOINCREMENT. Nothing is persisted.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from collections.abc import Iterator, Sequence
+from datetime import datetime, timezone
+
+from database import SEED_PASSWORD_HASH, SEED_TEMPLATE
+from storage import (
+    JOB_ABANDONED,
+    BoardOp,
+    BoardTemplate,
+    IdempotencyKeyReusedError,
+    LeaseLostError,
+    NotFoundError,
+    PreconditionFailedError,
+    activity_since,
+    stats_payload,
+)
+
+log = logging.getLogger(__name__)
+
+
+class _Card:
+    __slots__ = ("id", "column", "title", "details", "version", "entered_at")
+
+    def __init__(self, id: int, column: "_Column", title: str, details: str):
+        self.id = id
+        self.column = column
+        self.title = title
+        self.details = details
+        self.version = 0
+        self.entered_at = 0
+
+
+class _Column:
+    __slots__ = ("id", "owner", "title", "cards", "entered_at_sum", "dwell_seconds",
+                 "dwell_exits", "activity")
+
+    def __init__(self, id: int, owner: str, title: str):
+        self.id = id
+        self.owner = owner
+        self.title = title
+        self.cards: list[_Card] = []
+        # The same counters the SQLite engine keeps on the columns table, updated
+        # by each write through database.count_cards rather than by triggers.
+        self.entered_at_sum = 0
+        self.dwell_seconds = 0
+        self.dwell_exits = 0
+        self.activity: dict[str, dict[str, int]] = {}  # UTC day -> tallies
+
+    def count(self, field: str) -> None:
+        day = datetime.now(timezone.utc).date().isoformat()
+        tallies = self.activity.setdefault(
+            day, {"created": 0, "moved_in": 0, "moved_out": 0, "deleted": 0}
+        )
+        tallies[field] += 1
+
+    def add(self, card: _Card, index: int | None = None) -> None:
+        card.column = self
+        card.entered_at = int(time.time())
+        self.entered_at_sum += card.entered_at
+        if index is None:
+            self.cards.append(card)
+        else:
+            self.cards.insert(index, card)
+
+    def remove(self, card: _Card) -> None:
+        self.cards.remove(card)
+        self.entered_at_sum -= card.entered_at
+
+
+class _ArchivedCard:
+    __slots__ = ("id", "column", "title", "details", "archived_at")
+
+    def __init__(self, card: _Card):
+        self.id = card.id
+        self.column = card.column
+        self.title = card.title
+        self.details = card.details
+        self.archived_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class _Conversation:
+    __slots__ = ("id", "owner", "summary", "messages")
+
+    def __init__(self, id: int, owner: str):
+        self.id = id
+        self.owner = owner
+        self.summary = ""
+        self.messages: list[tuple[str, str]] = []
+
+
+class _Job:
+    __slots__ = ("id", "owner", "status", "request", "result", "error", "attempts",
+                 "lease_until", "updated_at")
+
+    def __init__(self, id: int, owner: str, request: str, now: float):
+        self.id = id
+        self.owner = owner
+        self.status = "queued"
+        self.request = request
+        self.result: str | None = None
+        self.error: str | None = None
+        self.attempts = 0
+        self.lease_until: float | None = None
+        self.updated_at = now
+
+
+class _IdempotencyKey:
+    __slots__ = ("request_hash", "status", "result", "created_at")
+
+    def __init__(self, request_hash: str, now: float):
+        self.request_hash = request_hash
+        self.status = "running"
+        self.result: str | None = None
+        self.created_at = now
+
+
+class _Board:
+    __slots__ = ("id", "name", "columns", "version")
+
+    def __init__(self, id: int, name: str):
+        self.id = id
+        self.name = name
+        self.columns: list[_Column] = []
+        self.version = 0
+
+
+class _User:
+    __slots__ = ("username", "password_hash", "board", "chat_requests")
+
+    def __init__(self, username: str, password_hash: str):
+        self.username = username
+        self.password_hash = password_hash
+        self.board: _Board | None = None
+        self.chat_requests: list[float] = []
+
+
+class MemoryRepository:
+    def __init__(self, seed_user: bool = True):
+        self._lock = threading.Lock()
+        self._users: dict[str, _User] = {}
+        self._columns: dict[int, _Column] = {}
+        self._cards: dict[int, _Card] = {}
+        self._archived: dict[int, _ArchivedCard] = {}
+        self._conversations: dict[int, _Conversation] = {}
+        self._jobs: dict[int, _Job] = {}
+        self._idempotency_keys: dict[tuple[str, str], _IdempotencyKey] = {}
+        self._board_ids = itertools.count(1)
+        self._column_ids = itertools.count(1)
+        self._card_ids = itertools.count(1)
+        self._conversation_ids = itertools.count(1)
+        self._job_ids = itertools.count(1)
+        if seed_user:
+            self.add_user("user", SEED_PASSWORD_HASH)
+
+    def add_user(self, username: str, password_hash: str) -> None:
+        with self._lock:
+            self._users.setdefault(username, _User(username, password_hash))
+
+    def get_user(self, username: str) -> dict | None:
+        user = self._users.get(username)
+        if user is None:
+            return None
+        return {"username": user.username, "password_hash": user.password_hash}
+
+    def ensure_board(self, username: str) -> int:
+        with self._lock:
+            user = self._users.get(username)
+            if user is None:
+                raise ValueError(f"User {username} not found")
+            if user.board is None:
+                self._create_board(user, SEED_TEMPLATE)
+            return user.board.id
+
+    def provision_users(
+        self, users: Sequence[tuple[str, str]], template: BoardTemplate
+    ) -> int:
+        created = 0
+        with self._lock:
+            for username, password_hash in users:
+                if username in self._users:
+                    continue
+                user = self._users[username] = _User(username, password_hash)
+                self._create_board(user, template)
+                created += 1
+        return created
+
+    def load_board(self, username: str) -> dict:
+        with self._lock:
+            user = self._users.get(username)
+            if user is None or user.board is None:
+                raise NotFoundError("Board not found")
+            board = user.board
+            return {
+                "id": board.id,
+                "name": board.name,
+                "version": board.version,
+                "columns": [
+                    {
+                        "id": col.id,
+                        "title": col.title,
+                        "position": pos,
+                        "cards": [
+                            {
+                                "id": c.id, "title": c.title, "details": c.details,
+                                "position": i, "version": c.version,
+                            }
+                            for i, c in enumerate(col.cards)
+                        ],
+                    }
+                    for pos, col in enumerate(board.columns)
+                ],
+            }
+
+    def board_stats(self, username: str, days: int) -> dict:
+        since = activity_since(days)
+        with self._lock:
+            user = self._users.get(username)
+            if user is None or user.board is None:
+                raise NotFoundError("Board not found")
+            board = user.board
+            columns = []
+            for pos, col in enumerate(board.columns):
+                totals = {"created": 0, "moved_in": 0, "moved_out": 0, "deleted": 0}
+                for day, tallies in col.activity.items():
+                    if day >= since:
+                        for field, n in tallies.items():
+                            totals[field] += n
+                columns.append({
+                    "id": col.id, "title": col.title, "position": pos,
+                    "card_count": len(col.cards), "entered_at_sum": col.entered_at_sum,
+                    "dwell_seconds": col.dwell_seconds, "dwell_exits": col.dwell_exits,
+                    **totals,
+                })
+            return stats_payload(board.id, board.version, days, columns, int(time.time()))
+
+    def rename_column(
+        self, username: str, column_id: int, title: str, *, board_version: int | None = None
+    ) -> None:
+        with self._lock:
+            col = self._owned_column(username, column_id)
+            self._bump_board(username, board_version)
+            col.title = title
+
+    def create_card(
+        self,
+        username: str,
+        column_id: int,
+        title: str,
+        details: str,
+        *,
+        board_version: int | None = None,
+    ) -> int:
+        with self._lock:
+            return self._create_card(username, column_id, title, details, board_version)
+
+    def update_card(
+        self,
+        username: str,
+        card_id: int,
+        title: str | None,
+        details: str | None,
+        *,
+        board_version: int | None = None,
+        card_version: int | None = None,
+    ) -> None:
+        with self._lock:
+            self._update_card(username, card_id, title, details, board_version, card_version)
+
+    def move_card(
+        self,
+        username: str,
+        card_id: int,
+        column_id: int,
+        position: int,
+        *,
+        board_version: int | None = None,
+        card_version: int | None = None,
+    ) -> None:
+        with self._lock:
+            self._move_card(username, card_id, column_id, position, board_version, card_version)
+
+    def delete_card(
+        self,
+        username: str,
+        card_id: int,
+        *,
+        board_version: int | None = None,
+        card_version: int | None = None,
+    ) -> None:
+        with self._lock:
+            self._delete_card(username, card_id, board_version, card_version)
+
+    def apply_board_updates(
+        self, username: str, ops: Sequence[BoardOp], *, board_version: int | None = None
+    ) -> None:
+        self.ensure_board(username)
+        with self._lock:
+            self._apply_board_updates(username, ops, board_version)
+
+    def archive_card(
+        self,
+        username: str,
+        card_id: int,
+        *,
+        board_version: int | None = None,
+        card_version: int | None = None,
+    ) -> None:
+        with self._lock:
+            card = self._owned_card(username, card_id)
+            self._delete_card(username, card_id, board_version, card_version)
+            self._archived[card_id] = _ArchivedCard(card)
+
+    def restore_card(
+        self,
+        username: str,
+        card_id: int,
+        column_id: int | None,
+        *,
+        board_version: int | None = None,
+    ) -> None:
+        with self._lock:
+            archived = self._archived.get(card_id)
+            if archived is None or archived.column.owner != username:
+                raise NotFoundError("Archived card not found")
+            target = self._owned_column(
+                username, column_id if column_id is not None else archived.column.id
+            )
+            self._bump_board(username, board_version)
+            card = _Card(card_id, target, archived.title, archived.details)
+            self._cards[card_id] = card
+            target.add(card)
+            target.count("created")
+            del self._archived[card_id]
+
+    def search_archive(self, username: str, query: str, limit: int) -> list[dict]:
+        needle = query.lower()
+        with self._lock:
+            matches = [
+                a for a in self._archived.values()
+                if a.column.owner == username
+                and (needle in a.title.lower() or needle in a.details.lower())
+            ]
+        matches.sort(key=lambda a: (a.archived_at, a.id), reverse=True)
+        return [
+            {
+                "id": a.id,
+                "column_id": a.column.id,
+                "column_title": a.column.title,
+                "title": a.title,
+                "details": a.details,
+                "archived_at": a.archived_at,
+            }
+            for a in matches[:limit]
+        ]
+
+    def export_board(self, username: str) -> Iterator[dict]:
+        # Snapshot under the lock, then yield without holding it.
+        board = self.load_board(username)
+        yield {"type": "board", "name": board["name"]}
+        for col in board["columns"]:
+            yield {"type": "column", **{k: col[k] for k in ("id", "title", "position")}}
+        for col in board["columns"]:
+            for card in col["cards"]:
+                yield {
+                    "type": "card", "id": card["id"], "column_id": col["id"],
+                    **{k: card[k] for k in ("title", "details", "position")},
+                }
+
+    def import_columns(
+        self, username: str, titles: Sequence[str], *, board_version: int | None = None
+    ) -> list[int]:
+        self.ensure_board(username)
+        with self._lock:
+            self._bump_board(username, board_version)
+            board = self._users[username].board
+            resolved = []
+            for title in titles:
+                col = next((c for c in board.columns if c.title == title), None)
+                if col is None:
+                    col = _Column(next(self._column_ids), username, title)
+                    self._columns[col.id] = col
+                    board.columns.append(col)
+                resolved.append(col.id)
+            return resolved
+
+    def import_cards(
+        self,
+        username: str,
+        rows: Sequence[tuple[int, str, str]],
+        *,
+        board_version: int | None = None,
+    ) -> int:
+        with self._lock:
+            columns = [self._owned_column(username, column_id) for column_id, *_ in rows]
+            self._bump_board(username, board_version)
+            for col, (_, title, details) in zip(columns, rows):
+                card = _Card(next(self._card_ids), col, title, details)
+                self._cards[card.id] = card
+                col.add(card)
+                col.count("created")
+            return len(rows)
+
+    def create_conversation(self, username: str) -> int:
+        with self._lock:
+            if username not in self._users:
+                raise NotFoundError("User not found")
+            conversation = _Conversation(next(self._conversation_ids), username)
+            self._conversations[conversation.id] = conversation
+            return conversation.id
+
+    def load_conversation(self, username: str, conversation_id: int) -> dict:
+        with self._lock:
+            conversation = self._owned_conversation(username, conversation_id)
+            return {
+                "id": conversation.id,
+                "summary": conversation.summary,
+                "messages": [
+                    {"role": role, "content": content} for role, content in conversation.messages
+                ],
+            }
+
+    def append_messages(
+        self, username: str, conversation_id: int, messages: Sequence[tuple[str, str]]
+    ) -> None:
+        with self._lock:
+            self._owned_conversation(username, conversation_id).messages.extend(messages)
+
+    def compact_conversation(
+        self, username: str, conversation_id: int, previous: str, summary: str, drop: int
+    ) -> bool:
+        with self._lock:
+            conversation = self._owned_conversation(username, conversation_id)
+            if conversation.summary != previous:
+                return False
+            conversation.summary = summary
+            del conversation.messages[:drop]
+            return True
+
+    def record_chat_request(self, username: str, now: float, window: float, limit: int) -> bool:
+        with self._lock:
+            user = self._users.get(username)
+            if user is None:
+                raise NotFoundError("User not found")
+            user.chat_requests = [t for t in user.chat_requests if now - t < window]
+            if len(user.chat_requests) >= limit:
+                return False
+            user.chat_requests.append(now)
+            return True
+
+    def record_chat_turn(
+        self,
+        username: str,
+        ops: Sequence[BoardOp],
+        conversation_id: int | None,
+        messages: Sequence[tuple[str, str]],
+        result: str,
+        *,
+        board_version: int | None = None,
+        idempotency_key: str | None = None,
+        job: tuple[int, int] | None = None,
+    ) -> None:
+        if ops:
+            self.ensure_board(username)
+        with self._lock:
+            # Check everything that can fail before changing anything.
+            conversation = (
+                self._owned_conversation(username, conversation_id)
+                if conversation_id is not None else None
+            )
+            claimed = self._claimed_job(username, *job) if job is not None else None
+            if job is not None and claimed is None:
+                raise LeaseLostError(f"Chat job {job[0]} is no longer held by attempt {job[1]}")
+            if ops:
+                self._apply_board_updates(username, ops, board_version)
+            if conversation is not None:
+                conversation.messages.extend(messages)
+            if idempotency_key is not None:
+                self._finish_idempotency_key(username, idempotency_key, result)
+            if claimed is not None:
+                claimed.status, claimed.result = "done", result
+                claimed.lease_until, claimed.updated_at = None, time.time()
+
+    def claim_idempotency_key(
+        self, username: str, key: str, request_hash: str, now: float, ttl: float, lease: float
+    ) -> tuple[str, str | None]:
+        with self._lock:
+            if username not in self._users:
+                raise NotFoundError("User not found")
+            for (owner, k), record in list(self._idempotency_keys.items()):
+                if owner == username and (
+                    record.created_at <= now - ttl
+                    or (record.status == "running" and record.created_at <= now - lease)
+                ):
+                    del self._idempotency_keys[owner, k]
+            record = self._idempotency_keys.get((username, key))
+            if record is None:
+                self._idempotency_keys[username, key] = _IdempotencyKey(request_hash, now)
+                return "claimed", None
+            if record.request_hash != request_hash:
+                raise IdempotencyKeyReusedError(
+                    "Idempotency-Key was already used for another request"
+                )
+            return record.status, record.result
+
+    def release_idempotency_key(self, username: str, key: str) -> None:
+        with self._lock:
+            record = self._idempotency_keys.get((username, key))
+            if record is not None and record.status == "running":
+                del self._idempotency_keys[username, key]
+
+    def create_chat_job(
+        self,
+        username: str,
+        request: str,
+        now: float,
+        limit: int,
+        keep: float,
+        *,
+        idempotency_key: str | None = None,
+    ) -> int | None:
+        with self._lock:
+            if username not in self._users:
+                raise NotFoundError("User not found")
+            for job in list(self._jobs.values()):
+                if (job.owner == username and job.status in ("done", "failed")
+                        and job.updated_at < now - keep):
+                    del self._jobs[job.id]
+            pending = sum(
+                1 for job in self._jobs.values()
+                if job.owner == username and job.status in ("queued", "running")
+            )
+            if pending >= limit:
+                return None
+            job = _Job(next(self._job_ids), username, request, now)
+            self._jobs[job.id] = job
+            if idempotency_key is not None:
+                self._finish_idempotency_key(username, idempotency_key, str(job.id))
+            return job.id
+
+    def get_chat_job(self, username: str, job_id: int) -> dict:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.owner != username:
+                raise NotFoundError("Job not found")
+            return {"id": job.id, "status": job.status, "result": job.result, "error": job.error}
+
+    def claim_chat_jobs(
+        self, now: float, lease: float, limit: int, max_attempts: int
+    ) -> list[dict]:
+        with self._lock:
+            busy = {
+                job.owner for job in self._jobs.values()
+                if job.status == "running" and job.lease_until >= now
+            }
+            claimed = []
+            for job in self._jobs.values():  # insertion order is id order
+                if len(claimed) >= limit:
+                    break
+                expired = job.status == "running" and job.lease_until < now
+                if job.owner in busy or not (job.status == "queued" or expired):
+                    continue
+                busy.add(job.owner)
+                job.lease_until, job.updated_at = None, now
+                if job.attempts >= max_attempts:
+                    job.status, job.error = "failed", JOB_ABANDONED
+                    continue
+                job.status, job.lease_until = "running", now + lease
+                job.attempts += 1
+                claimed.append({
+                    "id": job.id, "username": job.owner, "request": job.request,
+                    "attempt": job.attempts,
+                })
+            return claimed
+
+    def finish_chat_job(
+        self,
+        username: str,
+        job_id: int,
+        attempt: int,
+        status: str,
+        result: str | None,
+        error: str | None,
+        now: float,
+    ) -> bool:
+        with self._lock:
+            job = self._claimed_job(username, job_id, attempt)
+            if job is None:
+                return False
+            if status == "queued":
+                job.attempts -= 1
+            job.status, job.result, job.error = status, result, error
+            job.lease_until, job.updated_at = None, now
+            return True
+
+    # --- Helpers below assume the lock is held. ---
+
+    def _apply_board_updates(
+        self, username: str, ops: Sequence[BoardOp], board_version: int | None
+    ) -> None:
+        self._bump_board(username, board_version)
+        for op in ops:
+            try:
+                if op.action == "create_card":
+                    self._create_card(username, op.column_id, op.title, op.details)
+                elif op.action == "update_card":
+                    self._update_card(username, op.card_id, op.title, op.details)
+                elif op.action == "move_card":
+                    self._move_card(username, op.card_id, op.target_column_id, op.position)
+                elif op.action == "delete_card":
+                    self._delete_card(username, op.card_id)
+            except NotFoundError as exc:
+                log.warning("AI %s skipped: %s", op.action, exc)
+
+    def _claimed_job(self, username: str, job_id: int, attempt: int) -> _Job | None:
+        job = self._jobs.get(job_id)
+        if (job is None or job.owner != username or job.status != "running"
+                or job.attempts != attempt):
+            return None
+        return job
+
+    def _finish_idempotency_key(self, username: str, key: str, result: str) -> None:
+        record = self._idempotency_keys.get((username, key))
+        if record is not None:
+            record.status, record.result = "done", result
+
+    def _create_board(self, user: _User, template: BoardTemplate) -> None:
+        board = user.board = _Board(next(self._board_ids), "My Board")
+        for col_title, cards in template:
+            col = _Column(next(self._column_ids), user.username, col_title)
+            self._columns[col.id] = col
+            board.columns.append(col)
+            for card_title, card_details in cards:
+                card = _Card(next(self._card_ids), col, card_title, card_details)
+                self._cards[card.id] = card
+                col.add(card)
+                col.count("created")
+
+    def _owned_column(self, username: str, column_id: int) -> _Column:
+        col = self._columns.get(column_id)
+        if col is None or col.owner != username:
+            raise NotFoundError("Column not found")
+        return col
+
+    def _owned_card(self, username: str, card_id: int) -> _Card:
+        card = self._cards.get(card_id)
+        if card is None or card.column.owner != username:
+            raise NotFoundError("Card not found")
+        return card
+
+    def _owned_conversation(self, username: str, conversation_id: int) -> _Conversation:
+        conversation = self._conversations.get(conversation_id)
+        if conversation is None or conversation.owner != username:
+            raise NotFoundError("Conversation not found")
+        return conversation
+
+    def _bump_board(self, username: str, expected: int | None) -> None:
+        board = self._users[username].board
+        if expected is not None and board.version != expected:
+            raise PreconditionFailedError("The board has changed")
+        board.version += 1
+
+    def _claim_card(
+        self, username: str, card_id: int, board_version: int | None, card_version: int | None
+    ) -> _Card:
+        card = self._owned_card(username, card_id)
+        # Nothing rolls back here, so check the card before bumping the board.
+        if card_version is not None and card.version != card_version:
+            raise PreconditionFailedError("The card has changed")
+        self._bump_board(username, board_version)
+        card.version += 1
+        return card
+
+    def _create_card(
+        self,
+        username: str,
+        column_id: int,
+        title: str,
+        details: str,
+        board_version: int | None = None,
+    ) -> int:
+        col = self._owned_column(username, column_id)
+        self._bump_board(username, board_version)
+        card = _Card(next(self._card_ids), col, title, details)
+        self._cards[card.id] = card
+        col.add(card)
+        col.count("created")
+        return card.id
+
+    def _update_card(
+        self,
+        username: str,
+        card_id: int,
+        title: str | None,
+        details: str | None,
+        board_version: int | None = None,
+        card_version: int | None = None,
+    ) -> None:
+        card = self._claim_card(username, card_id, board_version, card_version)
+        if title is not None:
+            card.title = title
+        if details is not None:
+            card.details = details
+
+    def _move_card(
+        self,
+        username: str,
+        card_id: int,
+        column_id: int,
+        position: int,
+        board_version: int | None = None,
+        card_version: int | None = None,
+    ) -> None:
+        target = self._owned_column(username, column_id)
+        card = self._claim_card(username, card_id, board_version, card_version)
+        source = card.column
+        if source is target:
+            source.cards.remove(card)
+            source.cards.insert(position, card)
+            return
+        source.remove(card)
+        source.dwell_seconds += int(time.time()) - card.entered_at
+        source.dwell_exits += 1
+        source.count("moved_out")
+        target.add(card, position)
+        target.count("moved_in")
+
+    def _delete_card(
+        self,
+        username: str,
+        card_id: int,
+        board_version: int | None = None,
+        card_version: int | None = None,
+    ) -> None:
+        card = self._claim_card(username, card_id, board_version, card_version)
+        card.column.remove(card)
+        card.column.count("deleted")
+        del self._cards[card_id]
@@ -0,0 +1,1150 @@
+import logging
+import os
+import sqlite3
+import time
+from collections import Counter
+from collections.abc import Callable, Iterator, Sequence
+from typing import TypeVar
+
+import metrics
+from database import (
+    all_db_paths,
+    count_cards,
+    count_exit,
+    data_version,
+    db_path_for,
+    ensure_board_for_user,
+    get_board_id,
+    read_connection,
+)
+from singleflight import ResultCache
+from storage import (
+    JOB_ABANDONED,
+    BoardOp,
+    BoardTemplate,
+    IdempotencyKeyReusedError,
+    LeaseLostError,
+    NotFoundError,
+    PreconditionFailedError,
+    activity_since,
+    stats_payload,
+)
+from timing import phase
+from writer import submit
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+BOARD_ROWS_SQL = """
+    SELECT c.id, c.title, c.position, ca.id, ca.title, ca.details, ca.position, ca.version
+    FROM columns c
+    LEFT JOIN cards ca ON ca.column_id = c.id
+    WHERE c.board_id = ?
+    ORDER BY c.position, ca.position
+"""
+
+# Both walk a handful of rows per column (the column itself and at most one
+# activity row per day in the window), however many cards the board has.
+_COLUMN_STATS_SQL = """
+    SELECT id, title, position, card_count, entered_at_sum, dwell_seconds, dwell_exits
+    FROM columns WHERE board_id = ? ORDER BY position
+"""
+
+_ACTIVITY_SQL = """
+    SELECT a.column_id, SUM(a.created), SUM(a.moved_in), SUM(a.moved_out), SUM(a.deleted)
+    FROM column_activity a
+    JOIN columns c ON a.column_id = c.id
+    WHERE c.board_id = ? AND a.day >= ?
+    GROUP BY a.column_id
+"""
+
+_OWNED_COLUMN_SQL = """
+    SELECT c.id, c.board_id FROM columns c
+    JOIN boards b ON c.board_id = b.id
+    JOIN users u ON b.user_id = u.id
+    WHERE c.id = ? AND u.username = ?
+"""
+
+_OWNED_CARD_SQL = """
+    SELECT ca.id, ca.column_id, ca.title, ca.details, ca.position, ca.entered_at, c.board_id
+    FROM cards ca
+    JOIN columns c ON ca.column_id = c.id
+    JOIN boards b ON c.board_id = b.id
+    JOIN users u ON b.user_id = u.id
+    WHERE ca.id = ? AND u.username = ?
+"""
+
+_OWNED_ARCHIVED_SQL = """
+    SELECT a.id, a.column_id FROM archived_cards a
+    JOIN columns c ON a.column_id = c.id
+    JOIN boards b ON c.board_id = b.id
+    JOIN users u ON b.user_id = u.id
+    WHERE a.id = ? AND u.username = ?
+"""
+
+_SEARCH_ARCHIVE_SQL = r"""
+    SELECT a.id, a.column_id, c.title AS column_title, a.title, a.details, a.archived_at
+    FROM archived_cards a
+    JOIN columns c ON a.column_id = c.id
+    JOIN boards b ON c.board_id = b.id
+    JOIN users u ON b.user_id = u.id
+    WHERE u.username = ? AND (a.title LIKE ? ESCAPE '\' OR a.details LIKE ? ESCAPE '\')
+    ORDER BY a.archived_at DESC, a.id DESC
+    LIMIT ?
+"""
+
+# Per column rather than one join over the board: ordering the join by
+# (column position, card position) makes SQLite sort each column's cards in a
+# temp b-tree, while this walks idx_cards_column_position in order.
+_EXPORT_CARDS_SQL = """
+    SELECT id, column_id, title, details, position FROM cards
+    WHERE column_id = ? ORDER BY position
+"""
+
+EXPORT_FETCH_SIZE = 1000
+
+# Loaded boards kept per process, each tagged with the database file's
+# data_version at load time. Any commit to the file, from this worker or
+# another, changes the version and so invalidates every entry for it.
+BOARD_CACHE_SIZE = int(os.environ.get("BOARD_CACHE_SIZE", "256"))
+BOARD_CACHE_TTL_SECONDS = 300
+_board_cache: ResultCache[tuple[int, dict]] = ResultCache(
+    BOARD_CACHE_TTL_SECONDS, max(BOARD_CACHE_SIZE, 1)
+)
+
+_OWNED_CONVERSATION_SQL = """
+    SELECT c.id, c.summary FROM conversations c
+    JOIN users u ON c.user_id = u.id
+    WHERE c.id = ? AND u.username = ?
+"""
+
+# The last column of each board is its "done" column.
+_DONE_COLUMNS_SQL = """
+    SELECT c.id FROM columns c
+    WHERE c.position = (SELECT MAX(position) FROM columns WHERE board_id = c.board_id)
+"""
+
+
+def board_payload(conn: sqlite3.Connection, username: str) -> dict:
+    """Board as plain dicts, shaped like BoardOut, from a single JOIN query."""
+    board_id = get_board_id(conn, username)
+    if board_id is None:
+        # Boards are provisioned at login; the read path never writes.
+        raise NotFoundError("Board not found")
+    board = conn.execute(
+        "SELECT id, name, version FROM boards WHERE id = ?", (board_id,)
+    ).fetchone()
+    rows = conn.execute(BOARD_ROWS_SQL, (board_id,)).fetchall()
+    with phase("serialize"):
+        columns = []
+        current = None
+        for row in rows:
+            if current is None or current["id"] != row[0]:
+                current = {"id": row[0], "title": row[1], "position": row[2], "cards": []}
+                columns.append(current)
+            if row[3] is not None:
+                current["cards"].append({
+                    "id": row[3], "title": row[4], "details": row[5], "position": row[6],
+                    "version": row[7],
+                })
+    return {
+        "id": board["id"], "name": board["name"], "version": board["version"], "columns": columns,
+    }
+
+
+def board_stats(conn: sqlite3.Connection, username: str, days: int) -> dict:
+    board_id = get_board_id(conn, username)
+    if board_id is None:
+        raise NotFoundError("Board not found")
+    # One read transaction, so counters and tallies come from the same snapshot.
+    conn.execute("BEGIN")
+    version = conn.execute(
+        "SELECT version FROM boards WHERE id = ?", (board_id,)
+    ).fetchone()[0]
+    activity = {
+        row[0]: row[1:]
+        for row in conn.execute(_ACTIVITY_SQL, (board_id, activity_since(days)))
+    }
+    columns = []
+    for row in conn.execute(_COLUMN_STATS_SQL, (board_id,)):
+        created, moved_in, moved_out, deleted = activity.get(row["id"], (0, 0, 0, 0))
+        columns.append({
+            **dict(row),
+            "created": created, "moved_in": moved_in, "moved_out": moved_out, "deleted": deleted,
+        })
+    conn.commit()
+    return stats_payload(board_id, version, days, columns, int(time.time()))
+
+
+def _owned_column(conn: sqlite3.Connection, column_id: int, username: str) -> sqlite3.Row:
+    row = conn.execute(_OWNED_COLUMN_SQL, (column_id, username)).fetchone()
+    if not row:
+        raise NotFoundError("Column not found")
+    return row
+
+
+def _owned_card(conn: sqlite3.Connection, card_id: int, username: str) -> sqlite3.Row:
+    row = conn.execute(_OWNED_CARD_SQL, (card_id, username)).fetchone()
+    if not row:
+        raise NotFoundError("Card not found")
+    return row
+
+
+def _column_card_ids(conn: sqlite3.Connection, column_id: int) -> list[int]:
+    return [
+        r["id"] for r in conn.execute(
+            "SELECT id FROM cards WHERE column_id = ? ORDER BY position", (column_id,)
+        )
+    ]
+
+
+def _write_positions(conn: sqlite3.Connection, card_ids: list[int]) -> None:
+    conn.executemany(
+        "UPDATE cards SET position = ? WHERE id = ?",
+        [(i, cid) for i, cid in enumerate(card_ids)],
+    )
+
+
+# Optimistic concurrency: each check-and-bump is one conditional UPDATE inside
+# the write transaction, so a stale client fails fast and nothing is locked
+# beyond the write itself. expected=None bumps unconditionally.
+
+
+def _bump_board(conn: sqlite3.Connection, board_id: int, expected: int | None) -> None:
+    cur = conn.execute(
+        "UPDATE boards SET version = version + 1 WHERE id = ? AND version = COALESCE(?, version)",
+        (board_id, expected),
+    )
+    if not cur.rowcount:
+        raise PreconditionFailedError("The board has changed")
+
+
+def _bump_card(conn: sqlite3.Connection, card_id: int, expected: int | None) -> None:
+    cur = conn.execute(
+        "UPDATE cards SET version = version + 1 WHERE id = ? AND version = COALESCE(?, version)",
+        (card_id, expected),
+    )
+    if not cur.rowcount:
+        raise PreconditionFailedError("The card has changed")
+
+
+def _claim_card(
+    conn: sqlite3.Connection,
+    username: str,
+    card_id: int,
+    board_version: int | None,
+    card_version: int | None,
+) -> sqlite3.Row:
+    card = _owned_card(conn, card_id, username)
+    _bump_board(conn, card["board_id"], board_version)
+    _bump_card(conn, card_id, card_version)
+    return card
+
+
+# --- Write operations. Each runs on the writer connection, which commits. ---
+
+
+def rename_column(
+    conn: sqlite3.Connection,
+    username: str,
+    column_id: int,
+    title: str,
+    board_version: int | None = None,
+) -> None:
+    column = _owned_column(conn, column_id, username)
+    _bump_board(conn, column["board_id"], board_version)
+    conn.execute("UPDATE columns SET title = ? WHERE id = ?", (title, column_id))
+
+
+def create_card(
+    conn: sqlite3.Connection,
+    username: str,
+    column_id: int,
+    title: str,
+    details: str,
+    board_version: int | None = None,
+) -> int:
+    column = _owned_column(conn, column_id, username)
+    _bump_board(conn, column["board_id"], board_version)
+    now = int(time.time())
+    cur = conn.execute(
+        "INSERT INTO cards (column_id, title, details, position, entered_at) "
+        "SELECT ?, ?, ?, COALESCE(MAX(position), -1) + 1, ? FROM cards WHERE column_id = ?",
+        (column_id, title, details, now, column_id),
+    )
+    count_cards(conn, column_id, "created", 1, now)
+    return cur.lastrowid
+
+
+def update_card(
+    conn: sqlite3.Connection,
+    username: str,
+    card_id: int,
+    title: str | None,
+    details: str | None,
+    board_version: int | None = None,
+    card_version: int | None = None,
+) -> None:
+    card = _claim_card(conn, username, card_id, board_version, card_version)
+    conn.execute(
+        "UPDATE cards SET title = ?, details = ? WHERE id = ?",
+        (
+            title if title is not None else card["title"],
+            details if details is not None else card["details"],
+            card_id,
+        ),
+    )
+
+
+def move_card(
+    conn: sqlite3.Connection,
+    username: str,
+    card_id: int,
+    column_id: int,
+    position: int,
+    board_version: int | None = None,
+    card_version: int | None = None,
+) -> None:
+    _owned_column(conn, column_id, username)
+    card = _claim_card(conn, username, card_id, board_version, card_version)
+    old_column_id = card["column_id"]
+
+    old_cards = _column_card_ids(conn, old_column_id)
+    old_cards.remove(card_id)
+    if column_id == old_column_id:
+        old_cards.insert(position, card_id)
+        _write_positions(conn, old_cards)
+        return
+
+    now = int(time.time())
+    conn.execute(
+        "UPDATE cards SET column_id = ?, entered_at = ? WHERE id = ?", (column_id, now, card_id)
+    )
+    count_cards(conn, old_column_id, "moved_out", -1, -card["entered_at"])
+    count_exit(conn, old_column_id, now - card["entered_at"])
+    count_cards(conn, column_id, "moved_in", 1, now)
+    _write_positions(conn, old_cards)
+    target_cards = _column_card_ids(conn, column_id)
+    target_cards.remove(card_id)
+    target_cards.insert(position, card_id)
+    _write_positions(conn, target_cards)
+
+
+def delete_card(
+    conn: sqlite3.Connection,
+    username: str,
+    card_id: int,
+    board_version: int | None = None,
+    card_version: int | None = None,
+) -> None:
+    card = _claim_card(conn, username, card_id, board_version, card_version)
+    conn.execute("DELETE FROM cards WHERE id = ?", (card_id,))
+    count_cards(conn, card["column_id"], "deleted", -1, -card["entered_at"])
+    _write_positions(conn, _column_card_ids(conn, card["column_id"]))
+
+
+def archive_card(
+    conn: sqlite3.Connection,
+    username: str,
+    card_id: int,
+    board_version: int | None = None,
+    card_version: int | None = None,
+) -> None:
+    card = _claim_card(conn, username, card_id, board_version, card_version)
+    conn.execute(
+        "INSERT INTO archived_cards (id, column_id, title, details) VALUES (?, ?, ?, ?)",
+        (card_id, card["column_id"], card["title"], card["details"]),
+    )
+    conn.execute("DELETE FROM cards WHERE id = ?", (card_id,))
+    count_cards(conn, card["column_id"], "deleted", -1, -card["entered_at"])
+    _write_positions(conn, _column_card_ids(conn, card["column_id"]))
+
+
+def restore_card(
+    conn: sqlite3.Connection,
+    username: str,
+    card_id: int,
+    column_id: int | None,
+    board_version: int | None = None,
+) -> None:
+    archived = conn.execute(_OWNED_ARCHIVED_SQL, (card_id, username)).fetchone()
+    if not archived:
+        raise NotFoundError("Archived card not found")
+    target = column_id if column_id is not None else archived["column_id"]
+    column = _owned_column(conn, target, username)
+    _bump_board(conn, column["board_id"], board_version)
+    now = int(time.time())
+    # AUTOINCREMENT never reuses ids, so the card comes back under its old id.
+    conn.execute(
+        "INSERT INTO cards (id, column_id, title, details, position, entered_at) "
+        "SELECT id, ?, title, details, "
+        "(SELECT COALESCE(MAX(position), -1) + 1 FROM cards WHERE column_id = ?), ? "
+        "FROM archived_cards WHERE id = ?",
+        (target, target, now, card_id),
+    )
+    conn.execute("DELETE FROM archived_cards WHERE id = ?", (card_id,))
+    count_cards(conn, target, "created", 1, now)
+
+
+def search_archive(conn: sqlite3.Connection, username: str, query: str, limit: int) -> list[dict]:
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    pattern = f"%{escaped}%"
+    rows = conn.execute(_SEARCH_ARCHIVE_SQL, (username, pattern, pattern, limit)).fetchall()
+    return [dict(r) for r in rows]
+
+
+def archive_overflow(conn: sqlite3.Connection, keep: int) -> int:
+    """Archive cards below the first `keep` in every board's done column.
+
+    Positions are contiguous, so the overflow is exactly position >= keep and
+    the remaining cards need no reindexing. Returns the number archived.
+    """
+    conn.execute(
+        f"UPDATE boards SET version = version + 1 WHERE id IN ("
+        f"SELECT c.board_id FROM columns c JOIN cards ca ON ca.column_id = c.id "
+        f"WHERE c.id IN ({_DONE_COLUMNS_SQL}) AND ca.position >= ?)",
+        (keep,),
+    )
+    conn.execute(
+        f"INSERT INTO archived_cards (id, column_id, title, details) "
+        f"SELECT id, column_id, title, details FROM cards "
+        f"WHERE column_id IN ({_DONE_COLUMNS_SQL}) AND position >= ?",
+        (keep,),
+    )
+    overflow = conn.execute(
+        f"SELECT column_id, COUNT(*), SUM(entered_at) FROM cards "
+        f"WHERE column_id IN ({_DONE_COLUMNS_SQL}) AND position >= ? GROUP BY column_id",
+        (keep,),
+    ).fetchall()
+    for column_id, count, entered_at_sum in overflow:
+        count_cards(conn, column_id, "deleted", -count, -entered_at_sum)
+    cur = conn.execute(
+        f"DELETE FROM cards WHERE column_id IN ({_DONE_COLUMNS_SQL}) AND position >= ?",
+        (keep,),
+    )
+    return cur.rowcount
+
+
+def export_board(conn: sqlite3.Connection, username: str) -> Iterator[dict]:
+    board_id = get_board_id(conn, username)
+    if board_id is None:
+        raise NotFoundError("Board not found")
+    # One read transaction, so columns and cards come from the same snapshot.
+    conn.execute("BEGIN")
+    board = conn.execute("SELECT name FROM boards WHERE id = ?", (board_id,)).fetchone()
+    yield {"type": "board", "name": board["name"]}
+    columns = conn.execute(
+        "SELECT id, title, position FROM columns WHERE board_id = ? ORDER BY position",
+        (board_id,),
+    ).fetchall()
+    for col in columns:
+        yield {"type": "column", **dict(col)}
+    for col in columns:
+        cursor = conn.execute(_EXPORT_CARDS_SQL, (col["id"],))
+        while rows := cursor.fetchmany(EXPORT_FETCH_SIZE):
+            for row in rows:
+                yield {"type": "card", **dict(row)}
+
+
+def import_columns(
+    conn: sqlite3.Connection,
+    username: str,
+    titles: Sequence[str],
+    board_version: int | None = None,
+) -> list[int]:
+    board_id = ensure_board_for_user(conn, username)
+    _bump_board(conn, board_id, board_version)
+    existing = {}
+    for row in conn.execute(
+        "SELECT id, title FROM columns WHERE board_id = ? ORDER BY position DESC", (board_id,)
+    ):
+        existing[row["title"]] = row["id"]  # leftmost column wins on duplicate titles
+    resolved = []
+    for title in titles:
+        column_id = existing.get(title)
+        if column_id is None:
+            column_id = existing[title] = conn.execute(
+                "INSERT INTO columns (board_id, title, position) "
+                "SELECT ?, ?, COALESCE(MAX(position), -1) + 1 FROM columns WHERE board_id = ?",
+                (board_id, title, board_id),
+            ).lastrowid
+        resolved.append(column_id)
+    return resolved
+
+
+def import_cards(
+    conn: sqlite3.Connection,
+    username: str,
+    rows: Sequence[tuple[int, str, str]],
+    board_version: int | None = None,
+) -> int:
+    board_id = get_board_id(conn, username)
+    owned = {
+        r["id"] for r in conn.execute("SELECT id FROM columns WHERE board_id = ?", (board_id,))
+    }
+    if board_id is None or not {row[0] for row in rows} <= owned:
+        raise NotFoundError("Column not found")
+    _bump_board(conn, board_id, board_version)
+    now = int(time.time())
+    # Positions come from the columns as they are in this transaction, so
+    # cards created between chunks are not given the same position.
+    next_position = {
+        column_id: conn.execute(
+            "SELECT COALESCE(MAX(position), -1) + 1 FROM cards WHERE column_id = ?", (column_id,)
+        ).fetchone()[0]
+        for column_id in {row[0] for row in rows}
+    }
+    positioned = []
+    for column_id, title, details in rows:
+        positioned.append((column_id, title, details, next_position[column_id], now))
+        next_position[column_id] += 1
+    conn.executemany(
+        "INSERT INTO cards (column_id, title, details, position, entered_at) "
+        "VALUES (?, ?, ?, ?, ?)",
+        positioned,
+    )
+    # One counter update per column for the whole chunk.
+    for column_id, count in Counter(row[0] for row in rows).items():
+        count_cards(conn, column_id, "created", count, count * now)
+    return len(rows)
+
+
+def provision_users(
+    conn: sqlite3.Connection, users: Sequence[tuple[str, str]], template: BoardTemplate
+) -> int:
+    """Create users and clone template into a board for each, set-based.
+
+    The template goes into temp tables, then one INSERT ... SELECT per table
+    copies it to every new board, whatever the number of users. New rows are
+    told apart by id: AUTOINCREMENT ids only grow and this transaction holds
+    the write lock. Temp tables are dropped before commit.
+    """
+    now = int(time.time())
+    conn.execute("CREATE TEMP TABLE new_users (username TEXT PRIMARY KEY, password_hash TEXT)")
+    conn.execute("CREATE TEMP TABLE template_columns (position INTEGER, title TEXT, cards INTEGER)")
+    conn.execute(
+        "CREATE TEMP TABLE template_cards "
+        "(column_position INTEGER, position INTEGER, title TEXT, details TEXT)"
+    )
+    conn.executemany("INSERT OR IGNORE INTO temp.new_users VALUES (?, ?)", users)
+    conn.executemany(
+        "INSERT INTO temp.template_columns VALUES (?, ?, ?)",
+        [(pos, title, len(cards)) for pos, (title, cards) in enumerate(template)],
+    )
+    conn.executemany(
+        "INSERT INTO temp.template_cards VALUES (?, ?, ?, ?)",
+        [
+            (col_pos, pos, title, details)
+            for col_pos, (_, cards) in enumerate(template)
+            for pos, (title, details) in enumerate(cards)
+        ],
+    )
+    last_user = conn.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0]
+    last_board = conn.execute("SELECT COALESCE(MAX(id), 0) FROM boards").fetchone()[0]
+    last_column = conn.execute("SELECT COALESCE(MAX(id), 0) FROM columns").fetchone()[0]
+    created = conn.execute(
+        "INSERT INTO users (username, password_hash) "
+        "SELECT username, password_hash FROM temp.new_users n "
+        "WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.username = n.username)"
+    ).rowcount
+    # Only the users just created: an existing account without a board keeps
+    # getting its seed board on first login, as it would have anyway.
+    conn.execute(
+        "INSERT INTO boards (user_id) SELECT id FROM users WHERE id > ? ORDER BY id",
+        (last_user,),
+    )
+    conn.execute(
+        "INSERT INTO columns (board_id, title, position, card_count, entered_at_sum) "
+        "SELECT b.id, t.title, t.position, t.cards, t.cards * ? "
+        "FROM boards b CROSS JOIN temp.template_columns t WHERE b.id > ? "
+        "ORDER BY b.id, t.position",
+        (now, last_board),
+    )
+    conn.execute(
+        "INSERT INTO cards (column_id, title, details, position, entered_at) "
+        "SELECT c.id, t.title, t.details, t.position, ? "
+        "FROM columns c JOIN temp.template_cards t ON t.column_position = c.position "
+        "WHERE c.id > ? ORDER BY c.id, t.position",
+        (now, last_column),
+    )
+    conn.execute(
+        "INSERT INTO column_activity (column_id, day, created) "
+        "SELECT id, date('now'), card_count FROM columns WHERE id > ? AND card_count > 0",
+        (last_column,),
+    )
+    for table in ("new_users", "template_columns", "template_cards"):
+        conn.execute(f"DROP TABLE temp.{table}")
+    return created
+
+
+def create_conversation(conn: sqlite3.Connection, username: str) -> int:
+    cur = conn.execute(
+        "INSERT INTO conversations (user_id, updated_at) SELECT id, ? FROM users WHERE username = ?",
+        (int(time.time()), username),
+    )
+    if not cur.rowcount:
+        raise NotFoundError("User not found")
+    return cur.lastrowid
+
+
+def _owned_conversation(
+    conn: sqlite3.Connection, conversation_id: int, username: str
+) -> sqlite3.Row:
+    row = conn.execute(_OWNED_CONVERSATION_SQL, (conversation_id, username)).fetchone()
+    if not row:
+        raise NotFoundError("Conversation not found")
+    return row
+
+
+def load_conversation(conn: sqlite3.Connection, username: str, conversation_id: int) -> dict:
+    conversation = _owned_conversation(conn, conversation_id, username)
+    rows = conn.execute(
+        "SELECT role, content FROM conversation_messages WHERE conversation_id = ? ORDER BY id",
+        (conversation_id,),
+    ).fetchall()
+    return {
+        "id": conversation["id"],
+        "summary": conversation["summary"],
+        "messages": [dict(r) for r in rows],
+    }
+
+
+def append_messages(
+    conn: sqlite3.Connection,
+    username: str,
+    conversation_id: int,
+    messages: Sequence[tuple[str, str]],
+) -> None:
+    _owned_conversation(conn, conversation_id, username)
+    conn.executemany(
+        "INSERT INTO conversation_messages (conversation_id, role, content) VALUES (?, ?, ?)",
+        [(conversation_id, role, content) for role, content in messages],
+    )
+    # Maintenance expires conversations by the time of their last turn.
+    conn.execute(
+        "UPDATE conversations SET updated_at = ? WHERE id = ?", (int(time.time()), conversation_id)
+    )
+
+
+def compact_conversation(
+    conn: sqlite3.Connection,
+    username: str,
+    conversation_id: int,
+    previous: str,
+    summary: str,
+    drop: int,
+) -> bool:
+    _owned_conversation(conn, conversation_id, username)
+    cursor = conn.execute(
+        "UPDATE conversations SET summary = ? WHERE id = ? AND summary = ?",
+        (summary, conversation_id, previous),
+    )
+    if not cursor.rowcount:
+        return False
+    conn.execute(
+        "DELETE FROM conversation_messages WHERE id IN ("
+        "SELECT id FROM conversation_messages WHERE conversation_id = ? ORDER BY id LIMIT ?)",
+        (conversation_id, drop),
+    )
+    return True
+
+
+def apply_board_updates(
+    conn: sqlite3.Connection,
+    username: str,
+    ops: Sequence[BoardOp],
+    board_version: int | None = None,
+) -> None:
+    _bump_board(conn, ensure_board_for_user(conn, username), board_version)
+    for op in ops:
+        # Each op gets its own savepoint so a failure leaves no partial writes.
+        conn.execute("SAVEPOINT ai_op")
+        try:
+            if op.action == "create_card":
+                create_card(conn, username, op.column_id, op.title, op.details)
+            elif op.action == "update_card":
+                update_card(conn, username, op.card_id, op.title, op.details)
+            elif op.action == "move_card":
+                move_card(conn, username, op.card_id, op.target_column_id, op.position)
+            elif op.action == "delete_card":
+                delete_card(conn, username, op.card_id)
+        except NotFoundError as exc:
+            conn.execute("ROLLBACK TO ai_op")
+            log.warning("AI %s skipped: %s", op.action, exc)
+        except Exception:
+            conn.execute("ROLLBACK TO ai_op")
+            log.exception("Failed to apply AI board update: %s", op)
+        conn.execute("RELEASE ai_op")
+
+
+def record_chat_request(
+    conn: sqlite3.Connection, username: str, now: float, window: float, limit: int
+) -> bool:
+    user = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+    if not user:
+        raise NotFoundError("User not found")
+    conn.execute(
+        "DELETE FROM chat_requests WHERE user_id = ? AND requested_at <= ?",
+        (user["id"], now - window),
+    )
+    count = conn.execute(
+        "SELECT COUNT(*) FROM chat_requests WHERE user_id = ?", (user["id"],)
+    ).fetchone()[0]
+    if count >= limit:
+        return False
+    conn.execute(
+        "INSERT INTO chat_requests (user_id, requested_at) VALUES (?, ?)", (user["id"], now)
+    )
+    return True
+
+
+def _finish_idempotency_key(
+    conn: sqlite3.Connection, username: str, key: str, result: str
+) -> None:
+    conn.execute(
+        "UPDATE chat_idempotency SET status = 'done', result = ? "
+        "WHERE user_id = (SELECT id FROM users WHERE username = ?) AND key = ?",
+        (result, username, key),
+    )
+
+
+def record_chat_turn(
+    conn: sqlite3.Connection,
+    username: str,
+    ops: Sequence[BoardOp],
+    conversation_id: int | None,
+    messages: Sequence[tuple[str, str]],
+    result: str,
+    board_version: int | None = None,
+    idempotency_key: str | None = None,
+    job: tuple[int, int] | None = None,
+) -> None:
+    if job is not None:
+        job_id, attempt = job
+        # First, so a lapsed claim writes nothing; if a later step raises,
+        # the writer rolls this back with it.
+        if not finish_chat_job(conn, username, job_id, attempt, "done", result, None, time.time()):
+            raise LeaseLostError(f"Chat job {job_id} is no longer held by attempt {attempt}")
+    if ops:
+        apply_board_updates(conn, username, ops, board_version)
+    if conversation_id is not None:
+        append_messages(conn, username, conversation_id, messages)
+    if idempotency_key is not None:
+        _finish_idempotency_key(conn, username, idempotency_key, result)
+
+
+def claim_idempotency_key(
+    conn: sqlite3.Connection,
+    username: str,
+    key: str,
+    request_hash: str,
+    now: float,
+    ttl: float,
+    lease: float,
+) -> tuple[str, str | None]:
+    user = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+    if not user:
+        raise NotFoundError("User not found")
+    # Expired keys, and claims whose worker died before finishing them.
+    conn.execute(
+        "DELETE FROM chat_idempotency WHERE user_id = ? "
+        "AND (created_at <= ? OR (status = 'running' AND created_at <= ?))",
+        (user["id"], now - ttl, now - lease),
+    )
+    row = conn.execute(
+        "SELECT request_hash, status, result FROM chat_idempotency WHERE user_id = ? AND key = ?",
+        (user["id"], key),
+    ).fetchone()
+    if row is None:
+        conn.execute(
+            "INSERT INTO chat_idempotency (user_id, key, request_hash, created_at) "
+            "VALUES (?, ?, ?, ?)",
+            (user["id"], key, request_hash, now),
+        )
+        return "claimed", None
+    if row["request_hash"] != request_hash:
+        raise IdempotencyKeyReusedError("Idempotency-Key was already used for another request")
+    return row["status"], row["result"]
+
+
+def release_idempotency_key(conn: sqlite3.Connection, username: str, key: str) -> None:
+    conn.execute(
+        "DELETE FROM chat_idempotency "
+        "WHERE user_id = (SELECT id FROM users WHERE username = ?) AND key = ? "
+        "AND status = 'running'",
+        (username, key),
+    )
+
+
+_CLAIMABLE_JOB = "status = 'queued' OR (status = 'running' AND lease_until < :now)"
+
+_CLAIMABLE_JOBS_SQL = """
+    SELECT j.id, j.user_id, j.attempts, j.request, u.username
+    FROM chat_jobs j JOIN users u ON u.id = j.user_id
+    WHERE (j.status = 'queued' OR (j.status = 'running' AND j.lease_until < :now))
+      AND NOT EXISTS (
+          SELECT 1 FROM chat_jobs r
+          WHERE r.user_id = j.user_id AND r.status = 'running' AND r.lease_until >= :now
+      )
+    ORDER BY j.id
+"""
+
+_FINISHED_JOB = "status IN ('done', 'failed')"
+
+
+def create_chat_job(
+    conn: sqlite3.Connection,
+    username: str,
+    request: str,
+    now: float,
+    limit: int,
+    keep: float,
+    idempotency_key: str | None = None,
+) -> int | None:
+    user = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+    if not user:
+        raise NotFoundError("User not found")
+    conn.execute(
+        f"DELETE FROM chat_jobs WHERE user_id = ? AND {_FINISHED_JOB} AND updated_at < ?",
+        (user["id"], now - keep),
+    )
+    pending = conn.execute(
+        f"SELECT COUNT(*) FROM chat_jobs WHERE user_id = ? AND NOT ({_FINISHED_JOB})",
+        (user["id"],),
+    ).fetchone()[0]
+    if pending >= limit:
+        return None
+    job_id = conn.execute(
+        "INSERT INTO chat_jobs (user_id, request, created_at, updated_at) VALUES (?, ?, ?, ?)",
+        (user["id"], request, now, now),
+    ).lastrowid
+    if idempotency_key is not None:
+        _finish_idempotency_key(conn, username, idempotency_key, str(job_id))
+    return job_id
+
+
+def get_chat_job(conn: sqlite3.Connection, username: str, job_id: int) -> dict:
+    row = conn.execute(
+        "SELECT j.id, j.status, j.result, j.error FROM chat_jobs j "
+        "JOIN users u ON u.id = j.user_id WHERE j.id = ? AND u.username = ?",
+        (job_id, username),
+    ).fetchone()
+    if not row:
+        raise NotFoundError("Job not found")
+    return dict(row)
+
+
+def claim_chat_jobs(
+    conn: sqlite3.Connection, now: float, lease: float, limit: int, max_attempts: int
+) -> list[dict]:
+    claimed: list[dict] = []
+    seen: set[int] = set()
+    for row in conn.execute(_CLAIMABLE_JOBS_SQL, {"now": now}).fetchall():
+        if len(claimed) >= limit:
+            break
+        if row["user_id"] in seen:
+            continue  # the user's older job goes first
+        seen.add(row["user_id"])
+        if row["attempts"] >= max_attempts:
+            conn.execute(
+                "UPDATE chat_jobs SET status = 'failed', error = ?, lease_until = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (JOB_ABANDONED, now, row["id"]),
+            )
+            continue
+        conn.execute(
+            "UPDATE chat_jobs SET status = 'running', attempts = attempts + 1, "
+            "lease_until = ?, updated_at = ? WHERE id = ?",
+            (now + lease, now, row["id"]),
+        )
+        claimed.append({
+            "id": row["id"],
+            "username": row["username"],
+            "request": row["request"],
+            "attempt": row["attempts"] + 1,
+        })
+    return claimed
+
+
+def finish_chat_job(
+    conn: sqlite3.Connection,
+    username: str,
+    job_id: int,
+    attempt: int,
+    status: str,
+    result: str | None,
+    error: str | None,
+    now: float,
+) -> bool:
+    # Fenced on the attempt: a worker whose lease lapsed while it ran must
+    # not overwrite the outcome of the attempt that took the job over.
+    # A job put back unstarted does not use up an attempt.
+    return bool(conn.execute(
+        "UPDATE chat_jobs SET status = :status, result = :result, error = :error, "
+        "attempts = attempts - (:status = 'queued'), lease_until = NULL, updated_at = :now "
+        "WHERE id = :id AND user_id = (SELECT id FROM users WHERE username = :username) "
+        "AND status = 'running' AND attempts = :attempt",
+        {
+            "username": username, "id": job_id, "attempt": attempt, "status": status,
+            "result": result, "error": error, "now": now,
+        },
+    ).rowcount)
+
+
+class SqliteRepository:
+    """Reads use the pooled read-only connections; writes go through the writer queue."""
+
+    def get_user(self, username: str) -> dict | None:
+        with read_connection(db_path_for(username)) as conn:
+            row = conn.execute(
+                "SELECT username, password_hash FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def ensure_board(self, username: str) -> int:
+        with read_connection(db_path_for(username)) as conn:
+            board_id = get_board_id(conn, username)
+        if board_id is None:
+            board_id = self._write(username, ensure_board_for_user)
+        return board_id
+
+    def provision_users(
+        self, users: Sequence[tuple[str, str]], template: BoardTemplate
+    ) -> int:
+        by_path: dict = {}
+        for user in users:
+            by_path.setdefault(db_path_for(user[0]), []).append(user)
+        # One transaction per database file; shards each have their own writer.
+        return sum(
+            submit(lambda conn, group=group: provision_users(conn, group, template), path)
+            for path, group in by_path.items()
+        )
+
+    def load_board(self, username: str) -> dict:
+        """The board payload; shared with the cache, so callers must not mutate it."""
+        path = db_path_for(username)
+        if not BOARD_CACHE_SIZE:
+            with read_connection(path) as conn:
+                return board_payload(conn, username)
+        # Read the version before the board: a commit in between makes the
+        # entry look older than it is, which only costs a reload.
+        version = data_version(path)
+        cached = _board_cache.get((path, username))
+        if cached is not None and cached[0] == version:
+            metrics.incr("board_cache.hits")
+            return cached[1]
+        metrics.incr("board_cache.misses")
+        with read_connection(path) as conn:
+            payload = board_payload(conn, username)
+        _board_cache.put((path, username), (version, payload))
+        return payload
+
+    def board_stats(self, username: str, days: int) -> dict:
+        with read_connection(db_path_for(username)) as conn:
+            return board_stats(conn, username, days)
+
+    def rename_column(
+        self, username: str, column_id: int, title: str, *, board_version: int | None = None
+    ) -> None:
+        self._write(username, rename_column, column_id, title, board_version)
+
+    def create_card(
+        self,
+        username: str,
+        column_id: int,
+        title: str,
+        details: str,
+        *,
+        board_version: int | None = None,
+    ) -> int:
+        return self._write(username, create_card, column_id, title, details, board_version)
+
+    def update_card(
+        self,
+        username: str,
+        card_id: int,
+        title: str | None,
+        details: str | None,
+        *,
+        board_version: int | None = None,
+        card_version: int | None = None,
+    ) -> None:
+        self._write(
+            username, update_card, card_id, title, details, board_version, card_version
+        )
+
+    def move_card(
+        self,
+        username: str,
+        card_id: int,
+        column_id: int,
+        position: int,
+        *,
+        board_version: int | None = None,
+        card_version: int | None = None,
+    ) -> None:
+        self._write(
+            username, move_card, card_id, column_id, position, board_version, card_version
+        )
+
+    def delete_card(
+        self,
+        username: str,
+        card_id: int,
+        *,
+        board_version: int | None = None,
+        card_version: int | None = None,
+    ) -> None:
+        self._write(username, delete_card, card_id, board_version, card_version)
+
+    def apply_board_updates(
+        self, username: str, ops: Sequence[BoardOp], *, board_version: int | None = None
+    ) -> None:
+        self._write(username, apply_board_updates, ops, board_version)
+
+    def archive_card(
+        self,
+        username: str,
+        card_id: int,
+        *,
+        board_version: int | None = None,
+        card_version: int | None = None,
+    ) -> None:
+        self._write(username, archive_card, card_id, board_version, card_version)
+
+    def restore_card(
+        self,
+        username: str,
+        card_id: int,
+        column_id: int | None,
+        *,
+        board_version: int | None = None,
+    ) -> None:
+        self._write(username, restore_card, card_id, column_id, board_version)
+
+    def search_archive(self, username: str, query: str, limit: int) -> list[dict]:
+        with read_connection(db_path_for(username)) as conn:
+            return search_archive(conn, username, query, limit)
+
+    def export_board(self, username: str) -> Iterator[dict]:
+        with read_connection(db_path_for(username)) as conn:
+            yield from export_board(conn, username)
+
+    def import_columns(
+        self, username: str, titles: Sequence[str], *, board_version: int | None = None
+    ) -> list[int]:
+        return self._write(username, import_columns, titles, board_version)
+
+    def import_cards(
+        self,
+        username: str,
+        rows: Sequence[tuple[int, str, str]],
+        *,
+        board_version: int | None = None,
+    ) -> int:
+        return self._write(username, import_cards, rows, board_version)
+
+    def create_conversation(self, username: str) -> int:
+        return self._write(username, create_conversation)
+
+    def load_conversation(self, username: str, conversation_id: int) -> dict:
+        with read_connection(db_path_for(username)) as conn:
+            return load_conversation(conn, username, conversation_id)
+
+    def append_messages(
+        self, username: str, conversation_id: int, messages: Sequence[tuple[str, str]]
+    ) -> None:
+        self._write(username, append_messages, conversation_id, messages)
+
+    def record_chat_request(self, username: str, now: float, window: float, limit: int) -> bool:
+        # Runs on the writer, so check-and-insert is atomic across worker processes.
+        return self._write(username, record_chat_request, now, window, limit)
+
+    def compact_conversation(
+        self, username: str, conversation_id: int, previous: str, summary: str, drop: int
+    ) -> bool:
+        return self._write(username, compact_conversation, conversation_id, previous, summary, drop)
+
+    def record_chat_turn(
+        self,
+        username: str,
+        ops: Sequence[BoardOp],
+        conversation_id: int | None,
+        messages: Sequence[tuple[str, str]],
+        result: str,
+        *,
+        board_version: int | None = None,
+        idempotency_key: str | None = None,
+        job: tuple[int, int] | None = None,
+    ) -> None:
+        self._write(
+            username, record_chat_turn, ops, conversation_id, messages, result,
+            board_version, idempotency_key, job,
+        )
+
+    def claim_idempotency_key(
+        self, username: str, key: str, request_hash: str, now: float, ttl: float, lease: float
+    ) -> tuple[str, str | None]:
+        # On the writer, so two workers cannot both claim the key.
+        return self._write(
+            username, claim_idempotency_key, key, request_hash, now, ttl, lease
+        )
+
+    def release_idempotency_key(self, username: str, key: str) -> None:
+        self._write(username, release_idempotency_key, key)
+
+    def create_chat_job(
+        self,
+        username: str,
+        request: str,
+        now: float,
+        limit: int,
+        keep: float,
+        *,
+        idempotency_key: str | None = None,
+    ) -> int | None:
+        return self._write(
+            username, create_chat_job, request, now, limit, keep, idempotency_key
+        )
+
+    def get_chat_job(self, username: str, job_id: int) -> dict:
+        with read_connection(db_path_for(username)) as conn:
+            return get_chat_job(conn, username, job_id)
+
+    def claim_chat_jobs(
+        self, now: float, lease: float, limit: int, max_attempts: int
+    ) -> list[dict]:
+        claimed: list[dict] = []
+        for path in all_db_paths():
+            remaining = limit - len(claimed)
+            if remaining <= 0:
+                break
+            # Polled every second by every worker: only take the write lock
+            # for files that have something to claim.
+            with read_connection(path) as conn:
+                if not conn.execute(
+                    f"SELECT 1 FROM chat_jobs WHERE {_CLAIMABLE_JOB} LIMIT 1", {"now": now}
+                ).fetchone():
+                    continue
+            claimed += submit(
+                lambda conn: claim_chat_jobs(conn, now, lease, remaining, max_attempts), path
+            )
+        return claimed
+
+    def finish_chat_job(
+        self,
+        username: str,
+        job_id: int,
+        attempt: int,
+        status: str,
+        result: str | None,
+        error: str | None,
+        now: float,
+    ) -> bool:
+        return self._write(
+            username, finish_chat_job, job_id, attempt, status, result, error, now
+        )
+
+    def _write(self, username: str, fn: Callable[..., T], *args) -> T:
+        return submit(lambda conn: fn(conn, username, *args), db_path_for(username))
@@ -5,8 +5,9 @@ import pytest
 from fastapi.testclient import TestClient
 
 import database
-from database import get_db, init_db
+from database import close_read_pools, get_db, init_db
 from main import app
+from writer import close_writers
 
 
 @pytest.fixture(autouse=True)
@@ -17,6 +18,8 @@ def _use_temp_db(tmp_path):
     init_db(conn)
     conn.close()
     yield
+    close_writers()
+    close_read_pools()
     database.DB_PATH = Path(__file__).parent.parent / "data" / "kanban.db"
 
 
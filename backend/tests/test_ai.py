@@ -0,0 +1,199 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+import ai
+import metrics
+from models import AIResponse, BoardOut, BoardStatsOut, CreateCardOp, MoveCardOp
+
+BOARD = BoardOut(id=1, name="My Board", columns=[])
+
+
+def _objects(node):
+    if isinstance(node, dict):
+        if node.get("type") == "object":
+            yield node
+        for value in node.values():
+            yield from _objects(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _objects(value)
+
+
+def test_strict_schema_requires_every_property():
+    schema = ai.strict_schema(AIResponse)
+    objects = list(_objects(schema))
+    assert len(objects) == 5
+    for obj in objects:
+        assert obj["additionalProperties"] is False
+        assert obj["required"] == list(obj["properties"])
+    assert "default" not in json.dumps(schema)
+    assert schema["$defs"]["CreateCardOp"]["properties"]["action"] == {
+        "type": "string", "enum": ["create_card"],
+    }
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = MagicMock()
+    monkeypatch.setattr(ai, "_client", client)
+    metrics.reset()
+    return client
+
+
+def _reply(client, content=None, tool_calls=None, completion_tokens=42):
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = content
+    response.choices[0].message.tool_calls = tool_calls
+    response.usage.completion_tokens = completion_tokens
+    client.chat.completions.create.return_value = response
+
+
+def _tool_call(name, arguments):
+    call = MagicMock()
+    call.function.name = name
+    call.function.arguments = json.dumps(arguments)
+    return call
+
+
+def test_json_schema_mode_sends_strict_response_format(client, monkeypatch):
+    monkeypatch.setattr(ai, "AI_OUTPUT_MODE", "json_schema")
+    _reply(client, content='{"message": "Hi", "board_updates": []}')
+    assert ai.chat_with_board(BOARD, "add a card", []).message == "Hi"
+
+    response_format = client.chat.completions.create.call_args.kwargs["response_format"]
+    assert response_format["type"] == "json_schema"
+    assert response_format["json_schema"]["strict"] is True
+    stats = metrics.snapshot()["summaries"]
+    assert stats["ai.output_tokens.json_schema"]["sum"] == 42
+
+
+def test_tools_mode_turns_tool_calls_into_ops(client, monkeypatch):
+    monkeypatch.setattr(ai, "AI_OUTPUT_MODE", "tools")
+    _reply(client, content="Moved it.", tool_calls=[
+        _tool_call("move_card", {"card_id": 3, "target_column_id": 2, "position": 0}),
+        _tool_call("create_card", {"column_id": 1}),  # missing title: dropped
+    ])
+    result = ai.chat_with_board(BOARD, "move card 3", [])
+
+    assert result.message == "Moved it."
+    assert result.board_updates == [
+        MoveCardOp(action="move_card", card_id=3, target_column_id=2, position=0)
+    ]
+    tools = client.chat.completions.create.call_args.kwargs["tools"]
+    assert [t["function"]["name"] for t in tools] == list(ai._TOOL_OPS)
+    assert metrics.snapshot()["counters"]["ai.parse_failures.tools"] == 1
+
+
+def test_json_object_mode_counts_parse_failures(client, monkeypatch):
+    monkeypatch.setattr(ai, "AI_OUTPUT_MODE", "json_object")
+    _reply(client, content='Sure! {"message": "Added", "board_updates": '
+           '[{"action": "create_card", "column_id": 1, "title": "X"}]}')
+    result = ai.chat_with_board(BOARD, "add X", [])
+
+    assert result.board_updates == [CreateCardOp(action="create_card", column_id=1, title="X")]
+    assert metrics.snapshot()["counters"]["ai.parse_failures.json_object"] == 1
+
+
+SEED_BOARD = BoardOut.model_validate({
+    "id": 1,
+    "name": "My Board",
+    "columns": [
+        {"id": 1, "title": "Backlog", "position": 0, "cards": [
+            {"id": 1, "title": "Write spec", "details": "", "position": 0},
+            {"id": 2, "title": "Plan sprint", "details": "", "position": 1},
+        ]},
+        {"id": 2, "title": "In Progress", "position": 1, "cards": []},
+        {"id": 3, "title": "Review", "position": 2, "cards": [
+            {"id": 3, "title": "QA pass", "details": "", "position": 0},
+        ]},
+    ],
+})
+
+
+@pytest.mark.parametrize("message, tier", [
+    ("How many cards are in Review?", "local"),
+    ("how many cards do I have", "local"),
+    ("List the cards in Backlog", "local"),
+    ("What should I focus on next?", "fast"),
+    ("Move QA pass to Backlog", "capable"),
+    ("How many cards should I move to Review?", "capable"),
+])
+def test_route_classifies_messages(message, tier):
+    assert ai.route(SEED_BOARD, message)[0] == tier
+
+
+def test_local_answers_skip_the_provider(client):
+    result = ai.chat_with_board(SEED_BOARD, "How many cards are in Review?", [])
+    assert result.message == "There is 1 card in Review."
+    assert result.board_updates == []
+    client.chat.completions.create.assert_not_called()
+    assert metrics.snapshot()["counters"]["ai.route.local"] == 1
+
+
+def test_questions_use_fast_model_and_edits_capable(client):
+    _reply(client, content="Finish the QA pass.")
+    ai.chat_with_board(SEED_BOARD, "What should I focus on next?", [])
+    assert client.chat.completions.create.call_args.kwargs["model"] == ai.FAST_MODEL
+    _reply(client, content='{"message": "Ok", "board_updates": []}')
+    ai.chat_with_board(SEED_BOARD, "Add a card for release notes", [])
+    assert client.chat.completions.create.call_args.kwargs["model"] == ai.MODEL
+    assert "ai.latency_ms.tier.fast" in metrics.snapshot()["summaries"]
+
+
+def test_fast_tier_cannot_change_the_board(client):
+    _reply(client, content='{"message": "Done", "board_updates": '
+           '[{"action": "delete_card", "card_id": 1}]}')
+    result = ai.chat_with_board(SEED_BOARD, "What should I focus on next?", [])
+    kwargs = client.chat.completions.create.call_args.kwargs
+    assert kwargs["messages"][0]["content"].startswith(ai.READ_ONLY_SYSTEM_PROMPT)
+    assert "response_format" not in kwargs and "tools" not in kwargs
+    assert result.board_updates == []
+
+
+def test_column_names_match_whole_words():
+    board = BoardOut.model_validate({"id": 1, "name": "My Board", "columns": [
+        {"id": 1, "title": "Do", "position": 0, "cards": []},
+        {"id": 2, "title": "Done", "position": 1, "cards": []},
+    ]})
+    assert ai._mentioned_column(board, "How many cards are in done?").id == 2
+    assert ai._mentioned_column(board, "How many cards are on my todo list?") is None
+    assert ai._mentioned_column(board, "What is in Do?").id == 1
+
+
+def _stats(moved_to_review):
+    return BoardStatsOut.model_validate({
+        "id": 1, "version": 3, "days": 7, "cards": 3, "created": 3,
+        "moved": moved_to_review, "deleted": 0,
+        "columns": [
+            {"id": col.id, "title": col.title, "position": col.position,
+             "cards": len(col.cards), "avg_age_seconds": None,
+             "avg_time_in_column_seconds": None,
+             "activity": {"created": len(col.cards), "deleted": 0,
+                          "moved_in": moved_to_review if col.title == "Review" else 0,
+                          "moved_out": 0}}
+            for col in SEED_BOARD.columns
+        ],
+    })
+
+
+def test_activity_questions_are_answered_from_stats():
+    question = "How many cards were moved to Review this week?"
+    assert ai.route(SEED_BOARD, question, _stats(2)) == (
+        "local", "2 cards were moved to Review in the last 7 days.",
+    )
+    assert ai.route(SEED_BOARD, "How many cards were created this week?", _stats(0))[1] == (
+        "3 cards were created in the last 7 days."
+    )
+    # Without stats the current count would be the wrong answer.
+    assert ai.route(SEED_BOARD, question)[0] == "fast"
+
+
+def test_stats_are_added_to_the_prompt(client):
+    _reply(client, content='{"message": "Ok", "board_updates": []}')
+    ai.chat_with_board(SEED_BOARD, "What is slowing us down?", [], stats=_stats(1))
+    system = client.chat.completions.create.call_args.kwargs["messages"][0]["content"]
+    assert "Activity over the last 7 days: 3 cards created, 1 moved" in system
+    assert "- Review: 1 moved in, 0 moved out" in system
@@ -0,0 +1,30 @@
+from unittest.mock import patch
+
+import jobs
+import routers.chat
+from background import BackgroundOwner
+from jobs import JobRunner
+from models import AIResponse
+
+ASYNC = {"Prefer": "respond-async"}
+
+
+def test_one_owner_at_a_time(tmp_path):
+    first, second = BackgroundOwner(tmp_path / "lock"), BackgroundOwner(tmp_path / "lock")
+    assert first.owned()
+    assert not second.owned()
+    assert first.owned()  # keeps it
+    first.release()
+    assert second.owned()
+    assert not first.owned()
+
+
+def test_other_workers_leave_jobs_to_the_owner(client, auth_header, monkeypatch):
+    client.post("/api/chat", json={"message": "Later"}, headers={**auth_header, **ASYNC})
+    runner = JobRunner(routers.chat._run_chat_job)
+    monkeypatch.setattr(jobs.background, "owned", lambda: False)
+    assert runner.run_once() == 0
+    monkeypatch.setattr(jobs.background, "owned", lambda: True)
+    with patch("routers.chat.chat_with_board", return_value=AIResponse(message="Done.")):
+        assert runner.run_once() == 1
+        assert runner.join(5)
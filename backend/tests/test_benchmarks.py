@@ -0,0 +1,26 @@
+from benchmarks.generate import generate
+from benchmarks.suite import compare
+from database import get_db, init_db
+
+
+def _rows(tmp_path, name):
+    conn = get_db(tmp_path / name)
+    init_db(conn, seed=False)
+    generate(conn, users=3, columns=2, cards_per_column=4, big_column_cards=50, seed=7)
+    conn.commit()
+    rows = conn.execute("SELECT column_id, title, details, position FROM cards ORDER BY id").fetchall()
+    conn.close()
+    return [tuple(r) for r in rows]
+
+
+def test_generator_is_deterministic(tmp_path):
+    rows = _rows(tmp_path, "a.db")
+    assert rows == _rows(tmp_path, "b.db")
+    assert len(rows) == 50 + 4 * 5
+
+
+def test_compare_flags_regressions(capsys):
+    base = {"results": {"load": {"median_ms": 10.0}, "move": {"median_ms": 5.0}}}
+    head = {"results": {"load": {"median_ms": 10.5}, "move": {"median_ms": 8.0}}}
+    assert compare(base, head, threshold=0.15) == ["move"]
+    assert "REGRESSION" in capsys.readouterr().out
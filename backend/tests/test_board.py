@@ -1,3 +1,9 @@
+import asyncio
+import json
+
+import routers.board
+
+
 def test_get_board_returns_seeded_data(client, auth_header):
     resp = client.get("/api/board", headers=auth_header)
     assert resp.status_code == 200
@@ -110,6 +116,29 @@ def test_move_card_between_columns(client, auth_header):
     assert new_board["columns"][3]["cards"][0]["id"] == card_id
 
 
+def test_board_stats_count_moves(client, auth_header):
+    board = client.get("/api/board", headers=auth_header).json()
+    card_id = board["columns"][0]["cards"][0]["id"]
+    done = board["columns"][4]
+    client.put(
+        f"/api/board/cards/{card_id}/move",
+        json={"column_id": done["id"], "position": 0},
+        headers=auth_header,
+    )
+
+    resp = client.get("/api/board/stats", headers=auth_header)
+    assert resp.status_code == 200
+    stats = resp.json()
+    assert stats["days"] == 7
+    assert stats["moved"] == 1
+    assert [c["cards"] for c in stats["columns"]] == [
+        len(c["cards"]) + (c["id"] == done["id"]) - (c is board["columns"][0])
+        for c in board["columns"]
+    ]
+    assert stats["columns"][4]["activity"]["moved_in"] == 1
+    assert client.get("/api/board/stats?days=0", headers=auth_header).status_code == 422
+
+
 def test_move_card_within_column(client, auth_header):
     board = client.get("/api/board", headers=auth_header).json()
     backlog = board["columns"][0]
@@ -132,3 +161,186 @@ def test_positions_are_contiguous_after_operations(client, auth_header):
     for col in board["columns"]:
         positions = [c["position"] for c in col["cards"]]
         assert positions == list(range(len(positions)))
+
+
+def test_board_response_matches_model_schema(client, auth_header):
+    from models import BoardOut
+
+    data = client.get("/api/board", headers=auth_header).json()
+    assert BoardOut.model_validate(data).model_dump() == data
+
+
+def test_archive_search_and_restore_card(client, auth_header):
+    board = client.get("/api/board", headers=auth_header).json()
+    done = board["columns"][4]
+    card = done["cards"][0]
+
+    resp = client.post(f"/api/board/cards/{card['id']}/archive", headers=auth_header)
+    assert resp.status_code == 200
+    remaining = resp.json()["columns"][4]["cards"]
+    assert card["id"] not in [c["id"] for c in remaining]
+    assert [c["position"] for c in remaining] == list(range(len(remaining)))
+
+    found = client.get("/api/board/archive", params={"q": "marketing"}, headers=auth_header).json()
+    assert [a["id"] for a in found] == [card["id"]]
+    assert found[0]["column_title"] == "Done"
+
+    resp = client.post(f"/api/board/archive/{card['id']}/restore", headers=auth_header)
+    assert resp.status_code == 200
+    assert resp.json()["columns"][4]["cards"][-1]["id"] == card["id"]
+    assert client.get("/api/board/archive", headers=auth_header).json() == []
+
+
+def test_restore_unknown_archived_card(client, auth_header):
+    resp = client.post("/api/board/archive/9999/restore", headers=auth_header)
+    assert resp.status_code == 404
+
+
+def _export_lines(client, auth_header):
+    resp = client.get("/api/board/export", headers=auth_header)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in resp.text.splitlines()]
+
+
+def test_export_streams_board_columns_then_cards(client, auth_header):
+    records = _export_lines(client, auth_header)
+    assert records[0] == {"type": "board", "name": "My Board"}
+    kinds = [r["type"] for r in records[1:]]
+    assert kinds == ["column"] * 5 + ["card"] * 8
+
+
+def test_import_appends_to_matching_columns(client, auth_header):
+    body = "\n".join(json.dumps(r) for r in _export_lines(client, auth_header))
+    resp = client.post("/api/board/import", content=body, headers=auth_header)
+    assert resp.status_code == 200
+    assert resp.json() == {"columns": 5, "cards": 8}
+
+    board = client.get("/api/board", headers=auth_header).json()
+    assert len(board["columns"]) == 5
+    for col in board["columns"]:
+        assert [c["position"] for c in col["cards"]] == list(range(len(col["cards"])))
+    assert sum(len(c["cards"]) for c in board["columns"]) == 16
+
+
+def test_import_creates_new_columns_in_chunks(client, auth_header, monkeypatch):
+    monkeypatch.setattr("routers.board.IMPORT_CHUNK_SIZE", 2)
+    lines = [{"type": "column", "id": 77, "title": "Icebox"}]
+    lines += [{"type": "card", "column_id": 77, "title": f"Idea {i}"} for i in range(5)]
+    body = "\n".join(json.dumps(r) for r in lines) + "\n"
+    resp = client.post("/api/board/import", content=body, headers=auth_header)
+    assert resp.json() == {"columns": 1, "cards": 5}
+
+    icebox = client.get("/api/board", headers=auth_header).json()["columns"][-1]
+    assert icebox["title"] == "Icebox"
+    assert [c["title"] for c in icebox["cards"]] == [f"Idea {i}" for i in range(5)]
+
+
+def test_pinned_import_checks_every_chunk(client, auth_header, monkeypatch):
+    monkeypatch.setattr("routers.board.IMPORT_CHUNK_SIZE", 2)
+    lines = [{"type": "column", "id": 77, "title": "Icebox"}]
+    lines += [{"type": "card", "column_id": 77, "title": f"Idea {i}"} for i in range(5)]
+    body = "\n".join(json.dumps(r) for r in lines) + "\n"
+    etag = client.get("/api/board", headers=auth_header).headers["ETag"]
+    headers = {**auth_header, "If-Match": etag}
+    assert client.post("/api/board/import", content=body, headers=headers).status_code == 200
+
+    # Someone else edits the board after the columns are resolved.
+    repo = routers.board.get_repository()
+    import_columns = repo.import_columns
+
+    def edit_between_chunks(username, titles, **kwargs):
+        resolved = import_columns(username, titles, **kwargs)
+        repo.create_card(username, resolved[0], "Made meanwhile", "")
+        return resolved
+
+    monkeypatch.setattr(repo, "import_columns", edit_between_chunks)
+    etag = client.get("/api/board", headers=auth_header).headers["ETag"]
+    headers = {**auth_header, "If-Match": etag}
+    assert client.post("/api/board/import", content=body, headers=headers).status_code == 412
+
+
+def test_import_rejects_bad_lines(client, auth_header):
+    body = '{"type": "column", "id": 1, "title": "X"}\n{"type": "card", "column_id": 2, "title": "Y"}'
+    resp = client.post("/api/board/import", content=body, headers=auth_header)
+    assert resp.status_code == 422
+    assert resp.json()["detail"].startswith("Line 2:")
+    resp = client.post("/api/board/import", content="not json", headers=auth_header)
+    assert resp.json()["detail"] == "Line 1: invalid JSON"
+    body = '{"type": "column", "id": 1, "title": "X"}\n{"type": "card", "column_id": [1], "title": "Y"}'
+    resp = client.post("/api/board/import", content=body, headers=auth_header)
+    assert resp.status_code == 422
+    assert resp.json()["detail"] == "Line 2: card needs an integer column_id"
+
+
+def test_import_rejects_overlong_lines(client, auth_header, monkeypatch):
+    monkeypatch.setattr(routers.board, "IMPORT_MAX_LINE_BYTES", 100)
+    body = '{"type": "column", "id": 1, "title": "X"}\n' + "x" * 5000
+    resp = client.post("/api/board/import", content=body, headers=auth_header)
+    assert resp.status_code == 413
+    assert resp.json()["detail"] == "Line 2: longer than 100 bytes"
+
+
+def test_ndjson_lines_split_across_chunks():
+    async def chunks():
+        for chunk in (b"ab", b"c\nde", b"\n\nf", b"g"):
+            yield chunk
+
+    async def collect():
+        return [item async for item in routers.board._ndjson_lines(chunks(), 3)]
+
+    assert asyncio.run(collect()) == [(1, b"abc"), (2, b"de"), (3, b""), (4, b"fg")]
+
+
+def test_board_etag_and_if_none_match(client, auth_header):
+    headers = {**auth_header, "Accept-Encoding": "identity"}
+    resp = client.get("/api/board", headers=headers)
+    etag = resp.headers["ETag"]
+    assert etag == f'"board-{resp.json()["version"]}"'
+    resp = client.get("/api/board", headers={**headers, "If-None-Match": etag})
+    assert resp.status_code == 304
+
+
+def test_stale_board_version_is_rejected(client, auth_header):
+    resp = client.get("/api/board", headers=auth_header)
+    etag, board = resp.headers["ETag"], resp.json()
+    card = board["columns"][0]["cards"][0]
+    done_id = board["columns"][4]["id"]
+
+    moved = client.put(f"/api/board/cards/{card['id']}/move",
+                       json={"column_id": done_id, "position": 0},
+                       headers={**auth_header, "If-Match": etag})
+    assert moved.status_code == 200
+    assert moved.headers["ETag"] != etag
+
+    stale = client.put(f"/api/board/cards/{card['id']}/move",
+                       json={"column_id": board["columns"][0]["id"], "position": 0},
+                       headers={**auth_header, "If-Match": etag})
+    assert stale.status_code == 412
+    assert client.get("/api/board", headers=auth_header).json()["columns"][4]["cards"][0]["id"] == card["id"]
+
+
+def test_card_version_only_guards_that_card(client, auth_header):
+    board = client.get("/api/board", headers=auth_header).json()
+    first, second = board["columns"][0]["cards"][:2]
+    tag = {"If-Match": f'"card-{first["version"]}"'}
+
+    # Another card changing moves the board on but leaves this card's version.
+    client.put(f"/api/board/cards/{second['id']}", json={"title": "Other"}, headers=auth_header)
+    resp = client.put(f"/api/board/cards/{first['id']}", json={"title": "Mine"},
+                      headers={**auth_header, **tag})
+    assert resp.status_code == 200
+    resp = client.delete(f"/api/board/cards/{first['id']}", headers={**auth_header, **tag})
+    assert resp.status_code == 412
+
+
+def test_if_match_must_name_a_version_the_route_checks(client, auth_header):
+    board = client.get("/api/board", headers=auth_header).json()
+    col_id = board["columns"][0]["id"]
+    for tag in ['W/"board-0"', '"something"', '"card-0"']:
+        resp = client.put(f"/api/board/columns/{col_id}", json={"title": "X"},
+                          headers={**auth_header, "If-Match": tag})
+        assert resp.status_code == 412, tag
+    resp = client.put(f"/api/board/columns/{col_id}", json={"title": "X"},
+                      headers={**auth_header, "If-Match": "*"})
+    assert resp.status_code == 200
@@ -1,7 +1,15 @@
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, patch
 
-from models import AIResponse
+import pytest
+
+import ai
+import routers.chat
+from jobs import JobRunner
+from models import AIResponse, CreateCardOp
 
 
 def test_chat_test_endpoint(client, auth_header):
@@ -25,6 +33,19 @@ def test_chat_test_requires_auth(client):
     assert resp.status_code == 401
 
 
+def test_chat_rate_limit_is_stored(client, auth_header, monkeypatch):
+    monkeypatch.setattr(routers.chat, "RATE_LIMIT_MAX", 2)
+    with patch("routers.chat.simple_chat", return_value="4"):
+        codes = [client.post("/api/chat/test", headers=auth_header).status_code for _ in range(3)]
+    assert codes == [200, 200, 429]
+
+    # Another worker process shares the database, so it sees the same count.
+    import database
+    conn = database.get_db()
+    assert conn.execute("SELECT COUNT(*) FROM chat_requests").fetchone()[0] == 2
+    conn.close()
+
+
 def _mock_ai_response(ai_response: AIResponse):
     """Create a mock that makes chat_with_board return the given AIResponse."""
     return patch("routers.chat.chat_with_board", return_value=ai_response)
@@ -193,6 +214,51 @@ def test_chat_invalid_card_id_is_skipped(client, auth_header):
     assert resp.json()["message"] == "Tried to update a nonexistent card."
 
 
+def test_chat_edit_made_during_the_call_keeps_the_reply(client, auth_header):
+    board = client.get("/api/board", headers=auth_header).json()
+    card = board["columns"][0]["cards"][0]
+    done_id = board["columns"][4]["id"]
+    ai_resp = AIResponse(message="Moved.", board_updates=[
+        {"action": "move_card", "card_id": card["id"], "target_column_id": done_id, "position": 0},
+    ])
+
+    def user_edits_during_the_call(*args, **kwargs):
+        client.put(f"/api/board/cards/{card['id']}", json={"title": "Renamed"}, headers=auth_header)
+        return ai_resp
+
+    with patch("routers.chat.chat_with_board", side_effect=user_edits_during_the_call):
+        resp = client.post("/api/chat", json={"message": "Move it to Done"}, headers=auth_header)
+    assert resp.status_code == 200
+    assert resp.json()["message"] == "Moved."
+    assert resp.json()["board"]["columns"][4]["cards"][0]["title"] == "Renamed"
+    conversation = routers.chat.get_repository().load_conversation(
+        "user", resp.json()["conversation_id"]
+    )
+    assert [m["content"] for m in conversation["messages"]] == ["Move it to Done", "Moved."]
+
+
+def test_chat_pinned_with_if_match_does_not_apply_edits_to_a_changed_board(client, auth_header):
+    board = client.get("/api/board", headers=auth_header).json()
+    card = board["columns"][0]["cards"][0]
+    done_id = board["columns"][4]["id"]
+    pinned = {**auth_header, "If-Match": f'"board-{board["version"]}"'}
+    ai_resp = AIResponse(message="Moved.", board_updates=[
+        {"action": "move_card", "card_id": card["id"], "target_column_id": done_id, "position": 0},
+    ])
+
+    def user_edits_during_the_call(*args, **kwargs):
+        client.put(f"/api/board/cards/{card['id']}", json={"title": "Renamed"}, headers=auth_header)
+        return ai_resp
+
+    with patch("routers.chat.chat_with_board", side_effect=user_edits_during_the_call):
+        resp = client.post("/api/chat", json={"message": "Move it to Done"}, headers=pinned)
+    assert resp.status_code == 412
+    assert client.get("/api/board", headers=auth_header).json()["columns"][0]["cards"][0]["id"] == card["id"]
+
+    stale = client.post("/api/chat", json={"message": "Hi"}, headers=pinned)
+    assert stale.status_code == 412
+
+
 def test_chat_with_history(client, auth_header):
     ai_resp = AIResponse(message="Sure, based on our conversation...", board_updates=[])
 
@@ -220,3 +286,340 @@ def test_chat_with_history(client, auth_header):
 def test_chat_requires_auth(client):
     resp = client.post("/api/chat", json={"message": "hi"})
     assert resp.status_code == 401
+
+
+def test_ai_client_is_configured_lazily(monkeypatch):
+    import ai
+
+    monkeypatch.setattr(ai, "_client", None)
+    monkeypatch.delenv("OPENROUTER_API_KEY", raising=False)
+    with pytest.raises(RuntimeError, match="OPENROUTER_API_KEY"):
+        ai.get_ai_client()
+
+
+def test_chat_starts_server_side_conversation(client, auth_header):
+    with _mock_ai_response(AIResponse(message="First reply")) as mock_fn:
+        first = client.post("/api/chat", json={"message": "Hello"}, headers=auth_header).json()
+        assert first["conversation_id"] is not None
+        second = client.post(
+            "/api/chat",
+            json={"message": "Follow up", "conversation_id": first["conversation_id"]},
+            headers=auth_header,
+        ).json()
+
+    assert second["conversation_id"] == first["conversation_id"]
+    assert mock_fn.call_args[0][2] == [
+        {"role": "user", "content": "Hello"},
+        {"role": "assistant", "content": "First reply"},
+    ]
+
+
+def test_chat_with_history_stays_stateless(client, auth_header):
+    with _mock_ai_response(AIResponse(message="Ok")):
+        resp = client.post(
+            "/api/chat",
+            json={"message": "Hi", "history": [{"role": "user", "content": "Earlier"}]},
+            headers=auth_header,
+        )
+    assert resp.json()["conversation_id"] is None
+
+
+def test_chat_unknown_conversation_is_404(client, auth_header):
+    with _mock_ai_response(AIResponse(message="Ok")):
+        resp = client.post(
+            "/api/chat", json={"message": "Hi", "conversation_id": 9999}, headers=auth_header
+        )
+    assert resp.status_code == 404
+
+
+def test_chat_folds_old_turns_into_summary(client, auth_header, monkeypatch):
+    monkeypatch.setattr(routers.chat, "CHAT_HISTORY_TOKEN_BUDGET", 10)
+    monkeypatch.setattr(routers.chat, "CHAT_KEEP_RECENT_MESSAGES", 2)
+    conversation_id = None
+    with _mock_ai_response(AIResponse(message="A reply long enough to count")) as mock_fn, \
+            patch("routers.chat.summarize_history", return_value="User said hello") as summarize:
+        for text in ("Hello", "Second", "Third"):
+            resp = client.post(
+                "/api/chat",
+                json={"message": text, "conversation_id": conversation_id},
+                headers=auth_header,
+            )
+            conversation_id = resp.json()["conversation_id"]
+
+    assert summarize.called
+    history = mock_fn.call_args[0][2]
+    assert history[0] == {
+        "role": "system", "content": "Summary of the earlier conversation: User said hello",
+    }
+    # Summary plus the two most recent messages: the prompt stays bounded.
+    assert len(history) == 3
+
+
+def test_chat_reply_does_not_wait_for_compaction(client, auth_header, monkeypatch):
+    monkeypatch.setattr(routers.chat, "CHAT_HISTORY_TOKEN_BUDGET", 10)
+    monkeypatch.setattr(routers.chat, "CHAT_KEEP_RECENT_MESSAGES", 2)
+    repo = routers.chat.get_repository()
+    conversation_id = repo.create_conversation("user")
+    repo.append_messages("user", conversation_id, [("user", "An old message"), ("assistant", "Ok")])
+    board = routers.chat._load_board(repo, "user")
+    body = routers.chat.ChatRequest(message="Hello", conversation_id=conversation_id)
+    with _mock_ai_response(AIResponse(message="A reply long enough to count")), \
+            patch("routers.chat.summarize_history", return_value="Summary") as summarize:
+        turn = routers.chat._run_chat(repo, "user", body, board)
+        assert not summarize.called
+        routers.chat._compact_conversation(repo, "user", turn.conversation_id)
+    assert summarize.called
+    assert repo.load_conversation("user", conversation_id)["summary"] == "Summary"
+
+
+def test_idempotency_key_replays_first_response(client, auth_header):
+    board = client.get("/api/board", headers=auth_header).json()
+    col_id = board["columns"][0]["id"]
+    ai_resp = AIResponse(
+        message="Added.",
+        board_updates=[CreateCardOp(action="create_card", column_id=col_id, title="Once")],
+    )
+    headers = {**auth_header, "Idempotency-Key": "abc-123"}
+    with _mock_ai_response(ai_resp) as mock_fn:
+        first = client.post("/api/chat", json={"message": "Add a card"}, headers=headers)
+        second = client.post("/api/chat", json={"message": "Add a card"}, headers=headers)
+
+    assert mock_fn.call_count == 1
+    assert first.json() == second.json()
+    board = client.get("/api/board", headers=auth_header).json()
+    assert [c["title"] for c in board["columns"][0]["cards"]].count("Once") == 1
+
+
+def test_idempotency_key_is_stored_for_other_workers(client, auth_header):
+    headers = {**auth_header, "Idempotency-Key": "shared"}
+    with _mock_ai_response(AIResponse(message="Stored.")):
+        client.post("/api/chat", json={"message": "Hi"}, headers=headers)
+
+    import database
+    conn = database.get_db()
+    row = conn.execute("SELECT status, result FROM chat_idempotency WHERE key = 'shared'").fetchone()
+    conn.close()
+    assert row["status"] == "done"
+    assert json.loads(row["result"])["message"] == "Stored."
+
+
+def test_idempotency_key_reused_with_another_body_is_422(client, auth_header):
+    headers = {**auth_header, "Idempotency-Key": "abc-123"}
+    with _mock_ai_response(AIResponse(message="Ok")) as mock_fn:
+        assert client.post("/api/chat", json={"message": "One"}, headers=headers).status_code == 200
+        resp = client.post("/api/chat", json={"message": "Two"}, headers=headers)
+    assert resp.status_code == 422
+    assert mock_fn.call_count == 1
+
+
+def test_idempotency_key_in_progress_on_another_worker_is_409(client, auth_header):
+    body = {"message": "Hi"}
+    # Another worker has claimed the key and is still waiting on the model.
+    repo = routers.chat.get_repository()
+    request_hash = routers.chat._request_hash(
+        "sync", routers.chat.ChatRequest.model_validate(body), None
+    )
+    assert repo.claim_idempotency_key("user", "busy", request_hash, time.time(), 600, 120)[0] == "claimed"
+
+    with _mock_ai_response(AIResponse(message="Ok")) as mock_fn:
+        resp = client.post("/api/chat", json=body, headers={**auth_header, "Idempotency-Key": "busy"})
+    assert resp.status_code == 409
+    assert resp.headers["retry-after"] == "1"
+    assert mock_fn.call_count == 0
+
+
+def test_idempotency_key_is_released_when_the_request_fails(client, auth_header):
+    headers = {**auth_header, "Idempotency-Key": "retry-me"}
+    with patch("routers.chat.chat_with_board", side_effect=RuntimeError("boom")):
+        assert client.post("/api/chat", json={"message": "Hi"}, headers=headers).status_code == 500
+    with _mock_ai_response(AIResponse(message="Second try")):
+        resp = client.post("/api/chat", json={"message": "Hi"}, headers=headers)
+    assert resp.json()["message"] == "Second try"
+
+
+def test_concurrent_identical_requests_share_one_call(client, auth_header):
+    calls = []
+    started = threading.Event()
+
+    def slow_chat(board, message, history, stats=None, policy=None):
+        calls.append(message)
+        started.set()
+        time.sleep(0.3)
+        return AIResponse(message="Shared")
+
+    def post():
+        return client.post(
+            "/api/chat", json={"message": "Same", "history": []}, headers=auth_header
+        )
+
+    with patch("routers.chat.chat_with_board", side_effect=slow_chat):
+        with ThreadPoolExecutor(2) as pool:
+            first = pool.submit(post)
+            started.wait(5)
+            second = pool.submit(post)
+            responses = [first.result(), second.result()]
+
+    assert len(calls) == 1
+    assert [r.json()["message"] for r in responses] == ["Shared", "Shared"]
+
+
+ASYNC = {"Prefer": "respond-async"}
+
+
+def _run_jobs():
+    assert routers.chat.chat_jobs.run_once() >= 0
+    assert routers.chat.chat_jobs.join(5)
+
+
+def test_async_chat_returns_job_and_result_is_polled(client, auth_header):
+    board = client.get("/api/board", headers=auth_header).json()
+    col_id = board["columns"][0]["id"]
+    ai_resp = AIResponse(
+        message="Split it.",
+        board_updates=[CreateCardOp(action="create_card", column_id=col_id, title="Subtask")],
+    )
+    with _mock_ai_response(ai_resp):
+        resp = client.post(
+            "/api/chat", json={"message": "Split every card"}, headers={**auth_header, **ASYNC}
+        )
+        assert resp.status_code == 202
+        job = resp.json()
+        assert job["status"] == "queued"
+        assert resp.headers["location"] == f"/api/chat/jobs/{job['id']}"
+
+        pending = client.get(resp.headers["location"], headers=auth_header)
+        assert pending.json()["status"] == "queued"
+        assert pending.headers["retry-after"] == "1"
+        _run_jobs()
+
+    done = client.get(resp.headers["location"], headers=auth_header).json()
+    assert done["status"] == "done"
+    assert done["result"]["message"] == "Split it."
+    assert done["result"]["conversation_id"] is not None
+    board = client.get("/api/board", headers=auth_header).json()
+    assert "Subtask" in [c["title"] for c in board["columns"][0]["cards"]]
+
+
+def test_async_chat_idempotency_key_returns_the_same_job(client, auth_header):
+    headers = {**auth_header, **ASYNC, "Idempotency-Key": "job-1"}
+    first = client.post("/api/chat", json={"message": "Split"}, headers=headers)
+    second = client.post("/api/chat", json={"message": "Split"}, headers=headers)
+    assert (first.status_code, second.status_code) == (202, 202)
+    assert first.headers["location"] == second.headers["location"]
+
+    sync = client.post(
+        "/api/chat", json={"message": "Split"},
+        headers={**auth_header, "Idempotency-Key": "job-1"},
+    )
+    assert sync.status_code == 422
+
+
+def test_async_chat_limits_jobs_per_user(client, auth_header, monkeypatch):
+    monkeypatch.setattr(routers.chat, "CHAT_JOB_USER_LIMIT", 1)
+    headers = {**auth_header, **ASYNC}
+    first = client.post("/api/chat", json={"message": "One"}, headers=headers)
+    second = client.post("/api/chat", json={"message": "Two"}, headers=headers)
+    assert (first.status_code, second.status_code) == (202, 429)
+
+    with _mock_ai_response(AIResponse(message="Ok")):
+        _run_jobs()
+    assert client.post("/api/chat", json={"message": "Two"}, headers=headers).status_code == 202
+
+
+def test_async_chat_job_survives_a_worker_restart(client, auth_header):
+    resp = client.post("/api/chat", json={"message": "Reorganize"}, headers={**auth_header, **ASYNC})
+    # A worker claims the job and dies with it; the lease is already over.
+    repo = routers.chat.get_repository()
+    assert len(repo.claim_chat_jobs(time.time(), -1, 10, 3)) == 1
+
+    with _mock_ai_response(AIResponse(message="Reorganized.")):
+        _run_jobs()
+    job = client.get(resp.headers["location"], headers=auth_header).json()
+    assert job["status"] == "done"
+    assert job["result"]["message"] == "Reorganized."
+
+
+def test_async_chat_job_whose_claim_lapsed_applies_nothing(client, auth_header):
+    board = client.get("/api/board", headers=auth_header).json()
+    col_id = board["columns"][0]["id"]
+    resp = client.post("/api/chat", json={"message": "Add"}, headers={**auth_header, **ASYNC})
+    repo = routers.chat.get_repository()
+    ai_resp = AIResponse(
+        message="Added.",
+        board_updates=[CreateCardOp(action="create_card", column_id=col_id, title="Once")],
+    )
+
+    def stalls_past_the_lease(*args, **kwargs):
+        # Another worker claims the job again while this attempt waits.
+        assert len(repo.claim_chat_jobs(time.time() + 3600, 60, 10, 3)) == 1
+        return ai_resp
+
+    with patch("routers.chat.chat_with_board", side_effect=stalls_past_the_lease):
+        _run_jobs()
+    board = client.get("/api/board", headers=auth_header).json()
+    assert "Once" not in [c["title"] for c in board["columns"][0]["cards"]]
+    assert client.get(resp.headers["location"], headers=auth_header).json()["status"] == "running"
+
+
+def test_shutdown_waits_for_running_chat_jobs(client, auth_header):
+    runner = JobRunner(routers.chat._run_chat_job)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_chat(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return AIResponse(message="Finished.")
+
+    resp = client.post("/api/chat", json={"message": "Slow"}, headers={**auth_header, **ASYNC})
+    with patch("routers.chat.chat_with_board", side_effect=slow_chat):
+        assert runner.run_once() == 1
+        assert started.wait(5)
+        runner.shutdown()
+        assert not runner.join(0.1)
+        release.set()
+        assert runner.join(5)
+    job = client.get(resp.headers["location"], headers=auth_header).json()
+    assert (job["status"], job["result"]["message"]) == ("done", "Finished.")
+
+
+def test_chat_job_outlasts_the_request_deadline(client, auth_header, monkeypatch):
+    monkeypatch.setattr(ai.resilience, "timeout", 0.1)
+    monkeypatch.setattr(ai.job_resilience, "timeout", 5)
+
+    def slow_provider(model, timeout, **kwargs):
+        if timeout < 0.3:
+            time.sleep(timeout)
+            raise TimeoutError()
+        time.sleep(0.3)
+        response = MagicMock()
+        response.choices[0].message.content = '{"message": "Slow but done", "board_updates": []}'
+        return response
+
+    provider = MagicMock()
+    provider.chat.completions.create.side_effect = slow_provider
+    monkeypatch.setattr(ai, "_client", provider)
+    body = {"message": "Add a card for the slow thing"}
+
+    assert client.post("/api/chat", json=body, headers=auth_header).status_code == 503
+    resp = client.post("/api/chat", json=body, headers={**auth_header, **ASYNC})
+    _run_jobs()
+    job = client.get(resp.headers["location"], headers=auth_header).json()
+    assert (job["status"], job["result"]["message"]) == ("done", "Slow but done")
+
+
+def test_async_chat_job_fails_when_pinned_board_changed(client, auth_header):
+    board = client.get("/api/board", headers=auth_header).json()
+    headers = {**auth_header, **ASYNC, "If-Match": f'"board-{board["version"]}"'}
+    resp = client.post("/api/chat", json={"message": "Tidy up"}, headers=headers)
+    card = board["columns"][0]["cards"][0]
+    client.put(f"/api/board/cards/{card['id']}", json={"title": "Edited"}, headers=auth_header)
+
+    with _mock_ai_response(AIResponse(message="Tidied.")) as mock_fn:
+        _run_jobs()
+    assert mock_fn.call_count == 0
+    job = client.get(resp.headers["location"], headers=auth_header).json()
+    assert (job["status"], job["error"]) == ("failed", "The board has changed")
+
+
+def test_chat_job_unknown_id_is_404(client, auth_header):
+    assert client.get("/api/chat/jobs/999", headers=auth_header).status_code == 404
@@ -0,0 +1,41 @@
+import database
+from database import PROFILES, get_db
+
+
+def test_default_profile_is_applied():
+    conn = get_db()
+    try:
+        expected = PROFILES[database.SQLITE_PROFILE]
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == expected["cache_size"]
+        assert conn.execute("PRAGMA wal_autocheckpoint").fetchone()[0] == expected["wal_autocheckpoint"]
+        # Committed changes survive power loss unless a profile opts out.
+        assert database.SQLITE_PROFILE == "durable"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 2
+    finally:
+        conn.close()
+
+
+def test_named_profile_overrides_default():
+    conn = get_db(profile="balanced")
+    try:
+        # synchronous: 0=OFF, 1=NORMAL, 2=FULL
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+    finally:
+        conn.close()
+    conn = get_db(profile="fast")
+    try:
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 0
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+    finally:
+        conn.close()
+
+
+def test_seeding_is_idempotent_and_uses_precomputed_hash():
+    conn = get_db()
+    try:
+        database.init_db(conn)
+        database.init_db(conn)
+        rows = conn.execute("SELECT password_hash FROM users WHERE username = 'user'").fetchall()
+        assert [r[0] for r in rows] == [database.SEED_PASSWORD_HASH]
+    finally:
+        conn.close()
@@ -0,0 +1,28 @@
+import database
+from health import ReadinessProbe
+
+
+def test_live_is_ok(client):
+    resp = client.get("/api/health/live")
+    assert resp.status_code == 200
+    assert resp.json() == {"status": "ok"}
+
+
+def test_ready_reports_cached_state(client, monkeypatch):
+    probe = ReadinessProbe()
+    monkeypatch.setattr("main.readiness", probe)
+    first = client.get("/api/health/ready").json()
+    assert first["ready"] is True
+    assert first["databases"] == {database.DB_PATH.name: True}
+    assert "writer_queue_depth" in first and "read_pools" in first
+    # Probes read the cached result until the next refresh.
+    assert client.get("/api/health/ready").json()["checked_at"] == first["checked_at"]
+
+
+def test_ready_returns_503_when_database_unreachable(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(database, "all_db_paths", lambda: [tmp_path / "missing.db"])
+    probe = ReadinessProbe()
+    monkeypatch.setattr("main.readiness", probe)
+    resp = client.get("/api/health/ready")
+    assert resp.status_code == 503
+    assert resp.json()["databases"] == {"missing.db": False}
@@ -0,0 +1,146 @@
+import sqlite3
+import time
+
+from maintenance import MaintenanceScheduler
+from writer import submit
+
+
+def test_incremental_vacuum_frees_pages():
+    submit(lambda w: w.executemany(
+        "INSERT INTO users (username, password_hash) VALUES (?, ?)",
+        [(f"u{i}", "x" * 2000) for i in range(200)],
+    ))
+    submit(lambda w: w.execute("DELETE FROM users WHERE username LIKE 'u%'"))
+
+    scheduler = MaintenanceScheduler()
+    scheduler.run_tasks(["checkpoint", "vacuum"])
+
+    assert scheduler.stats["vacuum"]["freed_pages"] > 0
+    assert scheduler.stats["checkpoint"]["busy"] is False
+    assert scheduler.stats["vacuum"]["runs"] == 1
+
+
+def test_optimize_runs():
+    scheduler = MaintenanceScheduler()
+    scheduler.run_tasks(["optimize"])
+    assert "error" not in scheduler.stats["optimize"]
+
+
+def test_due_respects_intervals():
+    scheduler = MaintenanceScheduler(intervals={"checkpoint": 10, "optimize": 0, "vacuum": 60})
+    now = time.monotonic()
+    assert scheduler.due(now) == []
+    assert scheduler.due(now + 11) == ["checkpoint"]
+    assert scheduler.due(now + 61) == ["checkpoint", "vacuum"]
+
+
+def test_metrics_report_maintenance_stats(client, auth_header, monkeypatch):
+    scheduler = MaintenanceScheduler()
+    scheduler.run_tasks(["checkpoint"])
+    monkeypatch.setattr("main.scheduler", scheduler)
+    assert "maintenance" not in client.get("/api/health").json()
+    stats = client.get("/api/metrics", headers=auth_header).json()["maintenance"]
+    assert stats["checkpoint"]["runs"] == 1
+
+
+def test_archive_policy_trims_done_column(monkeypatch):
+    import maintenance
+    from storage.sqlite import SqliteRepository
+
+    repo = SqliteRepository()
+    repo.ensure_board("user")
+    monkeypatch.setattr(maintenance, "ARCHIVE_DONE_LIMIT", 1)
+
+    scheduler = MaintenanceScheduler()
+    scheduler.run_tasks(["archive"])
+
+    board = repo.load_board("user")
+    assert [c["title"] for c in board["columns"][4]["cards"]] == ["Ship marketing page"]
+    assert scheduler.stats["archive"]["archived_cards"] == 1
+    assert [a["title"] for a in repo.search_archive("user", "", 10)] == ["Close onboarding sprint"]
+
+
+def test_scheduler_notices_commits_from_other_connections():
+    import database
+
+    scheduler = MaintenanceScheduler()
+    assert scheduler._saw_write()  # first reading
+    assert not scheduler._saw_write()
+    conn = database.get_db()
+    conn.execute("INSERT INTO users (username, password_hash) VALUES ('other', 'x')")
+    conn.commit()
+    conn.close()
+    assert scheduler._saw_write()
+
+
+def test_old_files_are_converted_only_on_request(tmp_path):
+    import database
+    from maintenance import enable_incremental_vacuum
+
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)  # created before incremental auto-vacuum
+    conn.execute("CREATE TABLE t (x)")
+    conn.close()
+
+    conn = database.get_db(path)
+    database.init_db(conn)
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+    assert enable_incremental_vacuum(conn)
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    assert not enable_incremental_vacuum(conn)
+    conn.close()
+
+    fresh = database.get_db(tmp_path / "new.db")
+    assert fresh.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    fresh.close()
+
+
+def test_idle_conversations_expire_with_their_messages(monkeypatch):
+    import database
+    import maintenance
+    from storage.sqlite import SqliteRepository
+
+    repo = SqliteRepository()
+    old = repo.create_conversation("user")
+    recent = repo.create_conversation("user")
+    for conversation_id in (old, recent):
+        repo.append_messages("user", conversation_id, [("user", "hi"), ("assistant", "hello")])
+    submit(lambda w: w.execute(
+        "UPDATE conversations SET updated_at = updated_at - 31 * 86400 WHERE id = ?", (old,)
+    ))
+    monkeypatch.setattr(maintenance, "CONVERSATION_RETENTION_DAYS", 30)
+
+    scheduler = MaintenanceScheduler()
+    scheduler.run_tasks(["conversations"])
+
+    assert scheduler.stats["conversations"]["expired_conversations"] == 1
+    assert repo.load_conversation("user", recent)["messages"]
+    conn = database.get_db()
+    assert conn.execute(
+        "SELECT COUNT(*) FROM conversation_messages WHERE conversation_id = ?", (old,)
+    ).fetchone()[0] == 0
+    conn.close()
+
+
+def test_row_changing_tasks_go_through_the_writer():
+    import asyncio
+
+    import writer
+
+    scheduler = MaintenanceScheduler(quiet_seconds=60, tick_seconds=0)
+    before = writer.last_write_at()
+    scheduler.run_tasks(["archive", "conversations"])
+    assert writer.last_write_at() > before
+
+    # The scheduler's own commits do not count as activity that holds it back.
+    scheduler._own_write = writer.last_write_at()
+    scheduler._saw_write()
+    scheduler.intervals = {"optimize": 1e-9}
+
+    async def until_optimized():
+        task = asyncio.create_task(scheduler.run())
+        while "optimize" not in scheduler.stats:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(asyncio.wait_for(until_optimized(), 5))
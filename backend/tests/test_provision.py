@@ -0,0 +1,66 @@
+import io
+
+import bcrypt
+import pytest
+
+import storage.sqlite
+from database import SEED_TEMPLATE
+from provision import provision, read_users, template_from_board
+from storage import NotFoundError
+from storage.memory import MemoryRepository
+from storage.sqlite import SqliteRepository
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def repo(request):
+    return SqliteRepository() if request.param == "sqlite" else MemoryRepository()
+
+
+def test_provision_creates_users_with_seed_boards(repo):
+    users = [(f"new{i}", f"pw{i}") for i in range(5)] + [("user", "ignored")]
+    result = provision(repo, users, workers=2, chunk_size=2, rounds=4)
+
+    assert result == {"created": 5, "skipped": 1}
+    assert bcrypt.checkpw(b"pw3", repo.get_user("new3")["password_hash"].encode())
+    board = repo.load_board("new3")
+    assert template_from_board(board) == [(t, list(c)) for t, c in SEED_TEMPLATE]
+    stats = repo.board_stats("new3", 1)
+    assert stats["cards"] == stats["created"] == sum(len(c) for _, c in SEED_TEMPLATE)
+    # The existing account keeps its password.
+    assert bcrypt.checkpw(b"password", repo.get_user("user")["password_hash"].encode())
+
+
+def test_provision_leaves_existing_users_alone(repo):
+    with pytest.raises(NotFoundError):
+        repo.load_board("user")  # seeded account, no board until first login
+    provision(repo, [("user", "ignored"), ("new", "pw")], workers=1, rounds=4)
+    with pytest.raises(NotFoundError):
+        repo.load_board("user")
+    assert len(repo.load_board("new")["columns"]) == len(SEED_TEMPLATE)
+
+
+def test_provision_clones_a_template_board(repo):
+    repo.ensure_board("user")
+    done = repo.load_board("user")["columns"][4]["id"]
+    repo.create_card("user", done, "Template only", "from the template")
+    template = template_from_board(repo.load_board("user"))
+
+    provision(repo, [("alice", "pw"), ("bob", "pw")], template, workers=2, rounds=4)
+
+    alice, bob = repo.load_board("alice"), repo.load_board("bob")
+    assert template_from_board(alice) == template_from_board(bob) == template
+    assert alice["id"] != bob["id"]
+    assert {c["id"] for c in alice["columns"]}.isdisjoint(c["id"] for c in bob["columns"])
+
+
+def test_first_login_after_provisioning_does_not_write(monkeypatch):
+    repo = SqliteRepository()
+    provision(repo, [("carol", "pw")], rounds=4)
+    monkeypatch.setattr(storage.sqlite, "submit", lambda *a: pytest.fail("login wrote"))
+    repo.ensure_board("carol")
+
+
+def test_read_users_rejects_malformed_lines():
+    assert list(read_users(io.StringIO("a,1\n\n b ,p w\n"))) == [("a", "1"), ("b", "p w")]
+    with pytest.raises(ValueError, match="Line 2"):
+        list(read_users(io.StringIO("a,1\nb\n")))
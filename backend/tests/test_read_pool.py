@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+
+import metrics
+from database import get_read_db, get_read_pool
+
+
+def test_read_connection_rejects_writes():
+    conn = get_read_db()
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO users (username, password_hash) VALUES ('x', 'y')")
+    finally:
+        conn.close()
+
+
+def test_read_connection_opens_paths_with_uri_characters(tmp_path):
+    from database import get_db
+
+    path = tmp_path / "data?v=1#x%41" / "kanban.db"
+    path.parent.mkdir()
+    writable = get_db(path)
+    writable.execute("CREATE TABLE t (x)")
+    writable.commit()
+    writable.close()
+
+    conn = get_read_db(path)
+    try:
+        assert conn.execute("SELECT name FROM sqlite_master").fetchone()[0] == "t"
+    finally:
+        conn.close()
+
+
+def test_get_board_does_not_write(client, auth_header):
+    metrics.reset()
+    for _ in range(3):
+        assert client.get("/api/board", headers=auth_header).status_code == 200
+    assert "writer.ops" not in metrics.snapshot()["counters"]
+
+
+def test_read_connections_are_reused(client, auth_header):
+    client.get("/api/board", headers=auth_header)
+    metrics.reset()
+    for _ in range(5):
+        client.get("/api/board", headers=auth_header)
+    assert "read_pool.opened" not in metrics.snapshot()["counters"]
+
+
+def test_pool_release_keeps_connection_idle():
+    pool = get_read_pool()
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    pool.release(conn)
+
+
+def test_login_provisions_board(client):
+    conn = get_read_db()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM boards").fetchone()[0] == 0
+    finally:
+        conn.close()
+    client.post("/api/auth/login", json={"username": "user", "password": "password"})
+    conn = get_read_db()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM columns").fetchone()[0] == 5
+    finally:
+        conn.close()
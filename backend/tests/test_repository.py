@@ -0,0 +1,332 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from models import CreateCardOp, DeleteCardOp, MoveCardOp
+from storage import (
+    JOB_ABANDONED,
+    IdempotencyKeyReusedError,
+    LeaseLostError,
+    NotFoundError,
+    PreconditionFailedError,
+    get_repository,
+)
+from storage.memory import MemoryRepository
+from storage.sqlite import SqliteRepository
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def repo(request):
+    repo = SqliteRepository() if request.param == "sqlite" else MemoryRepository()
+    repo.ensure_board("user")
+    return repo
+
+
+def _titles(board: dict, col: int) -> list[str]:
+    return [c["title"] for c in board["columns"][col]["cards"]]
+
+
+def test_load_board_matches_seed(repo):
+    board = repo.load_board("user")
+    assert [c["title"] for c in board["columns"]] == [
+        "Backlog", "Discovery", "In Progress", "Review", "Done",
+    ]
+    assert sum(len(c["cards"]) for c in board["columns"]) == 8
+
+
+def test_create_move_delete_keep_positions_contiguous(repo):
+    board = repo.load_board("user")
+    backlog, done = board["columns"][0]["id"], board["columns"][4]["id"]
+
+    card_id = repo.create_card("user", backlog, "New", "")
+    repo.move_card("user", card_id, done, 0)
+    board = repo.load_board("user")
+    assert _titles(board, 4)[0] == "New"
+
+    repo.delete_card("user", board["columns"][4]["cards"][1]["id"])
+    for col in repo.load_board("user")["columns"]:
+        assert [c["position"] for c in col["cards"]] == list(range(len(col["cards"])))
+
+
+def test_update_keeps_unset_fields(repo):
+    card = repo.load_board("user")["columns"][0]["cards"][0]
+    repo.update_card("user", card["id"], "Renamed", None)
+    updated = repo.load_board("user")["columns"][0]["cards"][0]
+    assert updated["title"] == "Renamed"
+    assert updated["details"] == card["details"]
+
+
+def test_missing_ids_raise_not_found(repo):
+    with pytest.raises(NotFoundError):
+        repo.rename_column("user", 9999, "X")
+    with pytest.raises(NotFoundError):
+        repo.delete_card("user", 9999)
+
+
+def test_apply_board_updates_skips_bad_ops(repo):
+    board = repo.load_board("user")
+    backlog = board["columns"][0]
+    repo.apply_board_updates("user", [
+        DeleteCardOp(action="delete_card", card_id=9999),
+        CreateCardOp(action="create_card", column_id=backlog["id"], title="AI"),
+        MoveCardOp(action="move_card", card_id=backlog["cards"][0]["id"],
+                   target_column_id=9999, position=0),
+    ])
+    board = repo.load_board("user")
+    assert _titles(board, 0) == [c["title"] for c in backlog["cards"]] + ["AI"]
+
+
+def test_http_routes_run_on_memory_engine():
+    memory = MemoryRepository()
+    app.dependency_overrides[get_repository] = lambda: memory
+    try:
+        client = TestClient(app)
+        token = client.post(
+            "/api/auth/login", json={"username": "user", "password": "password"}
+        ).json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        col_id = client.get("/api/board", headers=headers).json()["columns"][1]["id"]
+        resp = client.post(
+            "/api/board/cards", json={"column_id": col_id, "title": "Mem"}, headers=headers
+        )
+        assert resp.status_code == 201
+        assert resp.json()["columns"][1]["cards"][-1]["title"] == "Mem"
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_archive_round_trip(repo):
+    board = repo.load_board("user")
+    card = board["columns"][0]["cards"][0]
+    review_id = board["columns"][3]["id"]
+
+    repo.archive_card("user", card["id"])
+    assert card["id"] not in [c["id"] for c in repo.load_board("user")["columns"][0]["cards"]]
+    assert [a["id"] for a in repo.search_archive("user", "ROADMAP", 10)] == [card["id"]]
+    assert repo.search_archive("user", "no such text", 10) == []
+
+    repo.restore_card("user", card["id"], review_id)
+    assert repo.load_board("user")["columns"][3]["cards"][-1]["id"] == card["id"]
+    with pytest.raises(NotFoundError):
+        repo.restore_card("user", card["id"], None)
+
+
+def test_conversation_append_and_compact(repo):
+    conversation_id = repo.create_conversation("user")
+    repo.append_messages("user", conversation_id, [("user", "a"), ("assistant", "b"), ("user", "c")])
+    assert repo.compact_conversation("user", conversation_id, "", "a then b", 2)
+    # A second compaction of the same history finds the summary replaced.
+    assert not repo.compact_conversation("user", conversation_id, "", "a then b", 2)
+    conversation = repo.load_conversation("user", conversation_id)
+    assert conversation["summary"] == "a then b"
+    assert conversation["messages"] == [{"role": "user", "content": "c"}]
+    with pytest.raises(NotFoundError):
+        repo.load_conversation("someone-else", conversation_id)
+
+
+def test_export_and_import_round_trip(repo):
+    records = list(repo.export_board("user"))
+    columns = [r for r in records if r["type"] == "column"]
+    cards = [r for r in records if r["type"] == "card"]
+    resolved = repo.import_columns("user", [c["title"] for c in columns] + ["New"])
+    assert resolved[:-1] == [c["id"] for c in columns]
+    new_column = resolved[-1]
+    assert repo.import_cards("user", [(new_column, c["title"], c["details"])
+                                      for c in cards]) == len(cards)
+    assert len(repo.load_board("user")["columns"][-1]["cards"]) == len(cards)
+    with pytest.raises(NotFoundError):
+        repo.import_cards("user", [(9999, "x", "")])
+
+
+def test_import_appends_below_cards_created_between_chunks(repo):
+    column_id = repo.import_columns("user", ["Imports"])[0]
+    repo.import_cards("user", [(column_id, "First", ""), (column_id, "Second", "")])
+    repo.create_card("user", column_id, "Made meanwhile", "")
+    repo.import_cards("user", [(column_id, "Third", "")])
+    cards = repo.load_board("user")["columns"][-1]["cards"]
+    assert [c["title"] for c in cards] == ["First", "Second", "Made meanwhile", "Third"]
+    assert [c["position"] for c in cards] == [0, 1, 2, 3]
+
+
+def test_chat_requests_limited_per_window(repo):
+    assert repo.record_chat_request("user", 100.0, 60, 2)
+    assert repo.record_chat_request("user", 110.0, 60, 2)
+    assert not repo.record_chat_request("user", 150.0, 60, 2)
+    assert repo.record_chat_request("user", 161.0, 60, 2)  # the first one aged out
+
+
+def test_idempotency_keys_are_claimed_once(repo):
+    assert repo.claim_idempotency_key("user", "k", "h1", 100.0, 600, 60) == ("claimed", None)
+    assert repo.claim_idempotency_key("user", "k", "h1", 101.0, 600, 60) == ("running", None)
+    with pytest.raises(IdempotencyKeyReusedError):
+        repo.claim_idempotency_key("user", "k", "h2", 101.0, 600, 60)
+
+    repo.record_chat_turn("user", [], None, [], "result", idempotency_key="k")
+    assert repo.claim_idempotency_key("user", "k", "h1", 102.0, 600, 60) == ("done", "result")
+    assert repo.claim_idempotency_key("user", "k", "h2", 701.0, 600, 60) == ("claimed", None)
+
+    # A released claim, or one abandoned past its lease, can be claimed again.
+    repo.release_idempotency_key("user", "k")
+    assert repo.claim_idempotency_key("user", "k", "h1", 702.0, 600, 60) == ("claimed", None)
+    assert repo.claim_idempotency_key("user", "k", "h1", 763.0, 600, 60) == ("claimed", None)
+
+
+def test_chat_turn_is_recorded_with_its_edits(repo):
+    board = repo.load_board("user")
+    backlog = board["columns"][0]["id"]
+    conversation_id = repo.create_conversation("user")
+    repo.claim_idempotency_key("user", "k", "h", 100.0, 600, 60)
+    ops = [CreateCardOp(action="create_card", column_id=backlog, title="From AI")]
+
+    with pytest.raises(PreconditionFailedError):
+        repo.record_chat_turn("user", ops, conversation_id, [("user", "Hi")], "r",
+                              board_version=board["version"] - 1, idempotency_key="k")
+    assert "From AI" not in _titles(repo.load_board("user"), 0)
+    assert repo.load_conversation("user", conversation_id)["messages"] == []
+    assert repo.claim_idempotency_key("user", "k", "h", 101.0, 600, 60)[0] == "running"
+
+    repo.record_chat_turn("user", ops, conversation_id, [("user", "Hi")], "r",
+                          board_version=board["version"], idempotency_key="k")
+    assert "From AI" in _titles(repo.load_board("user"), 0)
+    assert len(repo.load_conversation("user", conversation_id)["messages"]) == 1
+    assert repo.claim_idempotency_key("user", "k", "h", 102.0, 600, 60) == ("done", "r")
+
+
+def test_board_cache_sees_writes_from_other_connections():
+    import database
+    import metrics
+
+    repo = SqliteRepository()
+    repo.ensure_board("user")
+    metrics.reset()
+    first = repo.load_board("user")
+    assert repo.load_board("user") is first
+    assert metrics.snapshot()["counters"]["board_cache.hits"] == 1
+
+    # Stands in for another worker process writing the same file.
+    conn = database.get_db()
+    conn.execute("UPDATE boards SET name = 'Renamed elsewhere'")
+    conn.commit()
+    conn.close()
+    assert repo.load_board("user")["name"] == "Renamed elsewhere"
+
+
+def test_stale_versions_raise_and_change_nothing(repo):
+    board = repo.load_board("user")
+    card = board["columns"][0]["cards"][0]
+    done = board["columns"][4]["id"]
+
+    repo.create_card("user", done, "Bump", "", board_version=board["version"])
+    with pytest.raises(PreconditionFailedError):
+        repo.move_card("user", card["id"], done, 0, board_version=board["version"])
+    with pytest.raises(PreconditionFailedError):
+        repo.update_card("user", card["id"], "X", None, card_version=card["version"] + 1)
+    after = repo.load_board("user")
+    assert after["version"] == board["version"] + 1
+    assert after["columns"][0]["cards"][0] == card
+
+
+def test_board_stats_follow_every_write_path(repo):
+    board = repo.load_board("user")
+    backlog, done = board["columns"][0], board["columns"][4]
+    seeded = sum(len(c["cards"]) for c in board["columns"])
+
+    stats = repo.board_stats("user", 7)
+    assert (stats["cards"], stats["created"], stats["moved"]) == (seeded, seeded, 0)
+    assert stats["columns"][0]["avg_time_in_column_seconds"] is None
+
+    first, second = backlog["cards"]
+    repo.move_card("user", second["id"], backlog["id"], 0)  # reorder only
+    repo.move_card("user", first["id"], done["id"], 0)
+    repo.archive_card("user", second["id"])
+    repo.restore_card("user", second["id"], done["id"])
+    repo.delete_card("user", done["cards"][0]["id"])
+    repo.import_cards("user", [(backlog["id"], "Imported", "")])
+
+    stats = repo.board_stats("user", 7)
+    columns = {c["id"]: c for c in stats["columns"]}
+    assert stats["cards"] == seeded
+    assert (stats["created"], stats["moved"], stats["deleted"]) == (seeded + 2, 1, 2)
+    assert columns[backlog["id"]]["cards"] == 1
+    assert columns[backlog["id"]]["activity"] == {
+        "created": 3, "moved_in": 0, "moved_out": 1, "deleted": 1,
+    }
+    assert columns[backlog["id"]]["avg_time_in_column_seconds"] >= 0
+    assert columns[done["id"]]["cards"] == len(done["cards"]) + 1
+    assert columns[done["id"]]["activity"]["moved_in"] == 1
+    assert columns[done["id"]]["avg_age_seconds"] >= 0
+
+
+def test_board_stats_backfilled_for_existing_databases(tmp_path):
+    import database
+
+    path = tmp_path / "old.db"
+    conn = database.get_db(path)
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL UNIQUE,
+                            password_hash TEXT NOT NULL);
+        CREATE TABLE boards (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL UNIQUE,
+                             name TEXT NOT NULL DEFAULT 'My Board');
+        CREATE TABLE columns (id INTEGER PRIMARY KEY AUTOINCREMENT, board_id INTEGER NOT NULL,
+                              title TEXT NOT NULL, position INTEGER NOT NULL);
+        CREATE TABLE cards (id INTEGER PRIMARY KEY AUTOINCREMENT, column_id INTEGER NOT NULL,
+                            title TEXT NOT NULL, details TEXT NOT NULL DEFAULT '',
+                            position INTEGER NOT NULL);
+        INSERT INTO users (username, password_hash) VALUES ('old', 'x');
+        INSERT INTO boards (user_id) VALUES (1);
+        INSERT INTO columns (board_id, title, position) VALUES (1, 'Todo', 0), (1, 'Done', 1);
+        INSERT INTO cards (column_id, title, position) VALUES (1, 'a', 0), (1, 'b', 1), (2, 'c', 0);
+    """)
+    database.init_db(conn, seed=False)
+    counts = [r[0] for r in conn.execute("SELECT card_count FROM columns ORDER BY position")]
+    stamped = conn.execute("SELECT COUNT(*) FROM cards WHERE entered_at > 0").fetchone()[0]
+    conn.close()
+    assert counts == [2, 1]
+    assert stamped == 3
+
+
+def test_chat_jobs_run_one_at_a_time_per_user(repo):
+    first = repo.create_chat_job("user", "{}", 100.0, 3, 3600)
+    second = repo.create_chat_job("user", "{}", 100.0, 3, 3600)
+    repo.create_chat_job("user", "{}", 100.0, 3, 3600)
+    assert repo.create_chat_job("user", "{}", 100.0, 3, 3600) is None
+
+    assert repo.claim_chat_jobs(101.0, 60, 10, 2) == [
+        {"id": first, "username": "user", "request": "{}", "attempt": 1},
+    ]
+    assert repo.claim_chat_jobs(102.0, 60, 10, 2) == []  # first is still running
+    assert repo.finish_chat_job("user", first, 1, "done", "{}", None, 103.0)
+    assert [j["id"] for j in repo.claim_chat_jobs(104.0, 60, 10, 2)] == [second]
+    assert repo.get_chat_job("user", first)["status"] == "done"
+
+    # The worker running `second` dies twice; after that the job is given up.
+    assert [j["attempt"] for j in repo.claim_chat_jobs(165.0, 60, 10, 2)] == [2]
+    assert repo.claim_chat_jobs(226.0, 60, 10, 2) == []
+    assert repo.get_chat_job("user", second)["error"] == JOB_ABANDONED
+    assert [j["id"] for j in repo.claim_chat_jobs(227.0, 60, 10, 2)] == [second + 1]
+
+    # Finished jobs are kept for `keep` seconds, then go when a job is queued.
+    repo.create_chat_job("user", "{}", 5000.0, 3, 3600)
+    with pytest.raises(NotFoundError):
+        repo.get_chat_job("user", first)
+
+
+def test_chat_job_outcome_is_recorded_only_by_its_attempt(repo):
+    backlog = repo.load_board("user")["columns"][0]["id"]
+    ops = [CreateCardOp(action="create_card", column_id=backlog, title="From job")]
+    job_id = repo.create_chat_job("user", "{}", 100.0, 3, 3600)
+    repo.claim_chat_jobs(101.0, 60, 10, 3)
+    # The first attempt stalls past its lease and the job is claimed again.
+    assert [j["attempt"] for j in repo.claim_chat_jobs(162.0, 60, 10, 3)] == [2]
+
+    with pytest.raises(LeaseLostError):
+        repo.record_chat_turn("user", ops, None, [], "stale", job=(job_id, 1))
+    assert not repo.finish_chat_job("user", job_id, 1, "failed", None, "x", 163.0)
+    assert "From job" not in _titles(repo.load_board("user"), 0)
+    assert repo.get_chat_job("user", job_id)["status"] == "running"
+
+    repo.record_chat_turn("user", ops, None, [], "fresh", job=(job_id, 2))
+    assert _titles(repo.load_board("user"), 0).count("From job") == 1
+    job = repo.get_chat_job("user", job_id)
+    assert (job["status"], job["result"]) == ("done", "fresh")
+    assert not repo.finish_chat_job("user", job_id, 2, "failed", None, "x", 164.0)
\ No newline at end of file
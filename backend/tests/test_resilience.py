@@ -0,0 +1,121 @@
+import time
+
+import pytest
+
+import metrics
+from resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ProviderUnavailableError,
+    ResiliencePolicy,
+)
+
+
+class Flaky(Exception):
+    status_code = 503
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+def _policy(**kwargs):
+    defaults = dict(
+        timeout=5, max_retries=2, breaker=CircuitBreaker("test", 3, 60), backoff_base=0.001
+    )
+    return ResiliencePolicy("test", **{**defaults, **kwargs})
+
+
+def test_retries_retryable_errors_then_succeeds():
+    metrics.reset()
+    outcomes = [Flaky(), Flaky(), "ok"]
+
+    def call(timeout):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert _policy().call(call) == "ok"
+    assert metrics.snapshot()["counters"]["test.retries"] == 2
+
+
+def test_non_retryable_errors_propagate_immediately():
+    calls = []
+
+    def call(timeout):
+        calls.append(timeout)
+        raise BadRequest()
+
+    with pytest.raises(BadRequest):
+        _policy().call(call)
+    assert len(calls) == 1
+
+
+def test_breaker_opens_and_fails_fast():
+    breaker = CircuitBreaker("test", 3, 60)
+    policy = _policy(breaker=breaker)
+
+    def failing(timeout):
+        raise Flaky()
+
+    with pytest.raises(ProviderUnavailableError):
+        policy.call(failing)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        policy.call(lambda timeout: "never called")
+
+
+def test_half_open_trial_closes_breaker():
+    breaker = CircuitBreaker("test", 1, 0.01)
+    breaker.record_failure()
+    assert breaker.state == "open"
+    time.sleep(0.02)
+    assert breaker.state == "half_open"
+    assert _policy(breaker=breaker).call(lambda timeout: "ok") == "ok"
+    assert breaker.state == "closed"
+
+
+def test_each_attempt_gets_the_remaining_deadline():
+    timeouts = []
+
+    def call(timeout):
+        timeouts.append(timeout)
+        raise TimeoutError()
+
+    with pytest.raises(ProviderUnavailableError):
+        _policy(timeout=1).call(call)
+    assert timeouts[0] <= 1
+    assert timeouts == sorted(timeouts, reverse=True)
+
+
+def test_hedged_request_wins_when_primary_is_slow():
+    metrics.reset()
+    policy = _policy(hedge=True, hedge_min_samples=3)
+    for _ in range(5):
+        policy.latency.add(0.01)
+    calls = []
+
+    def call(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    assert policy.call(call) == "fast"
+    counters = metrics.snapshot()["counters"]
+    assert counters["test.hedged"] == 1
+    assert counters["test.hedge_wins"] == 1
+
+
+def test_chat_returns_503_when_provider_is_unavailable(client, auth_header, monkeypatch):
+    import routers.chat
+
+    def unavailable(*args, **kwargs):
+        raise ProviderUnavailableError("down")
+
+    monkeypatch.setattr(routers.chat, "chat_with_board", unavailable)
+    resp = client.post("/api/chat", json={"message": "hi"}, headers=auth_header)
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "30"
@@ -0,0 +1,113 @@
+import json
+
+import zstandard
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+import metrics
+from response_compression import COMPRESS_MIN_BYTES, CompressionMiddleware
+
+
+def _fill_board(client, auth_header, cards=40):
+    board = client.get("/api/board", headers=auth_header).json()
+    column_id = board["columns"][0]["id"]
+    for i in range(cards):
+        client.post(
+            "/api/board/cards",
+            json={"column_id": column_id, "title": f"Card {i}", "details": "Some details"},
+            headers=auth_header,
+        )
+
+
+def test_large_board_is_gzipped(client, auth_header):
+    _fill_board(client, auth_header)
+    metrics.reset()
+    resp = client.get("/api/board", headers={**auth_header, "Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["vary"]
+    assert len(resp.json()["columns"][0]["cards"]) > 40
+    assert "compress;dur=" in resp.headers["server-timing"]
+    assert metrics.snapshot()["summaries"]["compression.ms"]["count"] == 1
+
+
+def test_zstd_is_preferred_when_accepted(client, auth_header):
+    _fill_board(client, auth_header)
+    metrics.reset()
+    resp = client.get(
+        "/api/board", headers={**auth_header, "Accept-Encoding": "gzip, zstd"}
+    )
+    assert resp.headers["content-encoding"] == "zstd"
+    body = zstandard.ZstdDecompressor().decompressobj().decompress(resp.content)
+    assert len(json.loads(body)["columns"][0]["cards"]) > 40
+    assert int(resp.headers["content-length"]) == len(resp.content)
+    assert metrics.snapshot()["counters"]["compression.zstd"] == 1
+
+
+def test_compressed_board_has_its_own_etag(client, auth_header):
+    _fill_board(client, auth_header)
+    gzipped = client.get("/api/board", headers={**auth_header, "Accept-Encoding": "gzip"})
+    plain = client.get("/api/board", headers={**auth_header, "Accept-Encoding": "identity"})
+    version = plain.json()["version"]
+    assert plain.headers["etag"] == f'"board-{version}"'
+    assert gzipped.headers["etag"] == f'"board-{version}-gzip"'
+
+    # Either form revalidates, and the 304 names the one the client holds.
+    for etag in (gzipped.headers["etag"], plain.headers["etag"], "W/" + plain.headers["etag"]):
+        resp = client.get(
+            "/api/board",
+            headers={**auth_header, "Accept-Encoding": "gzip", "If-None-Match": etag},
+        )
+        assert resp.status_code == 304
+    assert resp.headers["etag"] == f'"board-{version}"'
+    resp = client.get(
+        "/api/board",
+        headers={**auth_header, "Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["etag"]},
+    )
+    assert resp.headers["etag"] == gzipped.headers["etag"]
+
+    # The tag a client received still works as If-Match.
+    card_id = gzipped.json()["columns"][0]["cards"][0]["id"]
+    resp = client.put(
+        f"/api/board/cards/{card_id}",
+        json={"title": "Renamed"},
+        headers={**auth_header, "If-Match": gzipped.headers["etag"]},
+    )
+    assert resp.status_code == 200
+
+
+def test_identity_when_not_accepted(client, auth_header):
+    _fill_board(client, auth_header)
+    resp = client.get("/api/board", headers={**auth_header, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in resp.headers
+    assert len(resp.content) == int(resp.headers["content-length"])
+
+
+def test_small_responses_are_not_compressed(client):
+    resp = client.get("/api/health", headers={"Accept-Encoding": "gzip"})
+    assert len(resp.content) < COMPRESS_MIN_BYTES
+    assert "content-encoding" not in resp.headers
+
+
+def test_streaming_responses_pass_through():
+    app = FastAPI()
+
+    @app.get("/api/events")
+    def events():
+        chunks = (f"data: {'x' * 2000}\n\n" for _ in range(3))
+        return StreamingResponse(chunks, media_type="text/event-stream")
+
+    @app.get("/api/stream.json")
+    def stream_json():
+        return StreamingResponse(iter(["[", "1, " * 2000, "1]"]), media_type="application/json")
+
+    app.add_middleware(CompressionMiddleware)
+    client = TestClient(app)
+    resp = client.get("/api/events", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in resp.headers
+    assert resp.text.count("data: ") == 3
+
+    resp = client.get("/api/stream.json", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in resp.headers
+    assert len(resp.json()) == 2001
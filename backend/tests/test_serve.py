@@ -0,0 +1,15 @@
+import serve
+
+
+def test_worker_count_follows_cgroup_quota(tmp_path, monkeypatch):
+    cpu_max = tmp_path / "cpu.max"
+    monkeypatch.setattr(serve, "CGROUP_CPU_MAX", cpu_max)
+    monkeypatch.setattr(serve.os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+
+    cpu_max.write_text("150000 100000\n")
+    assert serve.worker_count() == 2
+    cpu_max.write_text("max 100000\n")
+    assert serve.worker_count() == 8
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert serve.worker_count() == 3
@@ -0,0 +1,84 @@
+import bcrypt
+import pytest
+
+import database
+from database import db_path_for, ensure_board_for_user, init_storage, shard_for, shard_path
+from migrate_shards import split_database
+from writer import submit
+
+
+def _add_user(username: str) -> None:
+    password_hash = bcrypt.hashpw(b"password", bcrypt.gensalt(rounds=4)).decode()
+    submit(
+        lambda w: w.execute(
+            "INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, password_hash)
+        ),
+        db_path_for(username),
+    )
+
+
+def _other_shard_user(shard_count: int) -> str:
+    home = shard_for("user", shard_count)
+    return next(f"user{i}" for i in range(100) if shard_for(f"user{i}", shard_count) != home)
+
+
+@pytest.fixture
+def sharded(monkeypatch):
+    monkeypatch.setattr(database, "STORAGE_MODE", "sharded")
+    monkeypatch.setattr(database, "SHARD_COUNT", 4)
+    init_storage()
+
+
+def test_users_on_different_shards_have_separate_files(sharded, client):
+    other = _other_shard_user(4)
+    _add_user(other)
+    assert db_path_for("user") != db_path_for(other)
+
+    for username in ("user", other):
+        token = client.post(
+            "/api/auth/login", json={"username": username, "password": "password"}
+        ).json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        board = client.get("/api/board", headers=headers).json()
+        col_id = board["columns"][0]["id"]
+        resp = client.post(
+            "/api/board/cards", json={"column_id": col_id, "title": username}, headers=headers
+        )
+        assert resp.status_code == 201
+        assert resp.json()["columns"][0]["cards"][-1]["title"] == username
+
+    for username in ("user", other):
+        conn = database.get_read_db(db_path_for(username))
+        try:
+            users = [r["username"] for r in conn.execute("SELECT username FROM users")]
+        finally:
+            conn.close()
+        assert users == [username]
+
+
+def test_split_database_preserves_boards(tmp_path):
+    other = _other_shard_user(4)
+    _add_user(other)
+    submit(lambda w: ensure_board_for_user(w, "user"))
+    submit(lambda w: ensure_board_for_user(w, other))
+
+    counts = split_database(database.DB_PATH, tmp_path / "shards", 4)
+
+    assert sum(counts.values()) == 2
+    for username in ("user", other):
+        conn = database.get_read_db(shard_path(shard_for(username, 4), tmp_path / "shards"))
+        try:
+            cards = conn.execute(
+                """SELECT COUNT(*) FROM cards ca JOIN columns c ON ca.column_id = c.id
+                   JOIN boards b ON c.board_id = b.id JOIN users u ON b.user_id = u.id
+                   WHERE u.username = ?""",
+                (username,),
+            ).fetchone()[0]
+            counted = conn.execute(
+                """SELECT SUM(c.card_count) FROM columns c JOIN boards b ON c.board_id = b.id
+                   JOIN users u ON b.user_id = u.id WHERE u.username = ?""",
+                (username,),
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        assert cards == counted == sum(len(v) for v in database.SEED_CARDS.values())
@@ -0,0 +1,64 @@
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+from static_files import IMMUTABLE_CACHE, PrecompressedStaticFiles, precompress
+
+CHUNK = b"console.log('kanban');\n" * 200
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    (tmp_path / "_next" / "static" / "chunks").mkdir(parents=True)
+    (tmp_path / "_next" / "static" / "chunks" / "app-abc123.js").write_bytes(CHUNK)
+    (tmp_path / "index.html").write_text("<html>home</html>")
+    (tmp_path / "404.html").write_text("<html>missing</html>")
+    return tmp_path
+
+
+def test_serves_gzip_variant_with_immutable_caching(static_dir):
+    client = TestClient(PrecompressedStaticFiles(static_dir))
+    resp = client.get("/_next/static/chunks/app-abc123.js", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers["cache-control"] == IMMUTABLE_CACHE
+    assert resp.headers["vary"] == "Accept-Encoding"
+    assert resp.content == CHUNK
+
+
+def test_identity_when_gzip_refused(static_dir):
+    client = TestClient(PrecompressedStaticFiles(static_dir))
+    resp = client.get(
+        "/_next/static/chunks/app-abc123.js", headers={"Accept-Encoding": "gzip;q=0"}
+    )
+    assert "content-encoding" not in resp.headers
+    assert int(resp.headers["content-length"]) == len(CHUNK)
+
+
+def test_etag_revalidation_returns_304(static_dir):
+    client = TestClient(PrecompressedStaticFiles(static_dir))
+    first = client.get("/")
+    assert first.text == "<html>home</html>"
+    assert first.headers["cache-control"] == "no-cache"
+    again = client.get("/", headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert again.content == b""
+
+
+def test_unknown_path_serves_404_page(static_dir):
+    client = TestClient(PrecompressedStaticFiles(static_dir))
+    resp = client.get("/nope")
+    assert resp.status_code == 404
+    assert resp.text == "<html>missing</html>"
+
+
+def test_prebuilt_variants_are_used(static_dir):
+    assert precompress(static_dir) >= 1
+    gz = static_dir / "_next" / "static" / "chunks" / "app-abc123.js.gz"
+    assert gzip.decompress(gz.read_bytes()) == CHUNK
+    client = TestClient(PrecompressedStaticFiles(static_dir))
+    resp = client.get("/_next/static/chunks/app-abc123.js.gz")
+    assert resp.status_code == 404
+    resp = client.get("/_next/static/chunks/app-abc123.js", headers={"Accept-Encoding": "gzip"})
+    assert resp.content == CHUNK
@@ -0,0 +1,58 @@
+import logging
+
+import timing
+
+
+def test_server_timing_header_has_all_phases(client, auth_header):
+    resp = client.get("/api/board", headers=auth_header)
+    assert resp.status_code == 200
+    header = resp.headers["server-timing"]
+    names = [part.split(";")[0].strip() for part in header.split(",")]
+    assert names == ["db", "serialize", "ai", "auth", "compress", "total"]
+
+
+def test_server_timing_records_db_and_auth(client, auth_header):
+    resp = client.get("/api/board", headers=auth_header)
+    durations = {
+        part.split(";")[0].strip(): float(part.split("dur=")[1])
+        for part in resp.headers["server-timing"].split(",")
+    }
+    assert durations["db"] > 0
+    assert durations["auth"] > 0
+    assert durations["ai"] == 0
+
+
+def test_slow_query_log_includes_route(client, auth_header, monkeypatch, caplog):
+    monkeypatch.setattr(timing, "SLOW_QUERY_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="slow_sql"):
+        client.get("/api/board", headers=auth_header)
+    messages = [r.getMessage() for r in caplog.records if r.name == "slow_sql"]
+    assert any("route=GET /api/board" in m and "JOIN cards" in m for m in messages)
+
+
+def test_slow_query_log_disabled_when_negative(client, auth_header, monkeypatch, caplog):
+    monkeypatch.setattr(timing, "SLOW_QUERY_MS", -1)
+    with caplog.at_level(logging.WARNING, logger="slow_sql"):
+        client.get("/api/board", headers=auth_header)
+    assert not [r for r in caplog.records if r.name == "slow_sql"]
+
+
+def test_row_fetching_counts_towards_the_statement(monkeypatch, caplog):
+    import sqlite3
+    import time
+
+    monkeypatch.setattr(timing, "SLOW_QUERY_MS", 30)
+    conn = sqlite3.connect(":memory:", factory=timing.TracedConnection)
+    conn.create_function("nap", 1, lambda x: time.sleep(0.01) or x)
+    sql = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n LIMIT 6) SELECT nap(i) FROM n"
+    with caplog.at_level(logging.WARNING, logger="slow_sql"):
+        cur = conn.execute(sql)  # steps only the first row
+        assert not caplog.records
+        assert len(cur.fetchall()) == 6
+        assert len(list(conn.execute(sql))) == 6
+        conn.execute("CREATE TABLE t (x)")
+        conn.executemany("INSERT INTO t VALUES (nap(?))", [(i,) for i in range(5)])
+    messages = [r.getMessage() for r in caplog.records if r.name == "slow_sql"]
+    assert len(messages) == 3
+    assert "INSERT INTO t" in messages[2]
+    conn.close()
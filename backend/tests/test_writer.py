@@ -0,0 +1,99 @@
+import sqlite3
+import threading
+
+import pytest
+
+import metrics
+from writer import get_writer
+
+
+def test_concurrent_creates_all_commit(client, auth_header):
+    board = client.get("/api/board", headers=auth_header).json()
+    col_id = board["columns"][0]["id"]
+    before = sum(len(c["cards"]) for c in board["columns"])
+    errors = []
+
+    def create(i):
+        resp = client.post(
+            "/api/board/cards", json={"column_id": col_id, "title": f"C{i}"}, headers=auth_header
+        )
+        if resp.status_code != 201:
+            errors.append(resp.status_code)
+
+    threads = [threading.Thread(target=create, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    board = client.get("/api/board", headers=auth_header).json()
+    backlog = board["columns"][0]["cards"]
+    assert sum(len(c["cards"]) for c in board["columns"]) == before + 20
+    assert [c["position"] for c in backlog] == list(range(len(backlog)))
+
+
+def test_failed_operation_rolls_back_only_itself():
+    writer = get_writer()
+
+    def bad(w):
+        w.execute("INSERT INTO users (username, password_hash) VALUES ('ghost', 'x')")
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        writer.submit(bad)
+    writer.submit(lambda w: w.execute(
+        "INSERT INTO users (username, password_hash) VALUES ('kept', 'x')"
+    ))
+    names = writer.submit(
+        lambda w: [r["username"] for r in w.execute("SELECT username FROM users")]
+    )
+    assert "kept" in names
+    assert "ghost" not in names
+
+
+def test_writer_metrics_exposed(client, auth_header):
+    metrics.reset()
+    board = client.get("/api/board", headers=auth_header).json()
+    col_id = board["columns"][0]["id"]
+    client.put(f"/api/board/columns/{col_id}", json={"title": "Todo"}, headers=auth_header)
+
+    assert client.get("/api/metrics").status_code == 401
+    data = client.get("/api/metrics", headers=auth_header).json()
+    assert data["counters"]["writer.commits"] >= 1
+    assert data["summaries"]["writer.batch_size"]["count"] >= 1
+    assert "writer.queue_depth" in data["gauges"]
+
+
+def test_dead_writer_fails_queued_and_later_operations(tmp_path, monkeypatch):
+    import database
+    from writer import WriteQueue, WriterUnavailableError
+
+    def unopenable(path):
+        raise sqlite3.OperationalError("unable to open database file")
+
+    monkeypatch.setattr(database, "get_db", unopenable)
+    writer = WriteQueue(tmp_path / "gone.db")
+    writer._thread.join(5)
+    with pytest.raises(WriterUnavailableError):
+        writer.submit(lambda w: None)
+    assert writer.error is not None
+
+
+def test_submit_gives_up_on_an_operation_that_never_starts(tmp_path):
+    from writer import WriteQueue, WriterUnavailableError
+
+    writer = WriteQueue(tmp_path / "slow.db", timeout=0.2)
+    release = threading.Event()
+    blocker = threading.Thread(target=writer.submit, args=(lambda w: release.wait(5),))
+    blocker.start()
+    ran = []
+    try:
+        with pytest.raises(WriterUnavailableError):
+            writer.submit(lambda w: ran.append(1))
+    finally:
+        release.set()
+        blocker.join()
+    assert writer.submit(lambda w: "still working") == "still working"
+    assert ran == []  # the abandoned operation was skipped
+    writer.close()
@@ -0,0 +1,203 @@
+import logging
+import os
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+slow_log = logging.getLogger("slow_sql")
+
+PHASES = ("db", "serialize", "ai", "auth", "compress")
+
+# Statements slower than this (milliseconds) are written to the slow_sql log.
+# A negative value disables the log; 0 logs every statement.
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+
+_phases: ContextVar[dict[str, float] | None] = ContextVar("request_phases", default=None)
+_route: ContextVar[str] = ContextVar("request_route", default="-")
+
+
+def record(name: str, seconds: float) -> None:
+    """Add elapsed time to a phase of the current request, if any."""
+    phases = _phases.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def current_route() -> str:
+    return _route.get()
+
+
+def server_timing_header(phases: dict[str, float], total: float) -> str:
+    parts = [f"{name};dur={phases.get(name, 0.0) * 1000:.2f}" for name in PHASES]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class ServerTimingMiddleware:
+    """Attach a Server-Timing header splitting each response into phases.
+
+    Phase totals are collected in a context variable, so code running in the
+    threadpool (sync endpoints and dependencies) reports into the same dict.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        phases: dict[str, float] = {}
+        phases_token = _phases.set(phases)
+        route_token = _route.set(f"{scope['method']} {scope['path']}")
+        start = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing", server_timing_header(phases, time.perf_counter() - start)
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _phases.reset(phases_token)
+            _route.reset(route_token)
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that times its statement, including stepping through the rows.
+
+    SQLite does most of a SELECT's work while rows are fetched, not in
+    execute(), so each fetch adds to the statement's time and to the db
+    phase. The slow SQL log sees the total once the rows are exhausted or
+    the cursor is closed or dropped.
+    """
+
+    def __init__(self, conn: "TracedConnection") -> None:
+        super().__init__(conn)
+        self._sql = ""
+        self._elapsed = 0.0
+        self._pending = False
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._elapsed += elapsed
+            record("db", elapsed)
+
+    def _begin(self, fn, sql: str, parameters) -> "TracedCursor":
+        self._finish()
+        self._sql, self._elapsed, self._pending = sql, 0.0, True
+        try:
+            return self._timed(fn, sql, parameters)
+        finally:
+            # The trace callback has the expanded SQL of what actually ran.
+            self._sql = self.connection._last_sql or sql
+
+    def _finish(self) -> None:
+        if self._pending:
+            self._pending = False
+            self.connection._log_if_slow(self._sql, self._elapsed)
+
+    def execute(self, sql: str, parameters=(), /) -> "TracedCursor":
+        return self._begin(super().execute, sql, parameters)
+
+    def executemany(self, sql: str, parameters, /) -> "TracedCursor":
+        try:
+            return self._begin(super().executemany, sql, parameters)
+        finally:
+            self._finish()
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size: int | None = None) -> list:
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if len(rows) < (self.arraysize if size is None else size):
+            self._finish()
+        return rows
+
+    def fetchall(self) -> list:
+        try:
+            return self._timed(super().fetchall)
+        finally:
+            self._finish()
+
+    def __next__(self):
+        try:
+            return self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+
+    def close(self) -> None:
+        self._finish()
+        super().close()
+
+    def __del__(self) -> None:
+        self._finish()
+
+
+class TracedConnection(sqlite3.Connection):
+    """sqlite3 connection whose statements are timed by TracedCursor.
+
+    The trace callback captures the expanded SQL (with bound values) of the
+    statement SQLite actually ran, so the log shows exactly what was slow.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._last_sql = ""
+        self.set_trace_callback(self._trace)
+
+    def _trace(self, statement: str) -> None:
+        self._last_sql = statement
+
+    def _log_if_slow(self, sql: str, elapsed: float) -> None:
+        if SLOW_QUERY_MS >= 0 and elapsed * 1000 >= SLOW_QUERY_MS:
+            slow_log.warning(
+                "slow query %.1fms route=%s sql=%s", elapsed * 1000, current_route(), sql
+            )
+
+    def cursor(self, factory=TracedCursor) -> sqlite3.Cursor:
+        return super().cursor(factory)
+
+    # sqlite3.Connection.execute() would create a plain cursor.
+    def execute(self, sql: str, parameters=(), /) -> sqlite3.Cursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, parameters, /) -> sqlite3.Cursor:
+        return self.cursor().executemany(sql, parameters)
+
+    def commit(self) -> None:
+        start = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            elapsed = time.perf_counter() - start
+            record("db", elapsed)
+            self._log_if_slow("COMMIT", elapsed)
@@ -0,0 +1,233 @@
+"""Single-writer queue for database mutations.
+
+SQLite allows one writer at a time. Rather than letting every request open
+its own write transaction and race for the lock, mutations are submitted as
+callables to a dedicated writer thread that owns the only write connection.
+The thread drains whatever is queued, runs each operation inside its own
+SAVEPOINT and commits the whole batch once (group commit). Readers keep
+using their own connections and run in parallel under WAL.
+
+Operations receive the writer connection and must not call commit() or
+rollback() themselves; an exception rolls back just that operation and is
+re-raised in the submitting thread.
+
+If the thread itself fails (it cannot open the database, or a rollback
+fails), every queued operation fails with WriterUnavailableError and so do
+later submissions, rather than blocking forever. Submitters also give up
+after WRITER_SUBMIT_TIMEOUT_SECONDS if their operation has not started.
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, InvalidStateError
+from pathlib import Path
+from typing import TypeVar
+
+import database
+import metrics
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MAX_BATCH = 64
+# Longest a submitter waits for its operation to start; one that has
+# started is always waited for, since it will commit or fail shortly.
+WRITER_SUBMIT_TIMEOUT_SECONDS = float(os.environ.get("WRITER_SUBMIT_TIMEOUT_SECONDS", "30"))
+
+_STOP = object()
+
+_last_write = 0.0
+
+
+class WriterUnavailableError(RuntimeError):
+    """The writer thread has died, or did not get to an operation in time."""
+
+
+def _fail(future: Future, exc: BaseException) -> None:
+    try:
+        future.set_exception(exc)
+    except InvalidStateError:
+        pass  # cancelled by a submitter that gave up, or already failed
+
+
+class WriteQueue:
+    def __init__(
+        self,
+        db_path: Path,
+        max_batch: int = MAX_BATCH,
+        timeout: float = WRITER_SUBMIT_TIMEOUT_SECONDS,
+    ):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.error: WriterUnavailableError | None = None  # set once the thread has died
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """Run fn on the writer connection and block until it is committed."""
+        if self.error is not None:
+            raise self.error
+        future: Future = Future()
+        self._queue.put((fn, future, time.perf_counter()))
+        metrics.set_gauge("writer.queue_depth", self._queue.qsize())
+        if self.error is not None:
+            self._drain(self.error)  # died after the check above
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            if not future.cancel():
+                return future.result()  # started meanwhile
+            metrics.incr("writer.timeouts")
+            raise WriterUnavailableError(
+                f"Writer for {self.db_path.name} did not start the operation "
+                f"within {self.timeout:g}s"
+            ) from None
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def close(self) -> None:
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _drain(self, exc: BaseException) -> None:
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP:
+                _fail(item[1], exc)
+
+    def _run(self) -> None:
+        conn = None
+        batch: list = []
+        try:
+            conn = database.get_db(self.db_path)
+            # Transactions are managed explicitly so a batch can span many operations.
+            conn.isolation_level = None
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    return
+                batch = [item]
+                stopping = False
+                while len(batch) < self.max_batch:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                metrics.set_gauge("writer.queue_depth", self._queue.qsize())
+                self._commit_batch(conn, batch)
+                if stopping:
+                    return
+        except BaseException as exc:
+            log.exception("Writer for %s died", self.db_path)
+            metrics.incr("writer.deaths")
+            error = WriterUnavailableError(f"Writer for {self.db_path.name} died: {exc}")
+            self.error = error
+            for _, future, _ in batch:
+                _fail(future, error)
+            self._drain(error)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: list) -> None:
+        started = time.perf_counter()
+        outcomes: list[tuple[Future, object, bool]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future, queued_at in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue  # its submitter timed out and gave up
+                metrics.observe("writer.queue_wait_ms", (started - queued_at) * 1000)
+                conn.execute("SAVEPOINT op")
+                try:
+                    result = fn(conn)
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO op")
+                    conn.execute("RELEASE op")
+                    metrics.incr("writer.op_errors")
+                    outcomes.append((future, exc, False))
+                else:
+                    conn.execute("RELEASE op")
+                    outcomes.append((future, result, True))
+            conn.execute("COMMIT")
+        except Exception as exc:
+            log.exception("Write batch of %d operations failed", len(batch))
+            metrics.incr("writer.failed_batches")
+            # A failed rollback propagates and kills the thread, which then
+            # fails this batch along with everything queued.
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, future, _ in batch:
+                _fail(future, exc)
+            return
+
+        global _last_write
+        _last_write = time.monotonic()
+        metrics.incr("writer.commits")
+        metrics.incr("writer.ops", len(batch))
+        metrics.observe("writer.batch_size", len(batch))
+        metrics.observe("writer.commit_ms", (time.perf_counter() - started) * 1000)
+        for future, value, ok in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+_writers: dict[Path, WriteQueue] = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(db_path: Path | None = None) -> WriteQueue:
+    path = db_path or database.DB_PATH
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = WriteQueue(path)
+        return writer
+
+
+def last_write_at() -> float:
+    """time.monotonic() of the most recent committed batch, 0.0 if none."""
+    return _last_write
+
+
+def failed_writers() -> list[str]:
+    """Database files whose writer thread has died."""
+    with _writers_lock:
+        writers = list(_writers.values())
+    return [writer.db_path.name for writer in writers if writer.error is not None]
+
+
+def queue_depths() -> dict[str, int]:
+    with _writers_lock:
+        writers = list(_writers.values())
+    return {writer.db_path.name: writer.depth() for writer in writers}
+
+
+def submit(fn: Callable[[sqlite3.Connection], T], db_path: Path | None = None) -> T:
+    return get_writer(db_path).submit(fn)
+
+
+def close_writers() -> None:
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
@@ -55,14 +55,18 @@ describe("ChatSidebar", () => {
 
     expect(screen.getByText("Create a card")).toBeInTheDocument();
     await waitFor(() => expect(screen.getByText("Done! I created a card.")).toBeInTheDocument());
-    expect(mockSendChat).toHaveBeenCalledWith("Create a card", []);
+    expect(mockSendChat).toHaveBeenCalledWith("Create a card", null);
     expect(onBoardUpdate).toHaveBeenCalledWith(mockBoard);
   });
 
-  it("passes conversation history to sendChat", async () => {
+  it("continues the server-side conversation instead of sending history", async () => {
     mockSendChat
-      .mockResolvedValueOnce({ message: "First reply", board_updates: [], board: mockBoard })
-      .mockResolvedValueOnce({ message: "Second reply", board_updates: [], board: mockBoard });
+      .mockResolvedValueOnce({
+        message: "First reply", board_updates: [], board: mockBoard, conversation_id: 7,
+      })
+      .mockResolvedValueOnce({
+        message: "Second reply", board_updates: [], board: mockBoard, conversation_id: 7,
+      });
 
     render(<ChatSidebar isOpen={true} onClose={onClose} onBoardUpdate={onBoardUpdate} />);
     const input = screen.getByLabelText("Chat message");
@@ -75,10 +79,31 @@ describe("ChatSidebar", () => {
     await userEvent.click(screen.getByRole("button", { name: /send/i }));
     await waitFor(() => expect(screen.getByText("Second reply")).toBeInTheDocument());
 
-    expect(mockSendChat).toHaveBeenLastCalledWith("Follow up", [
-      { role: "user", content: "Hello" },
-      { role: "assistant", content: "First reply" },
-    ]);
+    expect(mockSendChat).toHaveBeenNthCalledWith(1, "Hello", null);
+    expect(mockSendChat).toHaveBeenLastCalledWith("Follow up", 7);
+  });
+
+  it("starts a new conversation when the old one has expired", async () => {
+    mockSendChat
+      .mockResolvedValueOnce({
+        message: "First reply", board_updates: [], board: mockBoard, conversation_id: 7,
+      })
+      .mockRejectedValueOnce(new Error('{"detail":"Conversation not found"}'))
+      .mockResolvedValueOnce({
+        message: "Fresh start", board_updates: [], board: mockBoard, conversation_id: 8,
+      });
+
+    render(<ChatSidebar isOpen={true} onClose={onClose} onBoardUpdate={onBoardUpdate} />);
+    const input = screen.getByLabelText("Chat message");
+    for (const text of ["Hello", "Later", "Again"]) {
+      await userEvent.type(input, text);
+      await userEvent.click(screen.getByRole("button", { name: /send/i }));
+      await waitFor(() => expect(screen.queryByText("Thinking...")).not.toBeInTheDocument());
+    }
+
+    expect(mockSendChat).toHaveBeenNthCalledWith(2, "Later", 7);
+    expect(mockSendChat).toHaveBeenLastCalledWith("Again", null);
+    expect(screen.getByText("Fresh start")).toBeInTheDocument();
   });
 
   it("does not call onBoardUpdate when no board_updates", async () => {
@@ -14,6 +14,7 @@ type ChatSidebarProps = {
 
 export const ChatSidebar = ({ isOpen, onClose, onBoardUpdate }: ChatSidebarProps) => {
   const [messages, setMessages] = useState<DisplayMessage[]>([]);
+  const [conversationId, setConversationId] = useState<number | null>(null);
   const [input, setInput] = useState("");
   const [sending, setSending] = useState(false);
   const scrollRef = useRef<HTMLDivElement>(null);
@@ -30,19 +31,23 @@ export const ChatSidebar = ({ isOpen, onClose, onBoardUpdate }: ChatSidebarProps
     if (!text || sending) return;
 
     const userMsg: ChatMessage = { role: "user", content: text };
-    const history = messages.filter((m) => !m.isError);
     setMessages((prev) => [...prev, userMsg]);
     setInput("");
     setSending(true);
 
     try {
-      const res = await sendChat(text, history);
+      const res = await sendChat(text, conversationId);
+      setConversationId(res.conversation_id ?? null);
       const assistantMsg: ChatMessage = { role: "assistant", content: res.message };
       setMessages((prev) => [...prev, assistantMsg]);
       if (res.board_updates.length > 0) {
         onBoardUpdate(res.board);
       }
-    } catch {
+    } catch (err) {
+      // Idle conversations expire on the server; the next message starts a new one.
+      if (err instanceof Error && err.message.includes("Conversation not found")) {
+        setConversationId(null);
+      }
       const errorMsg: DisplayMessage = {
         role: "assistant",
         content: "Sorry, something went wrong. Please try again.",
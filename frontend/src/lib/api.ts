@@ -98,11 +98,17 @@ export type ChatResponse = {
   message: string;
   board_updates: unknown[];
   board: BoardData;
+  conversation_id: number | null;
 };
 
+// The server keeps the conversation: the first message starts one and later
+// messages send only its id, not the history.
 export async function sendChat(
   message: string,
-  history: ChatMessage[]
+  conversationId: number | null
 ): Promise<ChatResponse> {
-  return apiFetch("/chat", jsonBody({ message, history }));
+  return apiFetch(
+    "/chat",
+    jsonBody(conversationId === null ? { message } : { message, conversation_id: conversationId })
+  );
 }